@@ -4,30 +4,32 @@ from typing import Tuple, Optional, List, Dict
 from enum import Enum
 
 import ast
-import inspect
 import sys
 import os.path
-import argparse
 import re
-import glob
-import copy
+import json
+import contextlib
+import io
+import time
 from collections import OrderedDict
-from pprint import pprint
 
 # local code
 from . import formatter
 from . import types
+from . import cache
+from . import importgraph
+from . import symbols
+from . import chunked
+from . import profiler
+from . import sourcemap
+from . import incremental
+from . import ir
 
 # function/attribute "translators"
 from .translator import *
-from . import pymain
-from . import pyos
-from . import pysys
-from . import pysix
-from . import pycopy
-from . import numpy
 from .errors import CrystalError
 
+# translator modules are imported on first use, see TRANSLATOR_MANIFEST
 registry = TranslatorRegistry()
 #debug print(registry.map_name_to_klass)
 
@@ -44,6 +46,17 @@ def scope(func):
     func.scope = True
     return func
 
+def int_constant(node) -> Optional[int]:
+    """Value of an int literal, e.g. 2 or -2, else None"""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = int_constant(node.operand)
+        if value is not None and isinstance(node.op, ast.USub):
+            value = -value
+        return value
+    if isinstance(node, ast.Constant) and node.value.__class__ is int:
+        return node.value
+    return None
+
 class OperationMode(Enum):
     STOP = 0 # default
     WARNING = 1  # for all script mode
@@ -55,6 +68,8 @@ class ResultStatus(Enum):
     INCLUDE_ERROR = 2
 
 class FuncCall:
+    __slots__ = ('crystal_visitor', 'node', 'crytype', 'crystal_args', 'funcstr', 'func_module', 'func_name')
+
     def __init__(self, cryvisit, node, crytype):
         self.crystal_visitor = cryvisit
         self.node = node
@@ -251,6 +266,8 @@ class RB(object):
     iter_map   = set(['map'])
     reduce_map = set(['reduce'])
     range_map  = set(['range','xrange'])
+    # `for i in range(...)` loops as while loops, see write_range_loop()
+    native_range_loops = True
 
     bool_op = {
         'And'    : '&&',
@@ -289,9 +306,10 @@ class RB(object):
         }
 
     # Verbose-print macro
-    def vprint(self, message : str) -> None:
+    def vprint(self, message : str, *args) -> None:
+        """Print message (% args, only formatted when verbose)"""
         if self._verbose:
-            print("#>> " + message)
+            print("#>> " + (message % args if args else message))
 
     def maybewarn(self, message : str) -> None:
         if self._mode == OperationMode.WARNING:
@@ -304,13 +322,17 @@ class RB(object):
 
     # Convert Status
     def set_result(self, result):
-        if self._result < result:
+        if self._result.value < result.value:
             self._result = result
 
     def get_result(self):
         return self._result
 
-    def __init__(self, path='', dir_path='', base_path_count=0, mod_paths = None, verbose = False):
+    def __init__(self, path='', dir_path='', base_path_count=0, mod_paths = None, verbose = False, sink = None, source_map = False,
+                 low_memory = False):
+        if '_dispatch_table' not in type(self).__dict__:
+            # each RB (sub)class has its own dispatch table
+            type(self)._dispatch_table = {}
         self._verbose = verbose
         self._mode = OperationMode.STOP # Error Stop Mode : 0:stop(default), 1:warning(for all script mode), 2:no error(for module mode)
         self._result = ResultStatus.OK # Convert Status : 0:No Error, 1:Include Warning, 2:Include Error
@@ -324,22 +346,33 @@ class RB(object):
         self._module_functions = []
         self._is_module = False
         self.mod_paths = mod_paths or {}
-        self._rel_path = []
-        for rel_path in self.mod_paths.values():
-            self._rel_path.append(rel_path.replace('/', '.'))
+        self._mod_path_index = None # see mod_paths_ending()
+        # Nested scopes with the local names, class members and imports
+        self._symbols = symbols.SymbolTable([rel_path.replace('/', '.') for rel_path in self.mod_paths.values()], base_path_count)
 
         self.vprint("base_path_count[%s] dir_path: %s, path : %s : %s" % (self._base_path_count, dir_path, path, self._path))
         self.vprint("mod_paths : %s" % self.mod_paths)
 
-        self.__formatter = formatter.Formatter()
+        # With a sink, the output is streamed to it, see checkpoint()
+        self.__formatter = formatter.Formatter(sink=sink, source_map=source_map)
+        self._source_map = source_map
+        # do not keep references to the tree, see convert_py2cr()
+        self._low_memory = low_memory
+        self.positions = self.__formatter.positions
+        self.mark = self.__formatter.mark
+        self.since = self.__formatter.since
+        self.splice = self.__formatter.splice
         #self.capitalize = self.__formatter.capitalize
         self.write = self.__formatter.write
         self.read = self.__formatter.read
         self.clear = self.__formatter.clear
+        self.flush = self.__formatter.flush
         self.indent = self.__formatter.indent
         self.dedent = self.__formatter.dedent
         self.indent_string = self.__formatter.indent_string
         self.dummy = 0
+        # break flag of each enclosing loop, see start_loop()
+        self._break_flags = []
         self.classes = ['dict', 'list', 'tuple']
         # This is the name of the class that we are currently in:
         self._class_name = None
@@ -357,9 +390,6 @@ class RB(object):
 
         self._is_string_symbol = False # True : ':foo' , False : '"foo"'
 
-        # This lists all variables in the local scope:
-        self._scope = []
-
         #All calls to names within _class_names will be preceded by 'new'
         # Python original class name
         self._class_names = set()
@@ -371,44 +401,43 @@ class RB(object):
         # This lists all inherited class names:
         self._classes_base_classes = {}
 
-        # This lists all function names:
-        self._function = []
-
-        # This lists all arguments in a function:
-        self._function_args = []
+        # This lists all function keyword defaults:
         self._functions = {}
         self._functions_rb_args_default = {}
 
-        # This lists all instance functions in the class scope:
-        self._self_functions = []
+        # This lists all instance functions of each class:
         self._classes_self_functions = {}
         self._self_functions_args = {}
         self._classes_self_functions_args = {}
 
-        # This lists all static functions (Crystal's class method) in the class scope:
-        self._class_functions = []
+        # This lists all static functions (Crystal's class method) of each class:
         self._classes_functions = {}
         self._class_functions_args = {}
         self._classes_class_functions_args = {}
 
-        # This lists all static variables (Crystal's class variables) in the class scope:
-        self._class_variables = []
+        # This lists all static variables (Crystal's class variables) of each class:
         self._classes_variables = {}
 
-        # This lists all instance variables (Crystal's class variables) in the class scope:
-        self._class_self_variables = []
-
-        # This lists all lambda functions:
-        self._lambda_functions = []
-
         # This is a mapping of module-name when "import foo as bar" is used.
         self._module_aliases : Dict[str,str] = {}
 
-        self._import_files = []
         self._imports = []
+        # memoized expression translations, see visit()
+        self._visited = {}
+        self._visited_nodes = []
         self._call = False
         self._conv = True # use YAML convert case.
 
+    def checkpoint(self):
+        """
+        Called after each top-level statement: the output so far is
+        complete, so a streaming formatter may flush it, and the
+        memoized expressions (see visit()) are not needed anymore.
+        """
+        self.__formatter.checkpoint()
+        self._visited.clear()
+        self._visited_nodes = []
+
     def new_dummy(self):
         dummy = "__dummy%d__" % self.dummy
         self.dummy += 1
@@ -429,30 +458,106 @@ class RB(object):
     def get_comparison_op(self, node) -> str:
         return self.comparison_op[node.__class__.__name__]
 
-    def visit(self, node, scope=None, crytype=None):
-
-        if self._mode == OperationMode.NO_ERROR:
-            node_name = self.name(node)
-            if node_name not in ['Module', 'ImportFrom', 'Import', 'ClassDef', 'FunctionDef', 'Name', 'Attribute']:
-                return ''
+    # Calling conventions of the visit_* methods, see dispatch()
+    DISPATCH_PLAIN = 0       # visitor(node)
+    DISPATCH_STATEMENT = 1   # visitor(node, scope)
+    DISPATCH_CRYTYPE = 2     # visitor(node, crytype=crytype), for empty dict() and list()
+    DISPATCH_UNSUPPORTED = 3 # no visitor for this node
+
+    # Nodes that are visited in OperationMode.NO_ERROR (module summaries)
+    declaration_nodes = frozenset(['Module', 'ImportFrom', 'Import', 'ClassDef', 'FunctionDef', 'Name', 'Attribute'])
+
+    # Nodes whose translation is memoized, see visit().  Leaves are
+    # cheaper to translate again than to look up.
+    memo_nodes = (ast.expr, ast.keyword)
+    leaf_nodes = frozenset(['Name', 'Constant'])
+
+    @classmethod
+    def dispatch(cls, node_class : type) -> Tuple[object, int, bool, bool, bool]:
+        """
+        Return (visitor, calling convention, is-declaration, is-memoized,
+        is-statement) of a node class.  The entries are looked up once and kept in a
+        table of each RB class, so visit() does a single dict lookup per
+        node.
+        """
+        table = cls.__dict__.get('_dispatch_table')
+        if table is None:
+            table = {}
+            setattr(cls, '_dispatch_table', table)
+        entry = table.get(node_class)
+        if entry is None:
+            node_name = node_class.__name__
+            visitor = getattr(cls, 'visit_' + node_name, None)
+            declaration = node_name in cls.declaration_nodes
+            memo = issubclass(node_class, cls.memo_nodes) and node_name not in cls.leaf_nodes
+            statement = issubclass(node_class, ast.stmt)
+            if visitor is None:
+                entry = (cls.visit_unsupported, cls.DISPATCH_UNSUPPORTED, False, False, statement)
+            elif hasattr(visitor, 'statement'):
+                entry = (visitor, cls.DISPATCH_STATEMENT, declaration, False, statement)
+            elif node_name in ["Dict", "List", "Call"]:
+                # Do Call for handling empty dict() and list()
+                entry = (visitor, cls.DISPATCH_CRYTYPE, declaration, memo, statement)
+            else:
+                entry = (visitor, cls.DISPATCH_PLAIN, declaration, memo, statement)
+            table[node_class] = entry
+        return entry
 
+    def visit(self, node, scope=None, crytype=None):
         try:
-            visitor = getattr(self, 'visit_' + self.name(node))
-        except AttributeError as exc:
-            if self._mode == OperationMode.STOP:
-                self.set_result(ResultStatus.INCLUDE_ERROR)
-                raise CrystalError("Syntax not supported (%s line:%d col:%d)" % (node, node.lineno, node.col_offset)) from exc
+            visitor, convention, declaration, memo, statement = self._dispatch_table[node.__class__]
+        except KeyError:
+            visitor, convention, declaration, memo, statement = self.dispatch(node.__class__)
+
+        if self._mode == OperationMode.NO_ERROR and not declaration:
+            return ''
+
+        if statement and self._source_map:
+            # the lines written for a statement map to it, the lines
+            # after a nested statement (e.g. `end`) to the outer one
+            outer = self.__formatter.position
+            self.__formatter.position = (node.lineno - 1, node.col_offset)
+            try:
+                if convention == self.DISPATCH_STATEMENT:
+                    return visitor(self, node, scope)
+                return visitor(self, node)
+            finally:
+                self.__formatter.position = outer
+
+        if memo:
+            # An expression is translated once per visitor context.  The
+            # translators visit the arguments of a call again (FuncCall
+            # already did), which is exponential in the nesting depth and
+            # repeats side effects such as warnings.
+            key = (id(node), self._tuple_type, self._is_string_symbol, crytype,
+                   self._call, self._conv, self._dict_format, self._func_args_len)
+            try:
+                return self._visited[key]
+            except KeyError:
+                pass
+            if convention == self.DISPATCH_CRYTYPE:
+                result = visitor(self, node, crytype=crytype)
             else:
-                self.maybewarn("Syntax not supported (%s line:%d col:%d)" % (node, node.lineno, node.col_offset))
-                return ''
-
-        if hasattr(visitor, 'statement'):
-            return visitor(node, scope)
-        elif self.name(node) in ["Dict", "List", "Call"]:
-            # Do Call for handling empty dict() and list()
-            return visitor(node, crytype=crytype)
+                result = visitor(self, node)
+            self._visited[key] = result
+            self._visited_nodes.append(node) # keeps id(node) unique
+            return result
+
+        if convention == self.DISPATCH_PLAIN:
+            return visitor(self, node)
+        elif convention == self.DISPATCH_CRYTYPE:
+            return visitor(self, node, crytype=crytype)
+        elif convention == self.DISPATCH_STATEMENT:
+            return visitor(self, node, scope)
+        return visitor(self, node)
+
+    def visit_unsupported(self, node):
+        if self._mode == OperationMode.STOP:
+            self.set_result(ResultStatus.INCLUDE_ERROR)
+            raise CrystalError("Syntax not supported (%s line:%d col:%d)" % (node, node.lineno, node.col_offset))
         else:
-            return visitor(node)
+            self.maybewarn("Syntax not supported (%s line:%d col:%d)" % (node, node.lineno, node.col_offset))
+            return ''
 
     def visit_Module(self, node):
         """
@@ -475,7 +580,8 @@ class RB(object):
                 self.indent()
 
         for stmt in node.body:
-            self.visit(stmt)
+            self.translate_statement(stmt)
+            self.checkpoint()
 
         if self._path != ['']:
             if self._module_functions:
@@ -492,10 +598,9 @@ class RB(object):
         FunctionDef(identifier name, arguments args, stmt* body, expr* decorator_list, expr? returns)
         """
 
-        self._function.append(node.name)
-        self._function_args = []
         is_static = False
-        is_closure = False
+        # a def nested in a function becomes a crystal proc
+        is_closure = self._symbols.enclosing(symbols.FUNCTION) is not None
         is_property = False
         is_setter = False
         if node.decorator_list:
@@ -534,9 +639,6 @@ class RB(object):
         #    print(a.annotation.id)
 
         defaults = [None]*(len(node.args.args) - len(node.args.defaults)) + node.args.defaults
-        # Class Method
-        if self._class_name:
-            self._scope = [arg.arg for arg in node.args.args]
 
         # get key for not keyword argument Call.
         rb_args_default = []
@@ -573,8 +675,6 @@ class RB(object):
         # <Crystal>   class Foo
         #                 def initialize(fuga)
         #                 def bar(hoge)
-        if len(self._function) != 1:
-            is_closure = True
         if '__new__' == node.name:
             func_name = 'new'
         elif self._class_name:
@@ -614,8 +714,10 @@ class RB(object):
             kwarg = "**%s" % self.visit(node.args.kwarg)
             rb_args.append(kwarg)
             rb_args_default.append([])
-        self._function_args = rb_args
+        has_args = len(rb_args) != 0
         rb_args = ", ".join(rb_args)
+        # kept for every function of the module (and its dependents)
+        rb_args_default = tuple(rb_args_default)
         if self._class_name is None:
             self._functions[node.name] = rb_args_default
         else:
@@ -639,11 +741,11 @@ class RB(object):
             #              end
             #              bar.()
             #            end
-            if len(self._function_args) == 0:
+            if not has_args:
                 self.write("%s = -> do" % func_name)
             else:
                 self.write("%s = ->(%s) do" % (func_name, rb_args))
-            self._lambda_functions.append(func_name)
+            self._symbols.define(func_name, symbols.PROC)
         else:
             if self._is_module and not self._class_name:
                 self._module_functions.append(func_name)
@@ -657,19 +759,21 @@ class RB(object):
             else:
                 self.write("def %s(%s)" % (func_name, rb_args))
 
-        if self._class_name is None:
-            self._scope = [arg.arg for arg in node.args.args]
-            self._scope.append(node.args.vararg)
+        with self._symbols.new_scope(symbols.FUNCTION, node.name, closed=not is_closure) as function_scope:
+            for arg in node.args.args + node.args.kwonlyargs:
+                function_scope.define(arg.arg, symbols.ARGUMENT)
+            if node.args.vararg:
+                function_scope.define(node.args.vararg.arg, symbols.ARGUMENT)
+            if node.args.kwarg:
+                function_scope.define(node.args.kwarg.arg, symbols.KWARG)
 
-        self.indent()
-        for stmt in node.body:
-            self.visit(stmt)
-        self.dedent()
+            self.indent()
+            for stmt in node.body:
+                self.visit(stmt)
+            self.dedent()
         self.write('end')
 
-        if self._class_name:
-            self._scope = []
-        else:
+        if not self._class_name:
             if node.decorator_list:
                 # [method argument set Method Object] :
                 #<Python> @mydecorator
@@ -682,10 +786,7 @@ class RB(object):
                     isinstance(node.decorator_list[0], ast.Name):
                     self.write('%s = %s(method(:%s))' % (node.name, node.decorator_list[0].id, node.name))
                     #self.write('%s = %s(%s)' % (node.name, node.decorator_list[0].id, node.name))
-                    self._scope.append(node.name)
-
-        self._function.pop()
-        self._function_args = []
+                    self._symbols.declare(node.name, symbols.VARIABLE)
 
     @scope
     def visit_ClassDef(self, node):
@@ -693,11 +794,7 @@ class RB(object):
         [Class Define] :
         ClassDef(identifier name,expr* bases, keyword* keywords, stmt* body,expr* decorator_list)
         """
-        self._self_functions = []
         self._functions_rb_args_default = {}
-        self._class_functions = []
-        self._class_variables = []
-        self._class_self_variables = []
         self._self_functions_args = {}
         self._class_functions_args = {}
 
@@ -722,13 +819,14 @@ class RB(object):
                 base_rclasses.append(base)
 
             if base in self._classes_base_classes:
-                inherited_bases = self._classes_base_classes[base]
-                inherited_bases.append(base)
+                # copy, the base class entry may be shared with a ModuleSummary
+                inherited_bases = self._classes_base_classes[base] + [base]
             else:
                 inherited_bases = [base]
             for i_base in inherited_bases:
                 if i_base not in base_classes:
-                    base_classes.append(i_base)
+                    # the names are kept for every class of the module
+                    base_classes.append(sys.intern(i_base))
 
         self.vprint("ClassDef class_name[%s] base_classes: %s base_rclasses: %s" % (node.name, base_classes, base_rclasses))
 
@@ -742,12 +840,12 @@ class RB(object):
             bases = []
 
         # self._classes remembers all classes defined
-        self._classes[node.name] = node
+        self._classes[node.name] = None if self._low_memory else node
         self._class_names.add(node.name)
 
         # [Class Name]  <Python> class foo: => <Crystal> class Foo
         class_name = node.name
-        rclass_name = class_name[0].upper() + class_name[1:]
+        rclass_name = sys.intern(class_name[0].upper() + class_name[1:])
 
         self.vprint("ClassDef class_name[%s] bases: %s" % (node.name, bases))
 
@@ -761,6 +859,7 @@ class RB(object):
         self.indent()
         self._rclass_name = rclass_name
         self._rclass_names.add(rclass_name)
+        class_scope = self._symbols.push(symbols.CLASS, node.name)
 
         #from ast import dump
         #~ methods = []
@@ -770,12 +869,14 @@ class RB(object):
                 if len(stmt.decorator_list) == 1 and \
                     isinstance(stmt.decorator_list[0], ast.Name) and \
                     stmt.decorator_list[0].id == "staticmethod":
-                    self._class_functions.append(stmt.name)
+                    class_scope.define_member(stmt.name, symbols.CLASS_FUNCTION)
                 else:
-                    self._self_functions.append(stmt.name)
-        if len(self._class_functions) != 0:
+                    class_scope.define_member(stmt.name, symbols.SELF_FUNCTION)
+        class_functions = class_scope.member_names(symbols.CLASS_FUNCTION)
+        self_functions = class_scope.member_names(symbols.SELF_FUNCTION)
+        if len(class_functions) != 0:
             # for staticmethods, also define an instance method
-            for clsfuncname in self._class_functions:
+            for clsfuncname in class_functions:
                 self.write("# instance-method from @staticmethod")
                 self.write("def %s(*args,**kwargs)" % clsfuncname)
                 self.indent()
@@ -783,10 +884,10 @@ class RB(object):
                 self.dedent()
                 self.write("end")
 
-        self._classes_functions[node.name] = self._class_functions
-        self.vprint("self._self_functions : %s" % self._self_functions)
+        self._classes_functions[node.name] = class_functions
+        self.vprint("self_functions : %s" % self_functions)
         self.vprint("self._classes_self_functions : %s" % self._classes_self_functions)
-        self._classes_self_functions[node.name] = self._self_functions
+        self._classes_self_functions[node.name] = self_functions
 
         for stmt in node.body:
             if isinstance(stmt, (ast.Assign, ast.AnnAssign)):
@@ -817,7 +918,7 @@ class RB(object):
                     else:
                         valuetype = types.CrystalTypes.constant(stmt.value)
                     self.write("@%s : %s = %s" % (var, valuetype, "nil"))
-                    self._class_variables.append(var)
+                    class_scope.define_member(var, symbols.CLASS_VARIABLE)
             else:
                 self.visit(stmt)
         if len(self._functions_rb_args_default) != 0:
@@ -830,30 +931,28 @@ class RB(object):
                     else:
                         self._self_functions_args[stmt.name] = self._functions_rb_args_default[stmt.name]
 
+        class_variables = class_scope.member_names(symbols.CLASS_VARIABLE)
+        self._symbols.pop()
         self._classes_class_functions_args[node.name] = self._class_functions_args
         self._classes_self_functions_args[node.name] = self._self_functions_args
-        self._classes_variables[node.name] = self._class_variables
+        self._classes_variables[node.name] = class_variables
         self._class_name = None
         self._rclass_name = None
 
-        for v in (self._class_variables):
+        for v in class_variables:
             self.write("def self.%s; @@%s; end" % (v,v))
             self.write("def self.%s=(val); @@%s=val; end" % (v,v))
             self.write("def %s; @%s = @@%s if @%s.nil?; @%s; end" % (v,v,v,v,v))
             self.write("def %s=(val); @%s=val; end" % (v,v))
 
-        #for func in self._self_functions:
+        #for func in self_functions:
         #    if func in self.attribute_map.keys():
         #        self.write("alias :%s :%s" % (self.attribute_map[func], func))
         self.dedent()
         self.write("end")
-        self._self_functions = []
         self._self_functions_args = {}
         self._functions_rb_args_default = {}
-        self._class_functions = []
         self._class_functions_args = {}
-        self._class_variables = []
-        self._class_self_variables = []
 
     def visit_Return(self, node):
         if node.value is None:
@@ -949,9 +1048,8 @@ class RB(object):
                 name = self.visit(target.value)
                 if isinstance(target.slice, (ast.Index, ast.Constant)):
                     # found index assignment # a[0] = xx
-                    for arg in self._function_args:
-                        if arg == ("**%s" % name):
-                            self._is_string_symbol = True
+                    if self._symbols.lookup(name) == symbols.KWARG:
+                        self._is_string_symbol = True
                     target_str += "%s[%s] = " % (name, self.visit(target.slice))
                     self._is_string_symbol = False
                 elif isinstance(target.slice, ast.Slice):
@@ -965,15 +1063,14 @@ class RB(object):
                     target_str += "%s[%s] = " % (name, self.visit(target.slice))
             elif isinstance(target, ast.Name):
                 var = self.visit(target)
-                if not var in self._scope:
-                    self._scope.append(var)
+                self._symbols.declare(var, symbols.VARIABLE)
                 if isinstance(node.value, ast.Call):
                     if isinstance(node.value.func, ast.Name):
                         if node.value.func.id in self._class_names:
                             self._classes_self_functions_args[var] = self._classes_self_functions_args[node.value.func.id]
                 # set lambda functions
                 if isinstance(node.value, ast.Lambda):
-                    self._lambda_functions.append(var)
+                    self._symbols.define(var, symbols.PROC)
                 target_str += "%s = " % var
             elif isinstance(target, ast.Attribute):
                 var = self.visit(target)
@@ -982,7 +1079,7 @@ class RB(object):
                 # <Crystal>   @foo     = hoge
                 if var == 'self':
                     target_str += "@%s = " % str(target.attr)
-                    self._class_self_variables.append(str(target.attr))
+                    self._symbols.define_member(str(target.attr), symbols.INSTANCE_VARIABLE)
                 else:
                     target_str += "%s = " % var
             else:
@@ -1034,6 +1131,18 @@ class RB(object):
         if not isinstance(node.target, (ast.Name,ast.Tuple, ast.List)):
             self.set_result(ResultStatus.INCLUDE_ERROR)
             raise CrystalError("Argument decomposition in 'for' loop is not supported")
+        break_flag = self.start_loop(node)
+        try:
+            loop = self.range_loop(node)
+            if loop is not None:
+                self.write_range_loop(node, *loop)
+            else:
+                self.write_each_loop(node)
+        finally:
+            self._break_flags.pop()
+        self.write_orelse(node, break_flag)
+
+    def write_each_loop(self, node):
         #if isinstance(node.target, ast.Tuple):
 
         #print self.visit(node.iter) #or  Variable (String case)
@@ -1049,66 +1158,123 @@ class RB(object):
         # ast.Tuple, ast.List, ast.*
         for_iter = self.visit(node.iter)
 
-        if node.orelse:
-            orelse_dummy = self.new_dummy()
-            self.write("%s = false" % orelse_dummy)
-
         ##OLD-FOR-LOOP## self.write("for %s in %s" % (for_target, for_iter))
         self.write("%s.py_each do |%s|" % (for_iter, for_target))
         self.indent()
         for stmt in node.body:
             self.visit(stmt)
-
-        if node.orelse:
-            self.write("if %s == %s[-1]" % (for_target, for_iter))
-            self.indent()
-            self.write("%s = true" % orelse_dummy)
-            self.dedent()
-            self.write("end")
-
         self.dedent()
         self.write("end")
 
+    def start_loop(self, node):
+        """
+        [Loop Else] : a loop with an else clause has a break flag, set by
+        its `break` statements (see visit_Break) and tested after the
+        loop, so that the iterable (or the condition) is not evaluated
+        again.  Returns the flag, None without an else clause.
+        <Python>    for x in rows():
+                        if x == y:
+                            break
+                    else:
+                        print("ok")
+        <Crystal>   __dummy0__ = false
+                    rows().py_each do |x|
+                      if x == y
+                        __dummy0__ = true
+                        break
+                      end
+                    end
+                    unless __dummy0__
+                      py_print("ok")
+                    end
+        """
+        break_flag = None
+        if node.orelse:
+            break_flag = self.new_dummy()
+            self.write("%s = false" % break_flag)
+        self._break_flags.append(break_flag)
+        return break_flag
+
+    def write_orelse(self, node, break_flag):
         if node.orelse:
-            self.write("if %s" % orelse_dummy)
+            self.write("unless %s" % break_flag)
             self.indent()
             for stmt in node.orelse:
                 self.visit(stmt)
             self.dedent()
             self.write("end")
 
+    def range_loop(self, node):
+        """
+        (start, stop, step) of a `for name in range(...)` loop whose step
+        is a literal, None for the other loops.  start is None for
+        range(stop).
+        """
+        it = node.iter
+        if not self.native_range_loops or not isinstance(node.target, ast.Name) or \
+           not isinstance(it, ast.Call) or not isinstance(it.func, ast.Name) or \
+           it.func.id != 'range' or it.func.id in self._functions or \
+           it.keywords or not 1 <= len(it.args) <= 3 or \
+           any(isinstance(arg, ast.Starred) for arg in it.args):
+            return None
+        if len(it.args) == 1:
+            return None, it.args[0], 1
+        step = 1
+        if len(it.args) == 3:
+            step = int_constant(it.args[2])
+            if not step: # unknown sign, or a zero step (ValueError at run time)
+                return None
+        return it.args[0], it.args[1], step
+
+    def write_range_loop(self, node, start, stop, step):
+        """
+        [Range Loop] : a while loop, without the PyRange iterator
+        <Python>    for i in range(a, n, 2):
+                        <body>
+        <Crystal>   __dummy0__ = a
+                    __dummy1__ = n
+                    while __dummy0__ < __dummy1__
+                      i = __dummy0__
+                      __dummy0__ += 2
+                      <body>
+                    end
+        The counter is advanced before the body, so that `next` (continue)
+        goes on with the next value and assignments to i do not change the
+        iteration, and i keeps its last value after the loop.
+        """
+        counter = self.new_dummy()
+        self.write("%s = %s" % (counter, '0' if start is None else self.visit(start)))
+        limit = int_constant(stop)
+        if limit is None:
+            # the stop value is evaluated once
+            limit = self.new_dummy()
+            self.write("%s = %s" % (limit, self.visit(stop)))
+        self.write("while %s %s %s" % (counter, '<' if step > 0 else '>', limit))
+        self.indent()
+        self.write("%s = %s" % (self.visit(node.target), counter))
+        self.write("%s %s= %d" % (counter, '+' if step > 0 else '-', abs(step)))
+        for stmt in node.body:
+            self.visit(stmt)
+        self.dedent()
+        self.write("end")
+
     @scope
     def visit_While(self, node):
         """
         While(expr test, stmt* body, stmt* orelse)
         """
 
-        if not node.orelse:
+        break_flag = self.start_loop(node)
+        try:
             self.write("while %s" % self.visit(node.test))
-        else:
-            orelse_dummy = self.new_dummy()
-
-            self.write("%s = false" % orelse_dummy)
-            self.write("while true")
-            self.write("    unless %s" % self.visit(node.test))
-            self.write("        %s = true" % orelse_dummy)
-            self.write("        break")
-            self.write("    end")
-
-        self.indent()
-        for stmt in node.body:
-            self.visit(stmt)
-        self.dedent()
-
-        self.write("end")
-
-        if node.orelse:
-            self.write("if %s" % orelse_dummy)
             self.indent()
-            for stmt in node.orelse:
+            for stmt in node.body:
                 self.visit(stmt)
             self.dedent()
             self.write("end")
+        finally:
+            self._break_flags.pop()
+        self.write_orelse(node, break_flag)
 
     def visit_IfExp(self, node):
         """
@@ -1288,15 +1454,15 @@ class RB(object):
             for path, rel_path in self.mod_paths.items():
                 self.vprint("Import mod_name=%s rel_path=%s" % (mod_name, rel_path))
                 if (rel_path.startswith(mod_name + '/') or mod_name.endswith(rel_path)) and os.path.exists(path):
-                    self._import_files.append(os.path.join(self._dir_path, rel_path).replace('/', '.'))
-                    self.vprint("Import self._import_files: %s" % self._import_files)
+                    self._symbols.add_import(os.path.join(self._dir_path, rel_path).replace('/', '.'))
+                    self.vprint("Import imports: %s" % self._symbols.imports())
                     self.write(f'require "./{rel_path}"')
 
             if node.names[0].asname is not None:
-                if node.names[0].name in self._import_files:
+                if self._symbols.is_import(node.names[0].name):
                     base = '::'.join([formatter.capitalize(x) for x in node.names[0].name.split('.')[self._base_path_count:]])
                     self.write("%s = %s" % (node.names[0].asname.capitalize(), base))
-                    self._import_files.append(node.names[0].asname)
+                    self._symbols.add_import(node.names[0].asname, node.names[0].name)
                 # No Use
                 #elif node.names[0].name in self._class_names:
                 #    self.write("%s = %s" % (self.capitalize(node.names[0].asname), self.capitalize(node.names[0].name)))
@@ -1348,6 +1514,26 @@ class RB(object):
 #                    if isinstance(RB.__dict__[method_key][mod_org_method], dict):
 #                        RB.__dict__[method_key][mod_org_method]['mod'] = _mod_name + '::'
 
+    def mod_paths_ending(self, *names : str) -> List[Tuple[str, str]]:
+        """
+        The (path, rel_path) items of mod_paths, in order, whose file name
+        ends with the last part of one of the names + '.py'.  A superset
+        of the paths ending with a name + '.py', found without a scan of
+        mod_paths: an import would be linear in the number of modules.
+        """
+        if self._mod_path_index is None:
+            # every suffix of the file name -> (order, path, rel_path)
+            self._mod_path_index = {}
+            for order, (path, rel_path) in enumerate(self.mod_paths.items()):
+                stem, ext = os.path.splitext(os.path.basename(path))
+                if ext == '.py':
+                    for i in range(len(stem)):
+                        self._mod_path_index.setdefault(stem[i:], []).append((order, path, rel_path))
+        items = set()
+        for name in names:
+            items.update(self._mod_path_index.get(name.rsplit('/', 1)[-1], ()))
+        return [(path, rel_path) for _order, path, rel_path in sorted(items)]
+
     def visit_ImportFrom(self, node):
         """
         ImportFrom(identifier? module, alias* names, int? level)
@@ -1440,29 +1626,29 @@ class RB(object):
                        module Alias_classes
                          class Spam
         """
-        self.vprint(f"mod_paths : {self.mod_paths}")
+        self.vprint("mod_paths : %s", self.mod_paths)
 
         if node.module is not None and not registry.require_lookup_or_none(node.module):
 
             require_name = registry.require_lookup(node.module)
-            self._import_files.append(node.module)
+            self._symbols.add_import(node.module)
             mod_name = node.module.replace('.', '/')
             mod_name_i = node.module.replace('.', '/') + '/' + node.names[0].name
             # from imported.submodules import submodulea
             # => require_relative 'submodules/submodulea'
 
             self.vprint("ImportFrom mod_name : %s mod_name_i: %s" % (mod_name , mod_name_i))
-            for path, rel_path in self.mod_paths.items():
+            for path, rel_path in self.mod_paths_ending(mod_name_i, mod_name):
                 self.vprint("ImportFrom mod_name : %s rel_path : %s" % (mod_name, rel_path))
                 if node.names[0].name != '*':
                     if path.endswith(mod_name_i + '.py'):
                         self.write("require \"%s\"" % rel_path)
                         dir_path = os.path.relpath(mod_name, self._dir_path)
                         if dir_path != '.':
-                            self._import_files.append(os.path.relpath(rel_path, dir_path).replace('/', '.'))
+                            self._symbols.add_import(os.path.relpath(rel_path, dir_path).replace('/', '.'))
                         else:
-                            self._import_files.append(rel_path.replace('/', '.'))
-                        self.vprint("ImportFrom self._import_files: %s" % self._import_files)
+                            self._symbols.add_import(rel_path.replace('/', '.'))
+                        self.vprint("ImportFrom imports: %s" % self._symbols.imports())
                         break
                 if path.endswith(mod_name + '.py'):
                     self.write("require \"%s\"" % rel_path)
@@ -1474,10 +1660,10 @@ class RB(object):
             # self.write("#include %s" % base)
 
             if node.names[0].asname is not None:
-                if node.names[0].name in self._import_files:
+                if self._symbols.is_import(node.names[0].name):
                     base = '::'.join([formatter.capitalize(x) for x in node.names[0].name.split('.')[self._base_path_count:]])
                     self.write("%s = %s" % (formatter.capitalize(node.names[0].asname), base))
-                    self._import_files.append(node.names[0].asname)
+                    self._symbols.add_import(node.names[0].asname, node.names[0].name)
                 elif node.names[0].name in self._class_names:
                     self.write("%s = %s" % (formatter.capitalize(node.names[0].asname), formatter.capitalize(node.names[0].name)))
                     self._class_names.add(node.names[0].asname)
@@ -1547,7 +1733,8 @@ class RB(object):
         Global(identifier* names)
         """
         #return self.visit(node.names.upper)
-        self._scope.extend(node.names)
+        for name in node.names:
+            self._symbols.define(name, symbols.GLOBAL)
 
     def visit_Expr(self, node) -> None:
         """
@@ -1571,6 +1758,9 @@ class RB(object):
         self.write("# pass")
 
     def visit_Break(self, _node) -> None:
+        if self._break_flags and self._break_flags[-1] is not None:
+            # [Loop Else] : see start_loop()
+            self.write("%s = true" % self._break_flags[-1])
         self.write("break")
 
     def visit_Continue(self, _node) -> None:
@@ -1595,6 +1785,45 @@ class RB(object):
             args.append("*%s" % self.visit(node.vararg))
         return ", ".join(args)
 
+    @contextlib.contextmanager
+    def comprehension_scope(self, node):
+        """
+        Scope of the block of a comprehension, with its target names.
+        The first iterable is evaluated in the enclosing scope, so visit
+        it before entering.
+        """
+        with self._symbols.new_scope(symbols.COMPREHENSION) as scope:
+            for generator in node.generators:
+                for name in symbols.target_names(generator.target):
+                    scope.define(name, symbols.VARIABLE)
+            yield scope
+
+    def fused_comprehension(self, node, first_iter, value) -> str:
+        """
+        [Comprehension] : every generator and condition in a single pass,
+        through the iterators of the iterables (py_iter), so that no
+        intermediate array is built before the result.
+        <Python>    [x + y for x in a if x > 1 for y in b if y]
+        <Crystal>   a.py_iter.select{|x| x > 1}.flat_map{|x| b.py_iter.select{|y| y}.map{|y| x + y}}
+        value is the translated element, visited in the comprehension scope.
+        A tuple target is unpacked explicitly (|(k, v)|) in every block.
+        """
+        targets = []
+        for generator in node.generators:
+            if not isinstance(generator.target, ast.Name):
+                self._tuple_type = '()'
+            targets.append(self.visit(generator.target))
+            self._tuple_type = '[]'
+        chain = ".map{|%s| %s}" % (targets[-1], value)
+        for k in range(len(node.generators) - 1, -1, -1):
+            generator = node.generators[k]
+            i = first_iter if k == 0 else self.visit(generator.iter)
+            selects = "".join(".select{|%s| %s}" % (targets[k], self.visit(cond)) for cond in generator.ifs)
+            chain = "%s.py_iter%s%s" % (self.ope_filter(i), selects, chain)
+            if k > 0:
+                chain = ".flat_map{|%s| %s}" % (targets[k - 1], chain)
+        return chain
+
     def visit_GeneratorExp(self, node):
         """
         GeneratorExp(expr elt, comprehension* generators)
@@ -1604,10 +1833,15 @@ class RB(object):
         #else:
         #    i = self.visit(node.generators[0].iter)
         i = self.visit(node.generators[0].iter) # ast.Tuple, ast.List, ast.*
-        t = self.visit(node.generators[0].target)
-        # <Python>    [x**2 for x in [1,2]]
-        # <Crystal>   [1, 2].map{|x| x**2}
-        return "%s.map{|%s| %s}" % (i, t, self.visit(node.elt))
+        with self.comprehension_scope(node):
+            if len(node.generators) > 1 or node.generators[0].ifs:
+                # <Python>    sum(x for x in a if x > 1)
+                # <Crystal>   a.py_iter.select{|x| x > 1}.map{|x| x}.to_a.sum
+                return self.fused_comprehension(node, i, self.visit(node.elt)) + ".to_a"
+            t = self.visit(node.generators[0].target)
+            # <Python>    [x**2 for x in [1,2]]
+            # <Crystal>   [1, 2].map{|x| x**2}
+            return "%s.map{|%s| %s}" % (i, t, self.visit(node.elt))
 
     def visit_ListComp(self, node) -> str:
         """
@@ -1618,71 +1852,66 @@ class RB(object):
         #else:
         #    i = self.visit(node.generators[0].iter)
         i = self.visit(node.generators[0].iter) # ast.Tuple, ast.List, ast.*
-        if isinstance(node.generators[0].target, ast.Name):
-            t = self.visit(node.generators[0].target)
-        else:
-            # ast.Tuple
-            # Goofy, but we need to wrap the returned values with ()
-            # so that |a,b,c| ==> |(a,b,c)|
-            self._tuple_type = '()'
-            t = self.visit(node.generators[0].target)
-            self._tuple_type = '[]'
-        if len(node.generators[0].ifs) == 0:
+        with self.comprehension_scope(node):
+            if len(node.generators) > 1 or node.generators[0].ifs:
+                # <Python>    [x**2 for x in [1,2] if x > 1]
+                # <Crystal>   [1, 2].py_iter.select{|x| x > 1}.map{|x| x**2}.to_a
+                return self.fused_comprehension(node, i, self.visit(node.elt)) + ".to_a"
+            if isinstance(node.generators[0].target, ast.Name):
+                t = self.visit(node.generators[0].target)
+            else:
+                # ast.Tuple
+                # Goofy, but we need to wrap the returned values with ()
+                # so that |a,b,c| ==> |(a,b,c)|
+                self._tuple_type = '()'
+                t = self.visit(node.generators[0].target)
+                self._tuple_type = '[]'
             # <Python>    [x**2 for x in [1,2]]
             # <Crystal>   [1, 2].map{|x| x**2}
             return "%s.map{|%s| %s}" % (i, t, self.visit(node.elt))
-        else:
-            # <Python>    [x**2 for x in [1,2] if x > 1]
-            # <Crystal>   [1, 2].select {|x| x > 1 }.map{|x| x**2}
-            return "%s.select{|%s| %s}.map{|%s| %s}" % \
-                    (i, t, self.visit(node.generators[0].ifs[0]), t, \
-                     self.visit(node.elt))
 
     def visit_DictComp(self, node) -> str:
         """
         DictComp(expr key, expr value, comprehension* generators)
         """
         i = self.visit(node.generators[0].iter) # ast.Tuple, ast.List, ast.*
-        if isinstance(node.generators[0].target, ast.Name):
-            t = self.visit(node.generators[0].target)
-        else:
-            # ast.Tuple
-            self._tuple_type = ''
-            t = self.visit(node.generators[0].target)
-            self._tuple_type = '[]'
-        if len(node.generators[0].ifs) == 0:
+        with self.comprehension_scope(node):
+            if len(node.generators) > 1 or node.generators[0].ifs:
+                # <Python> {key: data for key, data in {'a': 7}.items() if data > 6}
+                # <Crystal>   {'a', 7}.to_a.py_iter.select{|(key, data)| data > 6}.map{|(key, data)| {key, data}}.to_h
+                pair = "{%s, %s}" % (self.visit(node.key), self.visit(node.value))
+                return self.fused_comprehension(node, i, pair) + ".to_h"
+            if isinstance(node.generators[0].target, ast.Name):
+                t = self.visit(node.generators[0].target)
+            else:
+                # ast.Tuple
+                self._tuple_type = ''
+                t = self.visit(node.generators[0].target)
+                self._tuple_type = '[]'
             # <Python>    {key: data for key, data in {'a': 7}.items()}
             # <Crystal>   {'a', 7}.to_a.map{|key, data| [key, data]}.to_h
             return "%s.map{|%s|[%s, %s]}.to_h" % (i, t, self.visit(node.key), self.visit(node.value))
-        else:
-            # <Python> {key: data for key, data in {'a': 7}.items() if data > 6}
-            # <Crystal>   {'a', 7}.to_a.select{|key, data| data > 6}.map{|key, data| [key, data]}.to_h
-            return "%s.select{|%s| %s}.map{|%s|[%s, %s]}.to_h" % \
-                    (i, t, self.visit(node.generators[0].ifs[0]), t, \
-                     self.visit(node.key), self.visit(node.value))
 
     def visit_SetComp(self, node) -> str:
         """
         SetComp(expr elt, comprehension* generators)
         """
         i = self.visit(node.generators[0].iter) # ast.Tuple, ast.List, ast.*
-        if isinstance(node.generators[0].target, ast.Name):
-            t = self.visit(node.generators[0].target)
-        else:
-            # ast.Tuple
-            self._tuple_type = ''
-            t = self.visit(node.generators[0].target)
-            self._tuple_type = '[]'
-        if len(node.generators[0].ifs) == 0:
+        with self.comprehension_scope(node):
+            if len(node.generators) > 1 or node.generators[0].ifs:
+                # <Python> {x**2 for x in {1,2} if x > 1}
+                # <Crystal>   {1, 2}.py_iter.select{|x| x > 1}.map{|x| x**2}.to_set
+                return self.fused_comprehension(node, i, self.visit(node.elt)) + ".to_set"
+            if isinstance(node.generators[0].target, ast.Name):
+                t = self.visit(node.generators[0].target)
+            else:
+                # ast.Tuple
+                self._tuple_type = ''
+                t = self.visit(node.generators[0].target)
+                self._tuple_type = '[]'
             # <Python> [x**2 for x in {1,2}]
             # <Crystal>   [1, 2].map{|x| x**2}.to_set
             return "%s.map{|%s| %s}.to_set" % (i, t, self.visit(node.elt))
-        else:
-            # <Python> [x**2 for x in {1,2} if x > 1]
-            # <Crystal>   {1, 2}.select {|x| x > 1 }.map{|x| x**2}.to_set
-            return "%s.select{|%s| %s}.map{|%s| %s}.to_set" % \
-                    (i, t, self.visit(node.generators[0].ifs[0]), t, \
-                     self.visit(node.elt))
 
     def visit_Lambda(self, node, style="normal") -> str:
         """
@@ -1702,98 +1931,152 @@ class RB(object):
         #                x.(y)
         #            end
         #            foo(-> {|x| print(a)}, a)
-        if style == "block":
-            return "{ |%s| %s }" % (self.visit(node.args), self.visit(node.body))
-        else:
-            return "->(%s) { %s }" % (self.visit(node.args), self.visit(node.body))
+        with self._symbols.new_scope(symbols.LAMBDA) as lambda_scope:
+            for arg in node.args.args:
+                lambda_scope.define(arg.arg, symbols.ARGUMENT)
+            if node.args.vararg:
+                lambda_scope.define(node.args.vararg.arg, symbols.ARGUMENT)
+            if style == "block":
+                return "{ |%s| %s }" % (self.visit(node.args), self.visit(node.body))
+            else:
+                return "->(%s) { %s }" % (self.visit(node.args), self.visit(node.body))
+
+    # node class -> method translating it to an ir expression
+    lowered_nodes = {
+        ast.BinOp    : 'lower_BinOp',
+        ast.BoolOp   : 'lower_BoolOp',
+        ast.UnaryOp  : 'lower_UnaryOp',
+        ast.Compare  : 'lower_Compare',
+        ast.Name     : 'lower_Name',
+        ast.Constant : 'lower_Constant',
+    }
+
+    def lower(self, node) -> ir.Expr:
+        """
+        IR of an expression: the operations are lowered with their
+        operands, the other expressions are the text of their visit.
+        """
+        lowerer = self.lowered_nodes.get(node.__class__)
+        if lowerer is not None:
+            return getattr(self, lowerer)(node)
+        text = self.visit(node)
+        if text.__class__ is not str:
+            text = str(text) # e.g. bytes literals
+        return text
+
+    # the leaves are not memoized (see leaf_nodes), they are translated
+    # without visit()
+    def lower_Name(self, node) -> ir.Expr:
+        return self.visit_Name(node)
+
+    def lower_Constant(self, node) -> ir.Expr:
+        text = self.visit_Constant(node)
+        if text.__class__ is not str:
+            text = str(text)
+        return text
 
     def visit_BoolOp(self, node) -> str:
-        return (" %s " % self.get_bool_op(node)).join([ "%s" % self.ope_filter(self.visit(val)) for val in node.values ])
+        return ir.emit(self.lower_BoolOp(node))
+
+    def lower_BoolOp(self, node) -> ir.Expr:
+        return ir.BoolOp(self.get_bool_op(node), [ir.operand(self.lower(val)) for val in node.values])
 
     def visit_UnaryOp(self, node) -> str:
+        return ir.emit(self.lower_UnaryOp(node))
+
+    def lower_UnaryOp(self, node) -> ir.Expr:
         oper = self.get_unary_op(node)
-        operand = self.visit(node.operand)
+        operand = self.lower(node.operand)
         # If we use a unary op on a simple item (constant/name), then just
         # use the unary op directly.  Otherwise put parenthesis around it
         simple_operand = isinstance(node.operand, (ast.Constant, ast.Name))
         if simple_operand:
-            return "%s%s" % (oper, operand)
+            return ir.UnaryOp(oper, operand)
         else:
-            return "%s(%s)" % (oper, operand)
+            return ir.UnaryOp(oper, ir.Group(operand))
 
     def visit_BinOp(self, node) -> str:
+        return ir.emit(self.lower_BinOp(node))
+
+    def lower_BinOp(self, node) -> ir.Expr:
         if isinstance(node.op, ast.Mod) and isinstance(node.left, ast.Str):
             left = self.visit(node.left)
             # 'b=%(b)0d and c=%(c)d and d=%(d)d' => 'b=%<b>0d and c=%<c>d and d=%<d>d'
             left = re.sub(r"(.+?%)\((.+?)\)(.+?)", r"\1<\2>\3", left)
             self._dict_format = True
-            right = self.visit(node.right)
+            right = self.lower(node.right)
             self._dict_format = False
-            return f"{left} % {right}"
-        left = self.visit(node.left)
-        right = self.visit(node.right)
+            return ir.BinOp(left, "%", right)
+        left = self.lower(node.left)
+        right = self.lower(node.right)
 
         if isinstance(node.op, ast.Pow):
-            return "%s ** %s" % (left, right)
+            return ir.BinOp(left, "**", right)
         if isinstance(node.op, ast.Div):
-            if re.search(r"Numo::", left) or re.search(r"Numo::", right):
-                return "%s / %s" % (self.ope_filter(left), self.ope_filter(right))
+            if (ir.flags(left) | ir.flags(right)) & ir.NUMO:
+                return ir.BinOp(ir.operand(left), "/", ir.operand(right))
             else:
-                return "%s / %s.to_f" % (self.ope_filter(left), self.ope_filter(right))
+                return ir.BinOp(ir.operand(left), "/", ir.MethodCall(ir.operand(right), "to_f"))
 
-        return "%s %s %s" % (self.ope_filter(left), self.get_binary_op(node), self.ope_filter(right))
+        return ir.BinOp(ir.operand(left), self.get_binary_op(node), ir.operand(right))
 
     @scope
     def visit_Compare(self, node) -> str:
         """
         Compare(expr left, cmpop* ops, expr* comparators)
         """
+        return ir.emit(self.lower_Compare(node))
+
+    def lower_Compare(self, node) -> ir.Expr:
         assert len(node.ops) == len(node.comparators)
 
-        def compare_pair(leftnode, compnode, op):
-            left = self.visit(leftnode)
-            comp = self.visit(compnode)
-            if (left == '__name__') and (comp == '"__main__"') or \
-               (left == '"__main__"') and (comp == '__name__'):
+        def compare_pair(leftnode, compnode, op) -> ir.Expr:
+            if not self._is_string_symbol and \
+               ((isinstance(leftnode, ast.Name) and leftnode.id == '__name__' and
+                 isinstance(compnode, ast.Constant) and compnode.value == '__main__') or
+                (isinstance(compnode, ast.Name) and compnode.id == '__name__' and
+                 isinstance(leftnode, ast.Constant) and leftnode.value == '__main__')):
                 # <Python>     __name__ == '__main__':
                 # <Crystal>    __FILE__ == PROGRAM_NAME
                 left = '__FILE__'
                 comp = 'PROGRAM_NAME'
+            else:
+                left = self.lower(leftnode)
+                comp = self.lower(compnode)
             # Cannot necessarily use includes?, as includes? is not
             # defined for Hashes in Crystal, so chose to define a py_in?
             # method on String/Array/Hash
             if isinstance(op, ast.In):
-                return f"{comp}.py_in?({left})"
+                return ir.MethodCall(comp, "py_in?", [left])
             elif isinstance(op, ast.NotIn):
-                return f"!{comp}.py_in?({left})"
+                return ir.UnaryOp("!", ir.MethodCall(comp, "py_in?", [left]))
             elif isinstance(op, ast.Eq):
-                return f"{left} == {comp}"
+                return ir.BinOp(left, "==", comp)
             elif isinstance(op, ast.NotEq):
-                return f"{left} != {comp}"
+                return ir.BinOp(left, "!=", comp)
             elif isinstance(op, ast.IsNot):
                 # unclear if we should handle this special case of
                 # is/is-not None specially, as #nil? is a compile-time
-                # method.  Also note that left/comp are already visited
-                # so we compare against a crystal string here.
-                if comp == "nil":
-                    return f"!{left}.nil?"
+                # method.
+                if isinstance(compnode, ast.Constant) and compnode.value is None:
+                    return ir.UnaryOp("!", ir.MethodCall(left, "nil?"))
                 else:
-                    return f"{left} != {comp}"
+                    return ir.BinOp(left, "!=", comp)
             elif isinstance(op, ast.Is):
                 # see note for IsNot handling
-                if comp == "nil":
-                    return f"{left}.nil?"
+                if isinstance(compnode, ast.Constant) and compnode.value is None:
+                    return ir.MethodCall(left, "nil?")
                 else:
-                    return f"{left} == {comp}"
+                    return ir.BinOp(left, "==", comp)
             else:
-                return "%s %s %s" % (left, self.get_comparison_op(op), comp)
+                return ir.BinOp(left, self.get_comparison_op(op), comp)
 
         # Early return for single compare operation
         if len(node.ops) == 1:
             return compare_pair(node.left, node.comparators[0], node.ops[0])
         
         # This handles python's `a < b < c` to convert to `(a < b) && (b < c)`
-        compare_list : List[str] = []
+        compare_list : List[ir.Expr] = []
         for i in range(len(node.ops)):
             if i == 0:
                 left = node.left
@@ -1802,8 +2085,8 @@ class RB(object):
             comp = node.comparators[i]
             op = node.ops[i]
             pair = compare_pair(left, comp, op)
-            compare_list.append('(' + pair + ')')
-        return ' && '.join(compare_list)
+            compare_list.append(ir.Group(pair))
+        return ir.BoolOp('&&', compare_list)
 
     # python 3
     def visit_Starred(self, node) -> str:
@@ -2172,7 +2455,7 @@ class RB(object):
         if not isinstance(node.func, ast.Call):
             self._call = True
         func = self.visit(node.func)
-        self.vprint("Call func_name[%s]" % func)
+        self.vprint("Call func_name[%s]", func)
         if not isinstance(node.func, ast.Call):
             self._call = False
 
@@ -2184,52 +2467,19 @@ class RB(object):
                 if base_func in self.methods_map.keys():
                     if 'option' in self.methods_map[base_func].keys():
                         opt = self.methods_map[base_func]['option']
-                        self.vprint("Call option: %s : %s" % (func, opt))
-
-        for f in self._import_files:
-            self.vprint("Call func: %s : f %s" % (func, f))
-            if func.startswith(f):
-                self.vprint("Call func: %s " % func)
-                func = func.replace(f + '.', '', 1)
-                # <Python>    imported.moduleb.moduleb_class
-                # <Crystal>   Imported::Moduleb::Moduleb_class (base_path_count=0)
-                #                       Moduleb::Moduleb_class (base_path_count=1)
-                if func in self._class_names:
-                    func = formatter.capitalize(func) + '.new'
-                # <Python>    * tests/modules/imported/modulec.py
-                #               import imported.submodules.submodulea
-                #               imported.submodules.submodulea.foo()
-                # <Crystal>   * tests/modules/imported/modulec.cr
-                #               require_relative "submodules/submodulea"
-                #               Submodules::Submodulea::foo()
-                base = '::'.join([formatter.capitalize(x) for x in f.split('.')[self._base_path_count:]])
-                if base != '':
-                    func = base + '.' + func # was '::'
-                self.vprint("Call func: %s" % func)
-                break
-
-            f = '.'.join(f.split('.')[self._base_path_count:])
-            x = [x for x in self._rel_path if x.startswith(f + '.')]
-            if len(x) != 0:
-                f = x[0].replace(f + '.', '')
-
-            if func.startswith(f):
-                self.vprint("Call mod_paths : func : %s " % func)
-                func = func.replace(f + '.', '')
-                if func in self._class_names:
-                    func = formatter.capitalize(func) + '.new'
-                # <Python>    * tests/modules/imported/modulee.py
-                #               from imported.submodules import submodulea
-                #               submodulea.foo()
-                # <Crystal>   * tests/modules/imported/modulee.cr
-                #               require_relative 'submodules/submodulea'
-                #               include Submodules
-                #               Submodulea::foo()
-                base = '::'.join([formatter.capitalize(x) for x in f.split('.')])
-                if base != '':
-                    func = base + '::' + func
-                self.vprint("Call func: %s" % func)
-                break
+                        self.vprint("Call option: %s : %s", func, opt)
+
+        # [Imported Module Call] : see symbols.ImportResolver
+        # <Python>    imported.moduleb.moduleb_fn()
+        # <Crystal>   Imported::Moduleb.moduleb_fn()
+        resolved = self._symbols.resolver.resolve(func)
+        if resolved is not None:
+            func, base, separator = resolved
+            if func in self._class_names:
+                func = formatter.capitalize(func) + '.new'
+            if base != '':
+                func = base + separator + func
+            self.vprint("Call func: %s", func)
 
         # [Class Instance Create] :
         # <Python>    foo()
@@ -2257,7 +2507,7 @@ class RB(object):
             ins = ''
         else:
             ins, method = func.split('.', 1)
-            if (method in self._class_functions):
+            if self._symbols.is_member(method, symbols.CLASS_FUNCTION):
                 is_static = True
             if (ins in self._classes_class_functions_args) and \
                (method in self._classes_class_functions_args[ins]) and \
@@ -2304,7 +2554,7 @@ class RB(object):
         #    else:
         #       cry_args.append(self.visit(arg))
         # ast.Tuple, ast.List, ast.*
-        cry_args_base = copy.deepcopy(cry_args)
+        cry_args_base = list(cry_args) # the arguments are immutable text
         if node.keywords:
             # [Keyword Argument] :
             # <Python>    foo(1, fuga=2):
@@ -2331,12 +2581,12 @@ class RB(object):
 
         # de-alias the modulename to look it up for translation
         dealias_modulename = self._module_aliases.get(func_modulename, func_modulename)
-        self.vprint(f"looking up: module({func_modulename}=>{dealias_modulename}) func=({funcdb.func_name})")
+        self.vprint("looking up: module(%s=>%s) func=(%s)", func_modulename, dealias_modulename, funcdb.func_name)
 
 
         lkfunc = registry.func_lookup(dealias_modulename, funcdb.func_name)
         if lkfunc:
-            return lkfunc(funcdb)
+            return self.translate_call(lkfunc, funcdb)
 
         if func in self.ignore.keys():
             # [Function convert to Method]
@@ -2395,7 +2645,7 @@ class RB(object):
             # <Python>    ' '.join(['a', 'b'])
             # <Crystal>   ['a', 'b'].join(' ')
             return "%s.%s" % (cry_args_s, func)
-        elif isinstance(node.func, ast.Lambda) or (func in self._lambda_functions):
+        elif isinstance(node.func, ast.Lambda) or (self._symbols.lookup(func) == symbols.PROC):
             # [Lambda Call] :
             # <Python>    (lambda x:x*x)(4)
             # <Crystal>   lambda{|x| x*x}.call(4)
@@ -2406,12 +2656,12 @@ class RB(object):
             return "%s.call(%s)" % (func, cry_args_s)
         elif self._class_name:
             # [Inherited Instance Method]
-            self.vprint("self._classes_base_classes : %s" % self._classes_base_classes[self._class_name])
+            self.vprint("self._classes_base_classes : %s", self._classes_base_classes[self._class_name])
             for base_class in self._classes_base_classes[self._class_name]:
                 base_func = "%s.%s" % (base_class, func)
-                self.vprint("base_func : %s" % base_func)
+                self.vprint("base_func : %s", base_func)
                 if base_func in self.methods_map.keys():
-                    self.vprint("Call Inherited Instance Method : %s : base_func %s" % (base_func, cry_args))
+                    self.vprint("Call Inherited Instance Method : %s : base_func %s", base_func, cry_args)
                     return self.get_methods_map(self.methods_map[base_func], cry_args, ins)
                 if base_func in self.order_methods_with_bracket.keys():
                     # [Inherited Instance Method] :
@@ -2419,7 +2669,7 @@ class RB(object):
                     # <Crystal>   assert_equal()
                     return "%s(%s)" % (self.order_methods_with_bracket[base_func], ','.join(cry_args))
 
-        if (func in self._scope or func[0] == '@') and \
+        if (self._symbols.lookup(func) is not None or func[0] == '@') and \
            func.find('.') == -1: # Proc call
             return "%s.py_call(%s)" % (func, cry_args_s)
 
@@ -2462,7 +2712,7 @@ class RB(object):
             attr_modname = ''
             mod_attr = ''
 
-        self.vprint(f"Attribute attr_name[{attr}] mod={attr_modname} mod_attr={mod_attr}")
+        self.vprint("Attribute attr_name[%s] mod=%s mod_attr=%s", attr, attr_modname, mod_attr)
 
         if not (isinstance(node.value, ast.Name) and (node.value.id == 'self')):
             renamed_attr = registry.attr_lookup(attr_modname, attr)
@@ -2524,20 +2774,20 @@ class RB(object):
             #            end
             if isinstance(node.value.func, ast.Name):
                 if node.value.func.id == 'super':
-                    if attr == self._function[-1]:
+                    if attr == self._symbols.function_name():
                         return "super"
-                    elif attr in self._self_functions:
+                    elif self._symbols.is_member(attr, symbols.SELF_FUNCTION):
                         return "public_method(:%s).super_method.call" % attr
                     else:
                         return attr
         elif isinstance(node.value, ast.Name):
             if node.value.id == 'self':
-                if attr in self._class_functions:
+                if self._symbols.is_member(attr, symbols.CLASS_FUNCTION):
                     # [Class Method] :
                     # <Python>    self.bar()
                     # <Crystal>   Foo.bar()
                     return "%s.%s" % (self._rclass_name, attr)
-                elif attr in self._self_functions:
+                elif self._symbols.is_member(attr, symbols.SELF_FUNCTION):
                     # [Instance Method] :
                     # <Python>    self.bar()
                     # <Crystal>   bar()
@@ -2562,7 +2812,7 @@ class RB(object):
                         # [Instance Variable] :
                         # <Python> self.bar
                         # <Crystal>   @bar
-                        self._class_self_variables.append(attr)
+                        self._symbols.define_member(attr, symbols.INSTANCE_VARIABLE)
                         return "@%s" % (attr)
             elif self._class_name and (node.value.id in self._classes_base_classes[self._class_name]):
                 # [Inherited Class method call]
@@ -2583,15 +2833,15 @@ class RB(object):
                 #                 super(name)
                 #             end
                 #         end
-                if attr == self._function[-1]:
+                if attr == self._symbols.function_name():
                     return "super"
-                elif attr in self._self_functions:
+                elif self._symbols.is_member(attr, symbols.SELF_FUNCTION):
                     return "public_method(:%s).super_method.call" % attr
                 else:
                     return attr
 
             elif node.value.id == self._class_name:
-                if attr in self._class_variables:
+                if self._symbols.is_member(attr, symbols.CLASS_VARIABLE):
                     # [class variable] :
                     # <Python>    foo.bar
                     # <Crystal>   @@bar
@@ -2740,9 +2990,8 @@ class RB(object):
         name = self.visit(node.value)
         filtname = self.ope_filter(name)
         if isinstance(node.slice, (ast.Index, ast.Constant, ast.Name)):
-            for arg in self._function_args:
-                if arg == f"**{name}":
-                    self._is_string_symbol = True
+            if self._symbols.lookup(name) == symbols.KWARG:
+                self._is_string_symbol = True
             index = self.visit(node.slice)
             self._is_string_symbol = False
             return "%s[%s]" % (filtname, index)
@@ -2807,11 +3056,286 @@ class RB(object):
             self.maybewarn("empty-dict infer issue (%s line:%d col:%d)" % (node, node.lineno, node.col_offset))
             return "{}"
 
+    def translate_call(self, translator, funcdb : FuncCall) -> str:
+        """Translate a call with a CrystalTranslator function"""
+        return translator(funcdb)
+
+    def translate_statement(self, stmt : ast.stmt) -> None:
+        """Translate a top-level statement of the module"""
+        self.visit(stmt)
+
+class ProfilingRB(RB):
+    """
+    RB whose visit_* methods and CrystalTranslator functions are timed
+    into a profiler.Profiler.  The timing wrappers are put in the
+    dispatch table of this class, so RB itself is not slowed down.
+    Memoized expressions are only counted when actually translated.
+    """
+
+    def __init__(self, *args, profile : Optional[profiler.Profiler] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile = profile if profile is not None else profiler.Profiler()
+
+    @classmethod
+    def dispatch(cls, node_class : type) -> Tuple[object, int, bool, bool, bool]:
+        visitor, convention, declaration, memo, statement = super().dispatch(node_class)
+        if not hasattr(visitor, 'profiled'):
+            visitor = cls.profiled(visitor)
+            cls._dispatch_table[node_class] = (visitor, convention, declaration, memo, statement)
+        return (visitor, convention, declaration, memo, statement)
+
+    @staticmethod
+    def profiled(visitor):
+        name = visitor.__name__
+        def timed(self, node, *args, **kwargs):
+            return self.profile.call(name, node, visitor, self, node, *args, **kwargs)
+        timed.profiled = True
+        return timed
+
+    def translate_call(self, translator, funcdb : FuncCall) -> str:
+        name = translator.__qualname__
+        return self.profile.call(name, funcdb.node, translator, funcdb)
+
+class IncrementalRB(RB):
+    """
+    RB splicing the unchanged top-level definitions of a module from an
+    incremental.DefinitionCache instead of visiting them again.  The
+    module body is made of incremental.Segments instead of statements,
+    so that the spliced definitions are not even parsed.
+    """
+
+    def __init__(self, *args, definitions : Optional[incremental.DefinitionCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._definitions = definitions if definitions is not None else incremental.DefinitionCache()
+        # name -> RB table -> digest of its value, see incremental.StateDelta
+        self._bindings : Dict[str, Dict[str, str]] = {}
+        # key of the last segment whose changes are not known
+        self._epoch = ''
+
+    def translate_statement(self, segment : incremental.Segment) -> None:
+        names, is_definition = self._definitions.segment(segment)
+        key = incremental.statement_key(segment.digest, names, self._bindings, self._epoch)
+
+        definition = self._definitions.get(key) if is_definition else None
+        if definition is not None and definition.dummy not in (None, self.dummy):
+            definition = None # numbered its dummy variables from another start
+        if definition is not None:
+            positions = definition.positions
+            if positions is not None:
+                positions = [None if p is None else (p[0] + segment.lineno - 1, p[1]) for p in positions]
+            self.splice(definition.text, positions)
+            delta = definition.delta
+            delta.apply(self)
+        else:
+            snapshot = incremental.StateSnapshot(self, names)
+            mark = self.mark()
+            result = self.get_result()
+            stderr = incremental.StreamWatch(sys.stderr)
+            with contextlib.redirect_stderr(stderr):
+                for stmt in segment.parse():
+                    self.visit(stmt)
+            delta = snapshot.delta(self)
+            if delta is None:
+                self._epoch = key
+                return
+            # warnings are not replayed, definitions with warnings are
+            # translated every time
+            if is_definition and not stderr.written and self.get_result() == result:
+                text, positions = self.since(mark)
+                if positions is not None:
+                    positions = [None if p is None else (p[0] - segment.lineno + 1, p[1]) for p in positions]
+                self._definitions.put(key, incremental.Definition(text, positions, delta,
+                                                                  snapshot.dummy if delta.dummies else None))
+        for name, table, value in delta.bindings():
+            self._bindings.setdefault(name, {})[table] = value
+
+class ProfilingIncrementalRB(ProfilingRB, IncrementalRB):
+    """
+    IncrementalRB timed like ProfilingRB: the profile of a module
+    translated again only has the definitions that changed.
+    """
+
+class ModuleSummary:
+    """
+    The names that a module makes visible to the modules importing it:
+    classes (with their bases, methods, argument defaults and variables),
+    functions with their keyword defaults, and import aliases.
+
+    A summary is computed once per module and then seeds the `RB` visitor
+    of every target that depends on it, instead of re-parsing and
+    re-visiting the dependency for each target.
+    """
+
+    # RB attributes captured into the summary, by container type
+    set_fields = ('_class_names', '_rclass_names')
+    dict_fields = ('_classes_base_classes',
+                   '_functions',
+                   '_functions_rb_args_default',
+                   '_classes_functions',
+                   '_classes_self_functions',
+                   '_classes_self_functions_args',
+                   '_classes_class_functions_args',
+                   '_classes_variables',
+                   '_module_aliases')
+
+    def __init__(self, path : str = ''):
+        self.path = path
+        self.source_digest = ''
+        self.fields : Dict[str, object] = {}
+        self._digest : Optional[str] = None
+
+    @classmethod
+    def from_visitor(cls, visitor, path : str = '') -> 'ModuleSummary':
+        summary = cls(path)
+        for name in cls.set_fields + cls.dict_fields:
+            summary.fields[name] = getattr(visitor, name)
+        # imported modules of the module scope (name -> module name)
+        summary.fields['imports'] = visitor._symbols.module.imports
+        return summary
+
+    @classmethod
+    def from_source(cls, s : str, path : str = '', verbose : bool = False) -> 'ModuleSummary':
+        """
+        Parse and visit the module source `s` in NO_ERROR mode, which only
+        looks at imports, classes and function definitions.
+        """
+        visitor = RB(verbose=verbose)
+        visitor.mode(OperationMode.NO_ERROR)
+        visitor.visit(ast.Module(body=chunked.iter_statements(s), type_ignores=[]))
+        visitor.clear() # drop the crystal code, only the names are needed
+        summary = cls.from_visitor(visitor, path)
+        summary.source_digest = cache.digest(s)
+        return summary
+
+    def digest(self) -> str:
+        """Content hash of the summary, independent of set/dict ordering"""
+        if self._digest is None:
+            fields = {}
+            for name, value in self.fields.items():
+                fields[name] = sorted(value) if isinstance(value, set) else value
+            self._digest = cache.digest(json.dumps(fields, sort_keys=True))
+        return self._digest
+
+    def seed(self, visitor) -> None:
+        """Merge the names of this module into the visitor"""
+        for name in self.set_fields:
+            getattr(visitor, name).update(self.fields[name])
+        for name in self.dict_fields:
+            getattr(visitor, name).update(self.fields[name])
+        for name, module in self.fields['imports'].items():
+            visitor._symbols.add_import(name, module)
+
+class ModuleSummaryTable:
+    """
+    Per-run table of ModuleSummary, keyed by python file path.
+    Each module is read, parsed and summarized at most once.
+    """
 
-def convert_py2cr(s : str, dir_path : str , path : str = '', base_path_count : int = 0, modules : List[str] = None, mod_paths : Dict[str, str] = None, no_stop : bool = False, verbose : bool = False):
+    def __init__(self, verbose : bool = False, translation_cache : Optional[cache.TranslationCache] = None):
+        self._verbose = verbose
+        self._summaries : Dict[str, ModuleSummary] = {}
+        self._sources : Dict[str, str] = {}
+        self._source_digests : Dict[str, str] = {}
+        self._digests : Dict[str, str] = {}
+        # (mtime, size) of the sources read, see refresh()
+        self._stamps : Dict[str, Tuple[int, int]] = {}
+        self.cache = translation_cache
+
+    def __contains__(self, path : str) -> bool:
+        return path in self._summaries
+
+    def add(self, summary : ModuleSummary) -> None:
+        self._summaries[summary.path] = summary
+
+    def source(self, path : str) -> str:
+        s = self._sources.get(path)
+        if s is None:
+            st = os.stat(path)
+            with open(path, 'r', encoding="utf-8") as f:
+                s = f.read()
+            self._sources[path] = s
+            self._stamps[path] = (st.st_mtime_ns, st.st_size)
+        return s
+
+    def invalidate(self, path : str) -> None:
+        """Forget the source and summary of a module"""
+        for table in (self._summaries, self._sources, self._source_digests, self._digests, self._stamps):
+            table.pop(path, None)
+
+    def refresh(self) -> List[str]:
+        """
+        Invalidate the modules whose file changed since it was read and
+        return their paths.  A long-running process (see server.py) calls
+        this before reusing the table.
+        """
+        changed = []
+        for path, stamp in list(self._stamps.items()):
+            try:
+                st = os.stat(path)
+                current = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                current = None
+            if current != stamp:
+                self.invalidate(path)
+                changed.append(path)
+        return changed
+
+    def source_digest(self, path : str) -> str:
+        d = self._source_digests.get(path)
+        if d is None:
+            d = self._source_digests[path] = cache.digest(self.source(path))
+        return d
+
+    def get(self, path : str) -> ModuleSummary:
+        summary = self._summaries.get(path)
+        if summary is None:
+            summary = ModuleSummary.from_source(self.source(path), path, verbose=self._verbose)
+            self._summaries[path] = summary
+        return summary
+
+    def digest(self, path : str) -> str:
+        """
+        Digest of the summary of a module.  With a translation cache this
+        is looked up by source hash, so unchanged modules are not parsed.
+        """
+        d = self._digests.get(path)
+        if d is None:
+            summary = self._summaries.get(path)
+            if summary is None and self.cache is not None:
+                d = self.cache.load_summary_digest(self.source_digest(path))
+            if d is None:
+                summary = summary or self.get(path)
+                d = summary.digest()
+                if self.cache is not None:
+                    self.cache.store_summary_digest(summary.source_digest, d)
+            self._digests[path] = d
+        return d
+
+def convert_py2cr(s : str, dir_path : str , path : str = '', base_path_count : int = 0, modules : List[str] = None, mod_paths : Dict[str, str] = None, no_stop : bool = False, verbose : bool = False, summaries : List[ModuleSummary] = None, sink = None, profile = False, source_map = None, definitions = None, low_memory = False):
     """
     Takes Python code as a string 's' and converts this to Crystal.
 
+    Names defined by dependencies are taken from `summaries`
+    (see ModuleSummary), or summarized from the sources in `modules`.
+
+    With a file-like `sink`, the Crystal code is written to it while
+    translating, in chunks of complete top-level statements, and the
+    returned data is empty.
+
+    With `profile=True` the time spent in each visitor and translator is
+    printed to stderr (see profiler.Profiler); a Profiler instance is
+    filled instead, to collect several translations.
+
+    A sourcemap.SourceMap `source_map` receives the python position of
+    every line of the returned (or streamed) data.
+
+    An incremental.DefinitionCache `definitions`, kept between the
+    translations of a module, holds its top-level definitions: those
+    unchanged since the previous translation are not translated again.
+
+    With `low_memory`, the source is parsed in smaller chunks and every
+    statement is released once translated, for very large modules.
+
     Example:
 
     >>> convert_py2cr("x[3:]")
@@ -2820,53 +3344,73 @@ def convert_py2cr(s : str, dir_path : str , path : str = '', base_path_count : i
     """
     modules = modules or []
     mod_paths = mod_paths or {}
+    summaries = list(summaries or [])
+    summaries.extend(ModuleSummary.from_source(m, verbose=verbose) for m in modules)
 
     # get modules information
-    visitor = RB(path, dir_path, base_path_count, mod_paths, verbose=verbose)
-    visitor.mode(2)
-    for m in modules:
-        t = ast.parse(m)
-        visitor.visit(t)
-        visitor.clear() # clear self.__buffer
-
-    # convert target file
-    target_file = ast.parse(s)
+    if definitions is not None:
+        definitions.start(cache.digest(cache.translator_fingerprint(), path, dir_path, str(base_path_count),
+                                       json.dumps(list(mod_paths.items())), str(source_map is not None),
+                                       *[summary.digest() for summary in summaries]))
+    if profile:
+        profile_report = not isinstance(profile, profiler.Profiler)
+        if profile_report:
+            profile = profiler.Profiler()
+        if definitions is not None:
+            # the spliced definitions are not visited, so not profiled
+            visitor = ProfilingIncrementalRB(path, dir_path, base_path_count, mod_paths, verbose=verbose, sink=sink,
+                                             profile=profile, source_map=source_map is not None,
+                                             definitions=definitions, low_memory=low_memory)
+        else:
+            visitor = ProfilingRB(path, dir_path, base_path_count, mod_paths, verbose=verbose, sink=sink, profile=profile,
+                                  source_map=source_map is not None, low_memory=low_memory)
+    elif definitions is not None:
+        visitor = IncrementalRB(path, dir_path, base_path_count, mod_paths, verbose=verbose, sink=sink,
+                                source_map=source_map is not None, definitions=definitions, low_memory=low_memory)
+    else:
+        visitor = RB(path, dir_path, base_path_count, mod_paths, verbose=verbose, sink=sink, source_map=source_map is not None,
+                     low_memory=low_memory)
+    for summary in summaries:
+        summary.seed(visitor)
+
+    # convert target file, parsed one chunk of top-level statements at
+    # a time (the module body is a generator)
+    if isinstance(visitor, IncrementalRB):
+        target_file = ast.Module(body=incremental.segments(s, definitions), type_ignores=[])
+    elif low_memory:
+        target_file = ast.Module(body=chunked.iter_statements(s, chunked.LOW_MEMORY_CHUNK_SIZE, release=True), type_ignores=[])
+    else:
+        target_file = ast.Module(body=chunked.iter_statements(s), type_ignores=[])
     if no_stop:
-        visitor.mode(1)
+        visitor.mode(OperationMode.WARNING)
     else:
-        visitor.mode(0)
+        visitor.mode(OperationMode.STOP)
     visitor.visit(target_file)
+    visitor.flush()
+    if definitions is not None:
+        definitions.finish()
+    if profile and profile_report:
+        profile.write_table(sys.stderr)
 
     data = visitor.read()
+    if source_map is not None:
+        source_map.lines = visitor.positions()
     visitor.clear() # clear self.__buffer
 
     header = visitor.read()
 
     return (visitor.get_result(), header, data)
 
-def convert_py2cr_write(filename, base_path_count=0, subfilenames=None, base_path=None, require=None, output=None, force=None, no_stop=False, verbose=False):
-    subfilenames = subfilenames or []
-
-    if output:
-        if not force:
-            if os.path.exists(output):
-                sys.stderr.write('Skip : %s already exists.\n' % output)
-                return 3
-        output = open(output, "w", encoding="utf-8")
-    else:
-        output = sys.stdout
-
-    if require:
-        output.write("require \"py2cr\"\n")
-
-    mods = []
+def _module_paths(filename : str, subfilenames : List[str], base_path : Optional[str]) -> Tuple[Dict[str, str], str, str]:
+    """
+    (dependency path -> name relative to filename, dir_path, name_path)
+    arguments of convert_py2cr for the python file `filename`.
+    """
     mod_paths = OrderedDict()
-    for sf in subfilenames:
+    for sf in sorted(subfilenames):
         rel_path = os.path.relpath(sf, os.path.dirname(filename))
         name_path, _ext = os.path.splitext(rel_path)
         mod_paths[sf] = name_path
-        with open(sf, 'r', encoding="utf-8") as f:
-            mods.append(f.read()) #unsafe for large files!
     name_path = ''
     dir_path = ''
     if base_path:
@@ -2878,23 +3422,344 @@ def convert_py2cr_write(filename, base_path_count=0, subfilenames=None, base_pat
             name_path, _ext = os.path.splitext(rel_path)
         else:
             dir_path = ''
-    with open(filename, 'r', encoding="utf-8") as f:
-        s = f.read() # unsafe for large files!
-        rtn, header, data = convert_py2cr(s, dir_path, name_path, base_path_count, mods, mod_paths, no_stop=no_stop, verbose=verbose)
-        if require:
-            output.write(header)
+    return (mod_paths, dir_path, name_path)
+
+class StreamRecorder:
+    """Stream wrapper keeping the text written to it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.texts : List[str] = []
+
+    def write(self, text : str) -> int:
+        self.texts.append(text)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+def convert_py2cr_write(filename, base_path_count=0, subfilenames=None, base_path=None, require=None, output=None, force=None, no_stop=False, verbose=False, summaries=None, profile=None, source_map=False, definitions=None,
+                        low_memory=False):
+    """
+    Convert the python file `filename` and write the result to `output`
+    (or stdout).  When the ModuleSummaryTable `summaries` has a translation
+    cache, an unchanged file is written from the cache without parsing it.
+    The translation is recorded in the profiler.Profiler `profile`, if any.
+    With `source_map`, the source map of the output is written to
+    `output + '.map'` (see sourcemap.SourceMap).  `definitions` and
+    `low_memory` are passed to convert_py2cr().
+    """
+    subfilenames = subfilenames or []
+    summaries = summaries if summaries is not None else ModuleSummaryTable(verbose=verbose)
+
+    smap = None
+    if output:
+        if not force:
+            if os.path.exists(output):
+                sys.stderr.write('Skip : %s already exists.\n' % output)
+                return 3
+        if source_map:
+            smap = sourcemap.SourceMap(os.path.basename(output),
+                                       os.path.relpath(filename, os.path.dirname(os.path.abspath(output))))
+        output = open(output, "w", encoding="utf-8")
+    else:
+        output = sys.stdout
+
+    if require:
+        output.write("require \"py2cr\"\n")
+
+    mod_paths, dir_path, name_path = _module_paths(filename, subfilenames, base_path)
+
+    s = summaries.source(filename) # unsafe for large files!
+    key = None
+    cached = None
+    if summaries.cache is not None:
+        options = [dir_path, name_path, base_path_count, list(mod_paths.items()), no_stop]
+        if smap is not None:
+            options.append('source_map')
+        key = summaries.cache.key(s, [summaries.digest(sf) for sf in mod_paths], options)
+        cached = summaries.cache.load(key)
+        if cached is not None and smap is not None:
+            mappings = summaries.cache.load_source_map(key)
+            if mappings is None:
+                cached = None
+            else:
+                smap.set_mappings(mappings)
+    if profile is not None:
+        profile.filename = filename
+    # the warnings of a translation are cached with it, and written again
+    # when it is read from the cache
+    stderr = StreamRecorder(sys.stderr)
+    if cached is not None:
+        result, header, data, warnings = cached
+        rtn = ResultStatus(result)
+        for warning in warnings:
+            sys.stderr.write(warning)
+    elif output is not sys.stdout:
+        # stream the translation into the output file
+        mod_summaries = [summaries.get(sf) for sf in mod_paths]
+        start = output.tell()
+        with contextlib.redirect_stderr(stderr):
+            rtn, header, data = convert_py2cr(s, dir_path, name_path, base_path_count, mod_paths=mod_paths, no_stop=no_stop, verbose=verbose, summaries=mod_summaries, sink=output, profile=profile, source_map=smap, definitions=definitions,
+                                               low_memory=low_memory)
+        if key is not None:
+            output.flush()
+            # copied from the output file in chunks, the translation is
+            # never held in memory as a whole
+            with open(output.name, 'r', encoding="utf-8") as f:
+                f.seek(start)
+                summaries.cache.store(key, rtn.value, header, cache.read_chunks(f), stderr.texts)
+            if smap is not None:
+                summaries.cache.store_source_map(key, smap.mappings())
+    else:
+        mod_summaries = [summaries.get(sf) for sf in mod_paths]
+        with contextlib.redirect_stderr(stderr):
+            rtn, header, data = convert_py2cr(s, dir_path, name_path, base_path_count, mod_paths=mod_paths, no_stop=no_stop, verbose=verbose, summaries=mod_summaries, profile=profile, definitions=definitions,
+                                               low_memory=low_memory)
+        if key is not None:
+            summaries.cache.store(key, rtn.value, header, data, stderr.texts)
+    if require:
+        output.write(header)
+    if cached is not None:
+        output.writelines(data) # chunks read from the cache
+    else:
         output.write(data)
 
     # close the filehandle if it isnt stdout.
     if output is not sys.stdout:
         output.close()
+        if smap is not None:
+            if require:
+                smap.prepend(1) # require "py2cr"
+            smap.write(output.name + '.map')
     return rtn
 
+class ConvertResult:
+    """Translation of one source by convert_many()"""
+
+    __slots__ = ('path', 'status', 'header', 'data', 'warnings', 'error', 'seconds', 'source_map')
+
+    def __init__(self, path : str, status : ResultStatus, header : str = '', data : str = '',
+                 warnings : Optional[List[str]] = None, error : Optional[str] = None, seconds : float = 0.0,
+                 source_map : Optional[sourcemap.SourceMap] = None):
+        self.path = path
+        self.status = status
+        self.header = header     # crystal requires
+        self.data = data         # crystal code
+        self.warnings = warnings or []
+        self.error = error       # exception raised by the translation
+        self.seconds = seconds
+        self.source_map = source_map # python positions of the lines of data
+
+    def __repr__(self) -> str:
+        return "ConvertResult(%s %s %.3fs)" % (self.path, self.status.name, self.seconds)
+
+def convert_many(items, base_path : Optional[str] = None, base_path_count : int = 0, no_stop : bool = True,
+                 verbose : bool = False, summaries : Optional[ModuleSummaryTable] = None,
+                 profile : Optional[profiler.Profiler] = None, graph : Optional[importgraph.ImportGraph] = None,
+                 source_map : bool = False, low_memory : bool = False):
+    """
+    Translate the python sources of the (path, source) pairs in `items`
+    and yield a ConvertResult for each, in order, as soon as it is done.
+
+    `items` may be any iterable (a generator reading files, for example),
+    only one source is held at a time.  The local imports of each source
+    are resolved from its path like convert_py2cr_write() does, against
+    `base_path` or the directory of the path.  Dependencies are read from
+    disk, and their import lists and summaries are shared by all the
+    translations (and kept in `summaries`, if given).
+
+    An exception while translating a source is reported in its result
+    with status INCLUDE_ERROR, and the next sources are translated.
+    All the translations are recorded in the profiler.Profiler `profile`,
+    if given.  An ImportGraph already holding the items (see
+    build_project()) is used for the items under its base directory.
+    With `source_map`, each result has the sourcemap.SourceMap of its data.
+    `low_memory` is passed to convert_py2cr().
+    """
+    summaries = summaries if summaries is not None else ModuleSummaryTable(verbose=verbose)
+    graphs : Dict[str, importgraph.ImportGraph] = {}
+    if graph is not None:
+        graphs[graph.base_dir_path] = graph
+    current : Dict[str, str] = {}
+
+    def read_source(path : str) -> str:
+        s = current.get(path)
+        return s if s is not None else summaries.source(path)
+
+    for path, s in items:
+        start = time.perf_counter()
+        if profile is not None:
+            profile.filename = path or '<string>'
+        err = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(err):
+                mod_paths : Dict[str, str] = {}
+                dir_path = name_path = ''
+                if path:
+                    path = os.path.normpath(path)
+                    base_dir_path = base_path or os.path.dirname(path)
+                    graph = graphs.get(base_dir_path)
+                    if graph is None:
+                        graph = graphs[base_dir_path] = importgraph.ImportGraph(base_dir_path, read_source=read_source,
+                                                                                translation_cache=summaries.cache)
+                    current[path] = s
+                    try:
+                        graph.add(path)
+                    finally:
+                        del current[path]
+                    mod_paths, dir_path, name_path = _module_paths(path, graph.reachable(path), base_dir_path)
+                smap = sourcemap.SourceMap(source=path) if source_map else None
+                rtn, header, data = convert_py2cr(s, dir_path, name_path, base_path_count, mod_paths=mod_paths,
+                                                  no_stop=no_stop, verbose=verbose,
+                                                  summaries=[summaries.get(sf) for sf in mod_paths], profile=profile,
+                                                  source_map=smap, low_memory=low_memory)
+            result = ConvertResult(path, rtn, header, data, source_map=smap)
+        except Exception as e:
+            result = ConvertResult(path, ResultStatus.INCLUDE_ERROR, error="%s: %s" % (type(e).__name__, e))
+        result.warnings = [line for line in err.getvalue().splitlines() if line]
+        result.seconds = time.perf_counter() - start
+        yield result
+
+def build_project(pkg_dir : str, out_dir : Optional[str] = None, base_path : Optional[str] = None,
+                  base_path_count : int = 0, require : bool = True, entry : Optional[str] = None,
+                  verbose : bool = False, summaries : Optional[ModuleSummaryTable] = None,
+                  source_map : bool = False, low_memory : bool = False):
+    """
+    Translate every python module under `pkg_dir` into the same relative
+    path under `out_dir` (default: next to the modules), and write an
+    entry file `entry` (default: <pkg_dir name>.cr in out_dir) that
+    requires all the modules, every module after the ones it imports.
+
+    The modules share one import graph and one table of module summaries,
+    so each module is read, scanned for imports and summarized once.
+    Yields (py_path, cr_path, ConvertResult) for each module in build
+    order, and (None, entry path, None) once the entry file is written.
+    With `source_map`, a `.cr.map` file is written next to each module.
+    `low_memory` is passed to convert_py2cr().
+    """
+    pkg_dir = os.path.normpath(pkg_dir)
+    out_dir = os.path.normpath(out_dir or pkg_dir)
+    base_path = os.path.normpath(base_path or pkg_dir)
+    summaries = summaries if summaries is not None else ModuleSummaryTable(verbose=verbose)
+
+    graph = importgraph.ImportGraph(base_path, read_source=summaries.source,
+                                    translation_cache=summaries.cache, verbose=verbose)
+    for dirpath, dirnames, filenames in os.walk(pkg_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.') and d != '__pycache__')
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                graph.add(os.path.normpath(os.path.join(dirpath, filename)))
+    # only the modules of the tree, not those imported from outside
+    plan = [path for path in graph.build_plan() if not os.path.relpath(path, pkg_dir).startswith('..')]
+    outputs = OrderedDict((path, os.path.join(out_dir, os.path.splitext(os.path.relpath(path, pkg_dir))[0] + '.cr'))
+                          for path in plan)
+    entry = os.path.join(out_dir, entry or os.path.basename(os.path.abspath(pkg_dir)) + '.cr')
+    if entry in outputs.values():
+        raise ValueError("entry file %s is also the output of a module" % entry)
+    if verbose:
+        for cycle in graph.cycles:
+            print("import cycle: %s" % " -> ".join(cycle + cycle[:1]))
+
+    items = ((path, summaries.source(path)) for path in plan)
+    for result in convert_many(items, base_path, base_path_count, verbose=verbose, summaries=summaries, graph=graph,
+                               source_map=source_map, low_memory=low_memory):
+        output = outputs[result.path]
+        if result.error is None:
+            os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+            with open(output, "w", encoding="utf-8") as f:
+                if require:
+                    f.write("require \"py2cr\"\n")
+                    f.write(result.header)
+                f.write(result.data)
+            if source_map:
+                smap = result.source_map
+                smap.file = os.path.basename(output)
+                smap.source = os.path.relpath(result.path, os.path.dirname(os.path.abspath(output)))
+                if require:
+                    smap.prepend(1 + result.header.count("\n"))
+                smap.write(output + '.map')
+        yield (result.path, output, result)
+
+    os.makedirs(os.path.dirname(entry) or '.', exist_ok=True)
+    with open(entry, "w", encoding="utf-8") as f:
+        f.write("# modules of %s in dependency order\n" % pkg_dir)
+        for output in outputs.values():
+            rel_path = os.path.splitext(os.path.relpath(output, os.path.dirname(entry)))[0]
+            f.write("require \"./%s\"\n" % rel_path.replace(os.sep, '/'))
+    yield (None, entry, None)
+
+def _summarize_job(path : str, verbose : bool) -> ModuleSummary:
+    with open(path, 'r', encoding="utf-8") as f:
+        return ModuleSummary.from_source(f.read(), path, verbose=verbose)
+
+def _convert_job(py_path, subfilenames, output, convert_args, mod_summaries, translation_cache):
+    # runs in a worker process: dependency summaries come pre-parsed
+    # from the parent instead of being read again.
+    summaries = ModuleSummaryTable(verbose=convert_args['verbose'], translation_cache=translation_cache)
+    for summary in mod_summaries:
+        summaries.add(summary)
+    profile = None
+    if convert_args.get('profile') is not None:
+        # the worker profiles into its own Profiler, merged by the parent
+        profile = profiler.Profiler()
+        convert_args = dict(convert_args, profile=profile)
+    rtn = convert_py2cr_write(py_path, subfilenames=subfilenames, output=output,
+                              summaries=summaries, **convert_args)
+    return (rtn, profile)
+
+def convert_py2cr_tasks(tasks, convert_args, summaries : ModuleSummaryTable, jobs : int = 1):
+    """
+    Convert each (py_path, subfilenames, output) task with
+    convert_py2cr_write and yield (py_path, output, result) in task order.
+
+    With jobs > 1 the modules are translated by a process pool: the
+    dependency summaries are computed first (in parallel as well) and
+    shipped to the workers with each task.
+    A profiler.Profiler in convert_args['profile'] collects the
+    translations of all the tasks.
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        for py_path, subfilenames, output in tasks:
+            if convert_args['verbose']:
+                print('Try  : ' + py_path + ' : ')
+            rtn = convert_py2cr_write(py_path, subfilenames=subfilenames, output=output,
+                                      summaries=summaries, **convert_args)
+            yield (py_path, output, rtn)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # summaries of all dependencies, unless their digest is already
+        # cached (then only a changed target needs them, in the worker).
+        needed = sorted(set(sf for _py_path, subfilenames, _output in tasks for sf in subfilenames))
+        if summaries.cache is not None:
+            needed = [sf for sf in needed
+                      if summaries.cache.load_summary_digest(summaries.source_digest(sf)) is None]
+        needed = [sf for sf in needed if sf not in summaries]
+        for summary in pool.map(_summarize_job, needed, [convert_args['verbose']] * len(needed)):
+            summaries.add(summary)
+
+        futures = []
+        for py_path, subfilenames, output in tasks:
+            mod_summaries = [summaries.get(sf) for sf in sorted(subfilenames) if sf in summaries]
+            futures.append((py_path, output, pool.submit(_convert_job, py_path, subfilenames, output,
+                                                         convert_args, mod_summaries, summaries.cache)))
+        # results are reported in task order, whichever finishes first.
+        for py_path, output, future in futures:
+            rtn, profile = future.result()
+            if profile is not None:
+                convert_args['profile'].merge(profile)
+            yield (py_path, output, rtn)
+
 def main() -> None:
+    import argparse
     parser = argparse.ArgumentParser(usage="%(prog)s [options] filename.py\n" \
         + "    or %(prog)s [-w [-f]] [-(r|b)] [-v] filename.py\n" \
         + "    or %(prog)s -p foo/bar/ -m [-w [-f]] [-(r|b)] [-v] foo/bar/filename.py\n" \
-        + "    or %(prog)s -l lib_store_directory/ [-f]",
+        + "    or %(prog)s -l lib_store_directory/ [-f]\n" \
+        + "    or %(prog)s build [-p base/path/] [-o outdir/] pkgdir/\n" \
+        + "    or %(prog)s remap [-p base/path/] [trace.txt ...]",
                           description="Python to Crystal compiler.")
 
     parser.add_argument("-w", "--write",
@@ -2945,12 +3810,144 @@ def main() -> None:
                       default=False,
                       help="convert all local import module files of specified Python file. *.py => *.cr")
 
+    parser.add_argument("--print-import-graph",
+                      action="store_true",
+                      dest="print_import_graph",
+                      default=False,
+                      help="print the local import graph and build plan of the specified Python file, then exit")
+
+    parser.add_argument("-j", "--jobs",
+                      action="store",
+                      dest="jobs",
+                      type=int,
+                      default=1,
+                      help="number of modules to translate in parallel with -w (default: %(default)s)")
+
+    parser.add_argument("--no-cache",
+                      action="store_false",
+                      dest="cache",
+                      default=True,
+                      help="do not read or write the translation cache (it is only used when writing *.cr files, with -w, build or --serve)")
+
+    parser.add_argument("--cache-dir",
+                      action="store",
+                      dest="cache_dir",
+                      default=cache.CACHE_DIR,
+                      help="translation cache directory (default: %(default)s)")
+
+    parser.add_argument("--cache-size",
+                      action="store",
+                      dest="cache_size",
+                      type=int,
+                      default=cache.DEFAULT_MAX_SIZE // (1024 * 1024),
+                      help="evict least recently used cache entries above this size in MB (default: %(default)s)")
+
+    parser.add_argument("--profile",
+                      action="store",
+                      dest="profile",
+                      nargs="?",
+                      const="-",
+                      default=None,
+                      metavar="JSON_FILE",
+                      help="print the time spent per visitor and translator function to stderr, or write it to JSON_FILE (implies --no-cache)")
+
+    parser.add_argument("--profile-sort",
+                      action="store",
+                      dest="profile_sort",
+                      choices=profiler.Profiler.SORT_KEYS,
+                      default="self",
+                      help="sort the profile by self time, cumulative time or call count (default: %(default)s)")
+
+    parser.add_argument("--source-map",
+                      action="store_true",
+                      dest="source_map",
+                      default=False,
+                      help="with -w or build, write the python position of each line to *.cr.map (see py2cr remap)")
+
+    parser.add_argument("--low-memory",
+                      action="store_true",
+                      dest="low_memory",
+                      default=False,
+                      help="parse in smaller chunks and release the syntax tree as it is translated, for very large modules")
+
+    parser.add_argument("-o", "--output-dir",
+                      action="store",
+                      dest="output_dir",
+                      default=None,
+                      help="with build, directory of the *.cr files (default: next to the *.py files)")
+
+    parser.add_argument("--entry",
+                      action="store",
+                      dest="entry",
+                      default=None,
+                      help="with build, name of the entry file requiring all the modules (default: PKGDIR.cr)")
+
+    parser.add_argument("--serve",
+                      action="store",
+                      dest="serve",
+                      default=None,
+                      metavar="SOCKET",
+                      help="run a translation server on the Unix-domain socket SOCKET (see py2cr/server.py)")
+
+    parser.add_argument("--watch",
+                      action="store",
+                      dest="watch",
+                      default=None,
+                      metavar="DIR",
+                      help="with --serve, translate the python files saved under DIR to *.cr")
+
     options, args = parser.parse_known_args()
 
+    if options.serve:
+        from . import server
+        translation_cache = None
+        if options.cache:
+            translation_cache = cache.TranslationCache(options.cache_dir, options.cache_size * 1024 * 1024)
+        server.serve(options.serve, base_path_count=options.base_path_count, require=options.include_require,
+                     translation_cache=translation_cache, watch=options.watch, verbose=options.verbose)
+        return
+
     if len(args) == 0:
         parser.print_help()
         sys.exit(1)
 
+    if args[0] == 'remap':
+        # annotate file.cr:LINE locations of stack traces or perf output
+        maps : Dict[str, Optional[sourcemap.SourceMap]] = {}
+        base_dir = options.base_path or '.'
+        if len(args) == 1:
+            for line in sys.stdin:
+                sys.stdout.write(sourcemap.rewrite(line, base_dir, maps))
+        for path in args[1:]:
+            with open(path, 'r', encoding="utf-8") as f:
+                sys.stdout.write(sourcemap.rewrite(f.read(), base_dir, maps))
+        return
+
+    if args[0] == 'build' and len(args) == 2:
+        translation_cache = None
+        if options.cache:
+            translation_cache = cache.TranslationCache(options.cache_dir, options.cache_size * 1024 * 1024)
+        summaries = ModuleSummaryTable(verbose=options.verbose, translation_cache=translation_cache)
+        for py_path, output, result in build_project(args[1], options.output_dir, options.base_path or None,
+                                                     options.base_path_count, options.include_require,
+                                                     options.entry, options.verbose, summaries,
+                                                     options.source_map, options.low_memory):
+            if result is None:
+                if not options.silent:
+                    print('Entry: ' + output)
+                continue
+            if not options.silent:
+                print('Try  : ' + py_path + ' -> ' + output + ' : ', end='')
+                if result.error is not None:
+                    print('[Error] ' + result.error)
+                else:
+                    print({ResultStatus.OK: '[OK]', ResultStatus.INCLUDE_WARNING: '[Warning]'}.get(result.status, '[Error]'))
+            for warning in result.warnings:
+                sys.stderr.write(warning + "\n")
+        if translation_cache is not None:
+            translation_cache.evict()
+        return
+
     filename = args[0]
 
     # base_dir_path : target python file dir path
@@ -2962,125 +3959,61 @@ def main() -> None:
         base_dir_path = os.path.dirname(filename)
     if options.verbose:
         print("base_dir_path: %s" % base_dir_path)
-    mods = {}
-    mods_all = {}
-
-    # py_path       : python file path
-    def get_mod_path(py_path : str) -> None:
-        results = []
-        dir_path = os.path.dirname(py_path) if os.path.dirname(py_path) else '.'
-        dir_path = os.path.relpath(dir_path, base_dir_path)
-        with open(py_path, 'r', encoding="utf-8") as f:
-            text = f.read()
-            results_f = re.findall(r"^from +([.\w]+) +import +([*\w]+)", text, re.M)
-            for res_f in results_f:
-                if options.verbose:
-                    print("py_path: %s res_f: %s" % (py_path, ', '.join(res_f)))
-                if res_f[0] == '.':
-                    # from . import hoge
-                    res = os.path.normpath(os.path.join(dir_path, res_f[0]))
-                elif res_f[0][0] == '.':
-                    # from .grandchildren import foo
-                    res = os.path.normpath(os.path.join(dir_path, res_f[0][1:]))
-                else:
-                    # from modules.moda import ModA
-                    # => (tests/modules/) modules/moda.py  # => class ModA
-                    res = res_f[0]
-                if res not in results:
-                    results.append(res)
-                if res_f[1] != '*':
-                    if res_f[0] == '.':
-                        # from . import hoge
-                        res = os.path.normpath(os.path.join(dir_path, res_f[0], res_f[1]))
-                    elif res_f[0][0] == '.':
-                        # from .grandchildren import foo
-                        res = os.path.normpath(os.path.join(dir_path, res_f[0][1:], res_f[1]))
-                    else:
-                        # (tests/modules/) modules/moda/ModA.py
-                        # (tests/modules/) modules/moda.py
-                        res = os.path.normpath(os.path.join(res_f[0], res_f[1]))
-                    if res not in results:
-                        results.append(res)
-            results_f = re.findall(r"^import +([.\w]+)", text, re.M)
-            for res_f in results_f:
-                # from modules.moda import ModA
-                # => (tests/modules/) modules/moda.py  # => class ModA
-                # from imported.submodules import submodulea
-                # => (tests/modules/) imported/submodules submodulea
-                # => require_relative 'submodules/submodulea'
-                if res_f == '.':
-                    res = dir_path
-                else:
-                    res = res_f
-                if res not in results:
-                    results.append(res)
-            if options.verbose:
-                print("py_path: %s, results: %s" % (py_path, results))
-        subfilenames = []
-        if results:
-            for result in results:
-                sf = os.path.normpath(os.path.join(base_dir_path, result.replace('.', '/') + '.py'))
-                if options.verbose:
-                    print(f"sub_filename: {sf}")
-                if sf in subfilenames:
-                    continue
-                if os.path.exists(sf):
-                    if sf not in subfilenames:
-                        subfilenames.append(sf)
-                    if options.verbose:
-                        print(f"[Found]     sub_filename: {sf}")
-                    continue
-                sf = os.path.join(base_dir_path, result.replace('.', '/'), '__init__.py')
-                if sf in subfilenames:
-                    continue
-                if os.path.exists(sf):
-                    if sf not in subfilenames:
-                        subfilenames.append(sf)
-                    if options.verbose:
-                        print(f"[Found]     sub_filename: {sf}")
-                    continue
-                if options.verbose:
-                    print(f"[Not Found] sub_filename: {sf}")
-        if options.verbose:
-            print("py_path: %s, subfilenames: %s" % (py_path, subfilenames))
-        mods[py_path] = subfilenames
-        mods_all[py_path] = list(subfilenames)
-        for sf in subfilenames:
-            if not sf in mods.keys():
-                get_mod_path(sf)
-                mods_all[py_path].extend(mods[sf])
+    translation_cache = None
+    # a translation to stdout does not create a cache directory
+    if options.cache and options.profile is None and options.output:
+        translation_cache = cache.TranslationCache(options.cache_dir, options.cache_size * 1024 * 1024)
 
-    # Get all the local import module file names of the target python file
-    get_mod_path(filename)
+    # every module is summarized once, whichever targets depend on it
+    summaries = ModuleSummaryTable(verbose=options.verbose, translation_cache=translation_cache)
 
+    # Get all the local import module file names of the target python file
+    #
     # Example:
     # tests/modules/classname.py : from modules.moda import ModA     => require_relative 'modules/moda' (Convert using AST)
     #                              => tests/modules/ + modules.moda
     #                              => tests/modules/modules/moda.py
     # -p tests/modules "tests/modules/classname.py"    > "tests/modules/classname.cr"
     # -p tests/modules "tests/modules/modules/moda.py" > "tests/modules/modules/moda.cr"
+    filename = os.path.normpath(filename)
+    graph = importgraph.ImportGraph(base_dir_path, read_source=summaries.source,
+                                    translation_cache=translation_cache, verbose=options.verbose)
+    graph.add(filename)
+    if options.print_import_graph:
+        graph.dump()
+        return
+    plan = graph.build_plan()
     if options.verbose:
-        for py_path, subfilenames in mods_all.items():
-            print(f"mods_all[{py_path}] : {subfilenames}")
+        for cycle in graph.cycles:
+            print("import cycle: %s" % " -> ".join(cycle + cycle[:1]))
 
-    for py_path, subfilenames in mods_all.items():
+    tasks = []
+    for py_path in plan:
         if not options.mod:
             if py_path != filename:
                 continue
 
-        subfilenames = set(subfilenames)
-
         output : Optional[str] = None
         if options.output:
             name_path, _ext = os.path.splitext(py_path)
             output = name_path + '.cr'
-
-        if options.verbose:
-            print('Try  : ' + py_path + ' : ')
-        rtn = convert_py2cr_write(py_path, options.base_path_count, subfilenames,
-            base_path=base_dir_path,
-            require=options.include_require,
-            output=output, force=options.force, no_stop=True, verbose=options.verbose)
+        tasks.append((py_path, graph.dependencies(py_path), output))
+
+    convert_args = dict(base_path_count=options.base_path_count,
+                        base_path=base_dir_path,
+                        require=options.include_require,
+                        force=options.force, no_stop=True, verbose=options.verbose)
+    if options.source_map:
+        convert_args['source_map'] = True
+    if options.low_memory:
+        convert_args['low_memory'] = True
+    if options.profile is not None:
+        convert_args['profile'] = profiler.Profiler()
+
+    # Translations run in parallel only when writing *.cr files,
+    # output to stdout stays sequential.
+    jobs = options.jobs if options.output else 1
+    for py_path, output, rtn in convert_py2cr_tasks(tasks, convert_args, summaries, jobs=jobs):
         if not options.silent:
             if options.mod or output:
                 if output:
@@ -3088,16 +4021,26 @@ def main() -> None:
                 else:
                     print('Try  : ' + py_path + ' : ', end='')
             if options.mod or output:
-                if rtn == 0:
+                status = rtn.value if isinstance(rtn, ResultStatus) else rtn
+                if status == 0:
                     print('[OK]')
-                elif rtn == 1:
+                elif status == 1:
                     print('[Warning]')
-                elif rtn == 2:
+                elif status == 2:
                     print('[Error]')
-                elif rtn == 3:
+                elif status == 3:
                     print('[Skip]')
                 else:
                     print('[Not Defined]')
 
+    if translation_cache is not None:
+        translation_cache.evict()
+
+    if options.profile == '-':
+        convert_args['profile'].write_table(sys.stderr, sort=options.profile_sort)
+    elif options.profile is not None:
+        with open(options.profile, 'w', encoding="utf-8") as f:
+            convert_args['profile'].write_json(f, sort=options.profile_sort)
+
 if __name__ == '__main__':
     main()
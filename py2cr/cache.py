@@ -0,0 +1,217 @@
+"""
+A persistent on-disk cache of translated modules.
+
+An entry is keyed by the content hash of the python source, the digests
+of the dependency summaries it was translated against, the translation
+options and a fingerprint of py2cr itself, so unchanged files can be
+written out again without being parsed.
+"""
+
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+import hashlib
+import json
+import os
+
+from .translator import CrystalTranslator, plugin_entry_points
+
+CACHE_DIR = '.py2cr_cache'
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024 # bytes
+CHUNK_SIZE = 64 * 1024 # characters of the cached code read at a time
+
+_fingerprint : Optional[str] = None
+
+def digest(*parts : str) -> str:
+    """sha256 hex-digest of the given strings"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+def read_chunks(f : TextIO) -> Iterator[str]:
+    """The text of the file f in chunks of CHUNK_SIZE characters"""
+    return iter(lambda: f.read(CHUNK_SIZE), '')
+
+def _read_chunks(f : TextIO) -> Iterator[str]:
+    with f:
+        yield from read_chunks(f)
+
+def translator_fingerprint() -> str:
+    """
+    Fingerprint of the py2cr package sources, of the CrystalTranslator
+    subclasses defined outside of it and of the installed translator
+    plugins, so that any change to the translator invalidates the cache.
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.sha256()
+        pkg_dir = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(pkg_dir)):
+            if name.endswith('.py'):
+                h.update(name.encode('utf-8'))
+                with open(os.path.join(pkg_dir, name), 'rb') as f:
+                    h.update(f.read())
+        # the translators of py2cr are in the sources above (and loaded
+        # lazily), other registered translators are named
+        for klass in sorted("%s.%s" % (k.__module__, k.__qualname__) for k in CrystalTranslator.__subclasses__()
+                            if not k.__module__.startswith(__package__ + '.')):
+            h.update(klass.encode('utf-8'))
+        # the plugins are only loaded by the sources importing their
+        # module: their entry points and versions are named instead
+        for name, entry_point in sorted(plugin_entry_points().items()):
+            dist = getattr(entry_point, 'dist', None) # python >= 3.10
+            h.update(("%s=%s@%s\0" % (name, entry_point.value, dist.version if dist is not None else '')).encode('utf-8'))
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+class TranslationCache:
+    """
+    Directory of cached translations.
+
+    Each translation is a small json file named after its key, with
+    its crystal code in a .cr file next to it.
+    Least recently used entries are evicted once the directory grows
+    over `max_size` bytes.
+    """
+
+    def __init__(self, path : str = CACHE_DIR, max_size : int = DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source : str, summary_digests : Iterable[str], options : Iterable[object]) -> str:
+        return digest(translator_fingerprint(),
+                      digest(source),
+                      *summary_digests,
+                      json.dumps(list(options)))
+
+    def _entry(self, kind : str, key : str) -> str:
+        return os.path.join(self.path, kind, key[:2], key + '.json')
+
+    def _read(self, kind : str, key : str):
+        entry = self._entry(kind, key)
+        try:
+            with open(entry, 'r', encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(entry) # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def _write(self, kind : str, key : str, value) -> None:
+        entry = self._entry(kind, key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # write then rename so concurrent readers never see a partial entry
+        tmp = "%s.%d.tmp" % (entry, os.getpid())
+        with open(tmp, 'w', encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, entry)
+
+    def _data_path(self, key : str) -> str:
+        """The crystal code of a cached translation, next to its entry"""
+        return os.path.splitext(self._entry('translations', key))[0] + '.cr'
+
+    def load(self, key : str) -> Optional[Tuple[int, str, Iterator[str], List[str]]]:
+        """
+        Return (result, header, data, warnings) of a cached translation or
+        None.  data yields the crystal code in chunks of CHUNK_SIZE
+        characters, warnings is the text the translation wrote to stderr.
+        """
+        value = self._read('translations', key)
+        data = None
+        if value is not None:
+            if 'data' in value: # entries of older versions
+                data = iter([value['data']])
+            else:
+                try:
+                    f = open(self._data_path(key), 'r', encoding="utf-8")
+                except OSError: # evicted
+                    pass
+                else:
+                    try:
+                        os.utime(f.name)
+                    except OSError:
+                        pass
+                    data = _read_chunks(f)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # not in the entries of older versions
+        return (value['result'], value['header'], data, value.get('warnings', []))
+
+    def store(self, key : str, result : int, header : str, data : Union[str, Iterable[str]],
+              warnings : Optional[List[str]] = None) -> None:
+        """
+        Store a translation.  data is the crystal code, or an iterable of
+        its chunks (e.g. a file open for reading), written out one chunk
+        at a time.
+        """
+        path = self._data_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # the code is written before the entry: an entry always has it
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, 'w', encoding="utf-8") as f:
+            for chunk in ([data] if isinstance(data, str) else data):
+                f.write(chunk)
+        os.replace(tmp, path)
+        self._write('translations', key, {'result': result, 'header': header, 'warnings': warnings or []})
+
+    def load_source_map(self, key : str) -> Optional[str]:
+        """Source map mappings (see sourcemap.SourceMap) of a cached translation"""
+        value = self._read('sourcemaps', key)
+        return value['mappings'] if value else None
+
+    def store_source_map(self, key : str, mappings : str) -> None:
+        self._write('sourcemaps', key, {'mappings': mappings})
+
+    def load_summary_digest(self, source_digest : str) -> Optional[str]:
+        """Digest of the ModuleSummary of a source, without parsing it"""
+        value = self._read('summaries', digest(translator_fingerprint(), source_digest))
+        return value['digest'] if value else None
+
+    def store_summary_digest(self, source_digest : str, summary_digest : str) -> None:
+        self._write('summaries', digest(translator_fingerprint(), source_digest), {'digest': summary_digest})
+
+    def load_imports(self, source_digest : str):
+        """Import statements (see importgraph.import_specs) of a source"""
+        value = self._read('imports', digest(translator_fingerprint(), source_digest))
+        return value['imports'] if value else None
+
+    def store_imports(self, source_digest : str, imports) -> None:
+        self._write('imports', digest(translator_fingerprint(), source_digest), {'imports': imports})
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits in
+        max_size.  Returns the number of removed entries.
+        """
+        entries = []
+        total = 0
+        for dirpath, _dirnames, filenames in os.walk(self.path):
+            for name in filenames:
+                entry = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(entry)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry))
+                total += st.st_size
+        removed = 0
+        if total <= self.max_size:
+            return removed
+        entries.sort()
+        for _mtime, size, entry in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
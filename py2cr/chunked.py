@@ -0,0 +1,65 @@
+"""
+Parsing of a python module in chunks of top-level statements.
+
+ast.parse() of a large machine-generated module needs several times
+the memory of its source.  iter_statements() parses about `chunk_size`
+characters at a time instead, so that a streaming translation only
+holds the AST of the statements being translated.  With `release`, the
+statements of a chunk are also dropped one by one as they are consumed
+(see the low_memory option of convert_py2cr).
+"""
+
+from typing import Iterator
+import ast
+import re
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 # characters
+LOW_MEMORY_CHUNK_SIZE = 4 * 1024
+
+# Lines that may start a top-level statement: not indented, not a
+# comment, a closing bracket or a clause continuing a compound statement.
+_STATEMENT_START = re.compile(r'^(?![\s#)\]}]|(?:else|elif|except|finally)\b)', re.M)
+
+def iter_statements(source : str, chunk_size : int = DEFAULT_CHUNK_SIZE, filename : str = '<unknown>',
+                    release : bool = False) -> Iterator[ast.stmt]:
+    """
+    Yield the top-level statements of a module, with the line numbers
+    of the whole source.
+
+    A chunk ends at a line that looks like the start of a statement.
+    If that guess is wrong (the line is inside a string, a bracket or
+    after a decorator) the chunk does not parse, and it is extended.
+    """
+    start = 0
+    lineno = 0
+    end = len(source)
+    while start < end:
+        stop = next_start(source, start + chunk_size)
+        while True:
+            chunk = source[start:stop]
+            try:
+                # leading newlines give the statements their line numbers
+                tree = ast.parse("\n" * lineno + chunk, filename)
+                break
+            except SyntaxError:
+                if stop >= end:
+                    raise
+                stop = next_start(source, stop + max(chunk_size, stop - start))
+        if release:
+            body = tree.body
+            del tree
+            body.reverse()
+            while body:
+                yield body.pop()
+        else:
+            yield from tree.body
+            del tree
+        lineno += chunk.count("\n")
+        start = stop
+
+def next_start(source : str, pos : int) -> int:
+    """Position of the first possible statement start at or after pos"""
+    if pos >= len(source):
+        return len(source)
+    match = _STATEMENT_START.search(source, pos)
+    return match.start() if match else len(source)
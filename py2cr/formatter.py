@@ -4,18 +4,36 @@ A formatter module that keeps track of indentation
 
 from .errors import CrystalError
 
+# Buffered bytes (characters) after which a streaming Formatter flushes
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
 class Formatter:
     """
     A very simple code formatter that handles efficient
     concatenation and indentation of lines.
+
+    With a file-like `sink`, the lines are written to the sink in chunks
+    of about `buffer_size` characters (see checkpoint()) instead of being
+    kept until read().
+
+    With `source_map`, the value of `position` (set by the writer to the
+    source position being translated) is recorded for every line
+    written, see positions().
     """
 
-    def __init__(self, indent_string="  "):
+    def __init__(self, indent_string="  ", sink=None, buffer_size=DEFAULT_BUFFER_SIZE, source_map=False):
         self.__buffer = []
+        self.__size = 0
         self.__indentation = 0
         self.__indent_string = indent_string
         self.__indent_temp = ""
         self.__string_buffer = ""
+        self.__string_offset = 0
+        self.__sink = sink
+        self.__buffer_size = buffer_size
+        self.position = None
+        self.__positions = [] if source_map else None
+        self.__line_open = False
 
     def dedent(self):
         """
@@ -42,6 +60,10 @@ class Formatter:
         Clear the buffer
         """
         self.__buffer = []
+        self.__size = 0
+        if self.__positions is not None:
+            self.__positions = []
+            self.__line_open = False
 
     def write(self, text, indent=True, newline=True):
         """
@@ -51,35 +73,94 @@ class Formatter:
         if text is None:
             raise CrystalError("Convert Error.")
         if indent:
-            self.__buffer.append(self.__indent_temp)
-        self.__buffer.append(text)
+            text = self.__indent_temp + text
         if newline:
-            self.__buffer.append("\n")
+            text += "\n"
+        self.__buffer.append(text)
+        self.__size += len(text)
+        if self.__positions is not None and text:
+            # every line started by text gets the current position
+            started = text.count("\n") + (0 if self.__line_open else 1)
+            self.__line_open = not text.endswith("\n")
+            if not self.__line_open:
+                started -= 1
+            if started > 0:
+                self.__positions.extend([self.position] * started)
+
+    def mark(self):
+        """
+        The current end of the output, for since().
+        """
+        return (len(self.__buffer), len(self.__positions) if self.__positions is not None else 0)
+
+    def since(self, mark):
+        """
+        Returns the text and the positions (or None) written since mark,
+        which must be in the same checkpoint.
+        """
+        buffer_mark, positions_mark = mark
+        text = "".join(self.__buffer[buffer_mark:])
+        if self.__positions is None:
+            return (text, None)
+        return (text, self.__positions[positions_mark:])
+
+    def splice(self, text, positions=None):
+        """
+        Writes text from a previous output (see since()) as-is, with
+        the given positions of its lines.
+        """
+        self.__buffer.append(text)
+        self.__size += len(text)
+        if self.__positions is not None:
+            self.__positions.extend(positions if positions is not None else [None] * text.count("\n"))
+
+    def positions(self):
+        """
+        Source position of each line written so far (None without
+        source_map).
+        """
+        return self.__positions
+
+    def checkpoint(self):
+        """
+        Marks the end of a complete piece of output (e.g. a top-level
+        statement).  A streaming formatter flushes its buffer to the sink
+        here once it holds more than buffer_size characters.
+        """
+        if self.__sink is not None and self.__size >= self.__buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffer to the sink.
+        """
+        if self.__sink is None:
+            return
+        if self.__buffer:
+            self.__sink.write("".join(self.__buffer))
+        self.__buffer = []
+        self.__size = 0
 
     def read(self, size=None):
         """
         Returns a string representation of the buffer.
         """
-        if size is None:
-            text = self.__string_buffer + "".join(self.__buffer)
+        if self.__buffer:
+            self.__string_buffer = self.__string_buffer[self.__string_offset:] + "".join(self.__buffer)
+            self.__string_offset = 0
             self.__buffer = []
+            self.__size = 0
+
+        start = self.__string_offset
+        if size is None or start + size >= len(self.__string_buffer):
+            text = self.__string_buffer[start:]
             self.__string_buffer = ""
+            self.__string_offset = 0
             return text
 
-        if len(self.__string_buffer) < size:
-            self.__string_buffer += "".join(self.__buffer)
-            self.__buffer = []
-            if len(self.__string_buffer) < size:
-                text, self.__string_buffer = self.__string_buffer, ""
-                return text
-            else:
-                text, self.__string_buffer = self.__string_buffer[:size], \
-                    self.__string_buffer[size:]
-                return text
-        else:
-            text, self.__string_buffer = self.__string_buffer[:size], \
-                self.__string_buffer[size:]
-            return text
+        # keep the remainder in place, chunked reads stay linear
+        self.__string_offset = start + size
+        return self.__string_buffer[start:start + size]
 
 
 def capitalize(text):
@@ -0,0 +1,243 @@
+"""
+Discovery of the local modules imported by a python program.
+
+The imports of each file are read from its AST (`import a.b, c`,
+`from .x import (y, z)`, also when nested in functions or `if` blocks),
+resolved against the base directory with memoized filesystem probes, and
+assembled into a graph with a topologically sorted build plan.
+"""
+
+from typing import Dict, List, Optional, Set, Tuple
+import ast
+import os
+import sys
+
+from . import cache
+from . import chunked
+
+# (level, module, names) of a single import statement
+ImportSpec = Tuple[int, str, List[str]]
+
+# nodes that may contain import statements (not expressions)
+_STATEMENT_NODES = tuple(getattr(ast, name) for name in ('stmt', 'excepthandler', 'match_case') if hasattr(ast, name))
+
+def import_specs(tree : ast.AST) -> List[ImportSpec]:
+    """All import statements of a module, in source order"""
+    nodes = []
+    todo = [tree]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            nodes.append(node)
+            continue
+        todo.extend(child for child in ast.iter_child_nodes(node) if isinstance(child, _STATEMENT_NODES))
+    nodes.sort(key=lambda node: (node.lineno, node.col_offset))
+    specs : List[ImportSpec] = []
+    for node in nodes:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                specs.append((0, alias.name, []))
+        else:
+            specs.append((node.level or 0, node.module or '', [alias.name for alias in node.names]))
+    return specs
+
+class ImportGraph:
+    """
+    Graph of the local python modules reachable from one or more entry
+    files.  Module paths are resolved relative to `base_dir_path`:
+
+        from modules.moda import ModA
+        => (tests/modules/) modules/moda.py  or  modules/moda/ModA.py
+        => (tests/modules/) modules/moda/__init__.py
+
+    With a translation cache, the imports of unchanged files are taken
+    from the cache instead of parsing them.
+    """
+
+    def __init__(self, base_dir_path : str, read_source=None, translation_cache : Optional[cache.TranslationCache] = None, verbose : bool = False):
+        self.base_dir_path = base_dir_path
+        self.cache = translation_cache
+        self._verbose = verbose
+        self._read_source = read_source or self._read
+        # python file path -> directly imported local python file paths
+        self.edges : Dict[str, List[str]] = {}
+        # import candidate (e.g. "modules/moda") -> python file path or None
+        self._resolved : Dict[str, Optional[str]] = {}
+        self._plan : Optional[List[str]] = None
+        self.cycles : List[List[str]] = []
+
+    @staticmethod
+    def _read(path : str) -> str:
+        with open(path, 'r', encoding="utf-8") as f:
+            return f.read()
+
+    def vprint(self, message : str) -> None:
+        if self._verbose:
+            print(message)
+
+    def specs(self, py_path : str) -> List[ImportSpec]:
+        source = self._read_source(py_path)
+        source_digest = None
+        if self.cache is not None:
+            source_digest = cache.digest(source)
+            specs = self.cache.load_imports(source_digest)
+            if specs is not None:
+                return [tuple(spec) for spec in specs]
+        specs = []
+        for stmt in chunked.iter_statements(source):
+            specs.extend(import_specs(stmt))
+        if self.cache is not None:
+            self.cache.store_imports(source_digest, specs)
+        return specs
+
+    def candidates(self, py_path : str) -> List[str]:
+        """Slash separated module paths (relative to base_dir_path) that py_path may import"""
+        dir_path = os.path.dirname(py_path) or '.'
+        dir_path = os.path.relpath(dir_path, self.base_dir_path)
+        results : List[str] = []
+        for level, module, names in self.specs(py_path):
+            if level > 0:
+                # from . import hoge / from ..grandchildren import foo
+                base = os.path.normpath(os.path.join(dir_path, *(['..'] * (level - 1))))
+                module = os.path.normpath(os.path.join(base, module.replace('.', '/')))
+            else:
+                # from modules.moda import ModA / import modules.moda
+                module = module.replace('.', '/')
+            results.append(module)
+            for name in names:
+                if name != '*':
+                    results.append(os.path.normpath(os.path.join(module, name)))
+        return list(dict.fromkeys(results))
+
+    def resolve(self, candidate : str) -> Optional[str]:
+        """Local python file for an import candidate, each probed only once"""
+        try:
+            return self._resolved[candidate]
+        except KeyError:
+            pass
+        path = None
+        if not candidate.startswith('..') and not os.path.isabs(candidate):
+            for sf in (os.path.normpath(os.path.join(self.base_dir_path, candidate + '.py')),
+                       os.path.normpath(os.path.join(self.base_dir_path, candidate, '__init__.py'))):
+                if os.path.isfile(sf):
+                    path = sf
+                    break
+        self.vprint("[%s] sub_filename: %s%s" % ("Found" if path else "Not Found", candidate, " => " + path if path else ""))
+        self._resolved[candidate] = path
+        return path
+
+    def add(self, py_path : str) -> None:
+        """Add py_path and everything it imports to the graph"""
+        stack = [py_path]
+        while stack:
+            path = stack.pop()
+            if path in self.edges:
+                continue
+            deps = []
+            for candidate in self.candidates(path):
+                sf = self.resolve(candidate)
+                if sf is not None and sf != path and sf not in deps:
+                    deps.append(sf)
+            self.vprint("py_path: %s, subfilenames: %s" % (path, deps))
+            self.edges[path] = deps
+            self._plan = None
+            stack.extend(reversed(deps))
+
+    def build_plan(self) -> List[str]:
+        """
+        All modules of the graph, every module after the modules it
+        imports.  Members of an import cycle are kept in discovery order
+        and the cycle is recorded in self.cycles.
+        """
+        if self._plan is not None:
+            return self._plan
+        # Tarjan's strongly connected components, iteratively.  The
+        # components come out in reverse topological order of the
+        # condensed graph, i.e. dependencies first.
+        index : Dict[str, int] = {}
+        lowlink : Dict[str, int] = {}
+        on_stack = set()
+        stack : List[str] = []
+        plan : List[str] = []
+        self.cycles = []
+        for root in self.edges:
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, i = work.pop()
+                if i == 0:
+                    index[node] = lowlink[node] = len(index)
+                    stack.append(node)
+                    on_stack.add(node)
+                deps = self.edges.get(node, [])
+                if i < len(deps):
+                    work.append((node, i + 1))
+                    dep = deps[i]
+                    if dep not in index:
+                        work.append((dep, 0))
+                    elif dep in on_stack:
+                        lowlink[node] = min(lowlink[node], index[dep])
+                    continue
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    component.sort(key=index.get)
+                    if len(component) > 1:
+                        self.cycles.append(component)
+                    plan.extend(component)
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+        self._plan = plan
+        return plan
+
+    def reachable(self, py_path : str) -> Set[str]:
+        """All modules imported by py_path, directly or not"""
+        seen : Set[str] = set()
+        stack = list(self.edges.get(py_path, []))
+        while stack:
+            path = stack.pop()
+            if path in seen or path == py_path:
+                continue
+            seen.add(path)
+            stack.extend(self.edges.get(path, []))
+        return seen
+
+    def dependencies(self, py_path : str) -> List[str]:
+        """All modules imported by py_path, directly or not, in build order"""
+        seen = self.reachable(py_path)
+        return [path for path in self.build_plan() if path in seen]
+
+    def dependents(self, py_path : str) -> List[str]:
+        """All modules of the graph importing py_path, directly or not, in build order"""
+        importers : Dict[str, List[str]] = {}
+        for path, deps in self.edges.items():
+            for dep in deps:
+                importers.setdefault(dep, []).append(path)
+        seen : Set[str] = set()
+        stack = list(importers.get(py_path, []))
+        while stack:
+            path = stack.pop()
+            if path in seen or path == py_path:
+                continue
+            seen.add(path)
+            stack.extend(importers.get(path, []))
+        return [path for path in self.build_plan() if path in seen]
+
+    def dump(self, out=sys.stdout) -> None:
+        """Print the graph, its cycles and the build plan"""
+        for path in self.build_plan():
+            out.write("%s\n" % path)
+            for dep in self.edges[path]:
+                out.write("    -> %s\n" % dep)
+        for cycle in self.cycles:
+            out.write("cycle: %s\n" % " -> ".join(cycle + cycle[:1]))
+        out.write("build plan:\n")
+        for i, path in enumerate(self.build_plan()):
+            out.write("  %d. %s\n" % (i + 1, path))
@@ -0,0 +1,298 @@
+"""
+Incremental re-translation of a module, one top-level definition at a
+time.
+
+A DefinitionCache keeps the Crystal text emitted for each top-level
+FunctionDef/ClassDef of a module, keyed by the source text of the
+definition and by the statements that last changed the visitor state of
+the names it uses (class names, function signatures, aliases...).  When
+the module is translated again with the same cache (see
+convert_py2cr(definitions=...)), an unchanged definition whose inputs
+did not change is spliced from the previous output, and the changes it
+made to the visitor state are replayed, instead of visiting it again.
+
+The changes a statement makes to the visitor state are captured by
+StateSnapshot: the entries of the RB tables keyed by the identifiers of
+the statement, plus the entries added to them.  Every changed entry
+binds its name to a digest of its new value, and the key of a
+definition includes the bindings of its identifiers, so that it is
+translated again when a statement gives one of them another value.
+"""
+
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+import ast
+import itertools
+import re
+
+from . import cache
+from . import chunked
+from . import formatter
+
+# RB tables keyed by class, function and variable names
+DICT_FIELDS = ('_classes',
+               '_classes_base_classes',
+               '_functions',
+               '_classes_functions',
+               '_classes_self_functions',
+               '_classes_self_functions_args',
+               '_classes_class_functions_args',
+               '_classes_variables',
+               '_module_aliases')
+SET_FIELDS = ('_class_names', '_rclass_names')
+# per class tables, replaced by visit_ClassDef
+REBOUND_FIELDS = ('_functions_rb_args_default', '_self_functions_args', '_class_functions_args')
+LIST_FIELDS = ('_module_functions', '_imports')
+
+_MISSING = object()
+
+# identifiers and dotted names, also those in strings and comments: the
+# dependencies of a statement may be over-estimated, not missed
+_IDENTIFIER = re.compile(r'[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*')
+
+def identifiers(text : str) -> FrozenSet[str]:
+    """Names, attributes, definitions and imports used in a statement"""
+    names = set(_IDENTIFIER.findall(text))
+    for name in [name for name in names if '.' in name]:
+        names.update(name.split('.'))
+    # crystal class names (_rclass_names)
+    names.update([formatter.capitalize(name) for name in names])
+    return frozenset(names)
+
+def _tables(visitor) -> List[Tuple[str, dict]]:
+    module = visitor._symbols.module
+    return [(name, getattr(visitor, name)) for name in DICT_FIELDS] + \
+           [('names', module.names), ('imports', module.imports)]
+
+class StateDelta:
+    """Changes of the visitor state made by a top-level statement"""
+
+    __slots__ = ('entries', 'members', 'rebound', 'appended', 'dummies', '_bindings')
+
+    def __init__(self):
+        self.entries : List[Tuple[str, str, object]] = []  # (table, key, value)
+        self.members : List[Tuple[str, str]] = []          # (set field, item)
+        self.rebound : List[Tuple[str, object]] = []       # (field, value)
+        self.appended : List[Tuple[str, list]] = []        # (list field, items)
+        self.dummies = 0
+        self._bindings : Optional[List[Tuple[str, str, str]]] = None
+
+    def bindings(self) -> List[Tuple[str, str, str]]:
+        """(name, table, digest of the value) of the changed entries"""
+        if self._bindings is None:
+            # the ClassDef nodes of _classes are not read by the translation
+            self._bindings = [(key, table, '' if isinstance(value, ast.AST) else cache.digest(repr(value)))
+                              for table, key, value in self.entries]
+            self._bindings += [(item, field, '') for field, item in self.members]
+        return self._bindings
+
+    def apply(self, visitor) -> None:
+        tables = dict(_tables(visitor))
+        for table, key, value in self.entries:
+            if table == 'imports':
+                visitor._symbols.add_import(key, value)
+            else:
+                tables[table][key] = value
+        for field, item in self.members:
+            getattr(visitor, field).add(item)
+        for field, value in self.rebound:
+            setattr(visitor, field, value)
+        for field, items in self.appended:
+            getattr(visitor, field).extend(items)
+        visitor.dummy += self.dummies
+
+class StateSnapshot:
+    """
+    The visitor state of the names of a statement, taken before it is
+    visited.  delta() compares it with the state after the visit.
+    """
+
+    def __init__(self, visitor, names : FrozenSet[str]):
+        self.names = names
+        self.values = []
+        for _table, value in _tables(visitor):
+            self.values.append((len(value), [(key, value.get(key, _MISSING)) for key in names]))
+        self.members = [(len(getattr(visitor, field)), [key for key in names if key in getattr(visitor, field)])
+                        for field in SET_FIELDS]
+        self.rebound = [getattr(visitor, field) for field in REBOUND_FIELDS]
+        self.lengths = [len(getattr(visitor, field)) for field in LIST_FIELDS]
+        self.dummy = visitor.dummy
+
+    def delta(self, visitor) -> Optional[StateDelta]:
+        """The changes since the snapshot, None if they are not all known"""
+        delta = StateDelta()
+        for (table, value), (size, before) in zip(_tables(visitor), self.values):
+            changed = set()
+            for key, old in before:
+                new = value.get(key, _MISSING)
+                if new is not old and new is not _MISSING:
+                    delta.entries.append((table, key, new))
+                    changed.add(key)
+            if len(value) < size:
+                return None # removed entries
+            # the added entries are the last ones of the dict
+            for key in itertools.islice(reversed(value), len(value) - size):
+                if key not in changed:
+                    delta.entries.append((table, key, value[key]))
+        for field, (size, before) in zip(SET_FIELDS, self.members):
+            value = getattr(visitor, field)
+            added = [key for key in self.names if key in value and key not in before]
+            if len(value) != size + len(added):
+                return None # items not named in the statement
+            delta.members.extend((field, key) for key in added)
+        for field, old in zip(REBOUND_FIELDS, self.rebound):
+            value = getattr(visitor, field)
+            if value is not old:
+                delta.rebound.append((field, value))
+        for field, size in zip(LIST_FIELDS, self.lengths):
+            value = getattr(visitor, field)
+            if len(value) > size:
+                delta.appended.append((field, value[size:]))
+        delta.dummies = visitor.dummy - self.dummy
+        return delta
+
+class StreamWatch:
+    """Stream wrapper noting whether anything was written to it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.written = False
+
+    def write(self, text : str) -> int:
+        self.written = True
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+class Definition:
+    """Translation of a top-level definition kept by DefinitionCache"""
+
+    __slots__ = ('text', 'positions', 'delta', 'dummy')
+
+    def __init__(self, text : str, positions : Optional[list], delta : StateDelta, dummy : int):
+        self.text = text
+        # source positions relative to the first line of the definition
+        self.positions = positions
+        self.delta = delta
+        # first dummy variable number, if the definition uses any
+        self.dummy = dummy
+
+class Segment:
+    """
+    Source of one top-level statement (or of the statements of a line)
+    of a module, see segments().  `statements` is None when the segment
+    was parsed by a previous translation, see parse().
+    """
+
+    __slots__ = ('lineno', 'text', 'digest', 'statements', 'filename')
+
+    def __init__(self, lineno : int, text : str, digest : str, statements : Optional[List[ast.stmt]], filename : str):
+        self.lineno = lineno # first line, 1-based
+        self.text = text
+        self.digest = digest
+        self.statements = statements
+        self.filename = filename
+
+    def parse(self) -> List[ast.stmt]:
+        if self.statements is None:
+            # leading newlines give the statements their line numbers
+            self.statements = ast.parse("\n" * (self.lineno - 1) + self.text, self.filename).body
+        return self.statements
+
+class DefinitionCache:
+    """
+    Translations of the top-level definitions of a module, kept between
+    translations of the module (e.g. by the translation server).  Only
+    the definitions of the last translation are kept.
+    """
+
+    def __init__(self):
+        self.context : Optional[str] = None
+        self.definitions : Dict[str, Definition] = {}
+        # source digest -> (identifiers, is a definition) of a segment
+        self.segments : Dict[str, Tuple[FrozenSet[str], bool]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._used : Dict[str, Definition] = {}
+        self._used_segments : Dict[str, Tuple[FrozenSet[str], bool]] = {}
+
+    def start(self, context : str) -> None:
+        """Begin a translation with the given options and dependencies"""
+        if context != self.context:
+            self.context = context
+            self.definitions = {}
+        self._used = {}
+        self._used_segments = {}
+
+    def finish(self) -> None:
+        """Forget the definitions that were not part of the translation"""
+        self.definitions = self._used
+        self.segments = self._used_segments
+        self._used = {}
+        self._used_segments = {}
+
+    def segment(self, segment : Segment) -> Tuple[FrozenSet[str], bool]:
+        """(identifiers, is a definition) of a segment"""
+        info = self.segments.get(segment.digest)
+        if info is None:
+            statements = segment.parse()
+            info = (identifiers(segment.text),
+                    len(statements) == 1 and isinstance(statements[0], (ast.FunctionDef, ast.ClassDef)))
+        self._used_segments[segment.digest] = info
+        return info
+
+    def get(self, key : str) -> Optional[Definition]:
+        definition = self.definitions.get(key)
+        if definition is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._used[key] = definition
+        return definition
+
+    def put(self, key : str, definition : Definition) -> None:
+        self._used[key] = definition
+
+def segments(source : str, definitions : DefinitionCache, filename : str = '<unknown>') -> Iterator[Segment]:
+    """
+    Split a module into Segments of one top-level statement, with the
+    heuristic of chunked.iter_statements().  A segment is only parsed
+    to find its end, and not if its text was parsed before.
+    """
+    start = 0
+    lineno = 1
+    end = len(source)
+    while start < end:
+        stop = chunked.next_start(source, _next_line(source, start))
+        while True:
+            text = source[start:stop]
+            segment = Segment(lineno, text, cache.digest(text), None, filename)
+            if segment.digest in definitions.segments:
+                break
+            try:
+                segment.parse()
+                break
+            except SyntaxError:
+                if stop >= end:
+                    raise
+                stop = chunked.next_start(source, _next_line(source, stop))
+        yield segment
+        lineno += text.count("\n")
+        start = stop
+
+def _next_line(source : str, pos : int) -> int:
+    pos = source.find("\n", pos)
+    return len(source) if pos == -1 else pos + 1
+
+def statement_key(source_digest : str, names : FrozenSet[str], bindings : Dict[str, Dict[str, str]], epoch : str = '') -> str:
+    """
+    Key of a statement: its source and the state of its names, as bound
+    by the previous statements (name -> table -> digest of the value,
+    see StateDelta.bindings())
+    """
+    inputs = []
+    for name in sorted(names):
+        tables = bindings.get(name)
+        if tables:
+            inputs.extend("%s.%s=%s" % (name, table, value) for table, value in sorted(tables.items()))
+    return cache.digest(source_digest, epoch, *inputs)
@@ -0,0 +1,214 @@
+"""
+Intermediate representation of the translated expressions.
+
+Only the operator expressions (BinOp, BoolOp, UnaryOp, Compare, see
+RB.lower()) are translated to a tree of the nodes below; the statements,
+the calls and the other expressions are still written as text, and an
+Expr is a str or a Node.  The decisions that used to inspect the
+translated text of the operands (e.g. whether an operand is wrapped in
+parenthesis by RB.ope_filter(), or is a Numo array) read the flags of
+the nodes, which are computed from their operands, once and only if
+they are needed.
+
+emit() writes a tree into a single list of strings, so the text of the
+nested operations is not concatenated again at each level.
+"""
+
+from typing import List, Optional, Sequence, Union
+import abc
+
+# flags of an expression
+OPERATOR = 1 # its text has an arithmetic operator, see RB.ope_filter()
+NUMO = 2     # its text refers to Numo::
+
+def text_flags(text : str) -> int:
+    flags = 0
+    if '-' in text or '+' in text or '*' in text or '/' in text or '%' in text:
+        flags = OPERATOR
+    if 'Numo::' in text:
+        flags |= NUMO
+    return flags
+
+# operators are few, their flags are kept
+_OP_FLAGS = {}
+
+def op_flags(op : str) -> int:
+    try:
+        return _OP_FLAGS[op]
+    except KeyError:
+        flags = _OP_FLAGS[op] = text_flags(op)
+        return flags
+
+class Node(abc.ABC):
+    """Base of the IR nodes"""
+
+    __slots__ = ('_flags',)
+
+    @abc.abstractmethod
+    def operand_flags(self) -> int:
+        """flags of the text, see flags()"""
+
+    @abc.abstractmethod
+    def write(self, out : List[str]) -> None:
+        """
+        Append the text to out.  The str operands are appended here: the
+        nested operations take as many frames as their visit.
+        """
+
+    def __str__(self) -> str:
+        return emit(self)
+
+Expr = Union[str, Node]
+
+def flags(expr : Expr) -> int:
+    if expr.__class__ is str:
+        return text_flags(expr)
+    if expr._flags is None:
+        expr._flags = expr.operand_flags()
+    return expr._flags
+
+class Group(Node):
+    """(expr)"""
+
+    __slots__ = ('expr',)
+
+    def __init__(self, expr : Expr, expr_flags : Optional[int] = None):
+        self.expr = expr
+        self._flags = expr_flags
+
+    def operand_flags(self) -> int:
+        return flags(self.expr)
+
+    def write(self, out : List[str]) -> None:
+        out.append("(")
+        expr = self.expr
+        if expr.__class__ is str:
+            out.append(expr)
+        else:
+            expr.write(out)
+        out.append(")")
+
+class BinOp(Node):
+    """left op right"""
+
+    __slots__ = ('left', 'op', 'right')
+
+    def __init__(self, left : Expr, op : str, right : Expr):
+        self.left = left
+        self.op = op
+        self.right = right
+        self._flags = None
+
+    def operand_flags(self) -> int:
+        return flags(self.left) | flags(self.right) | op_flags(self.op)
+
+    def write(self, out : List[str]) -> None:
+        left = self.left
+        if left.__class__ is str:
+            out.append(left)
+        else:
+            left.write(out)
+        out.append(" %s " % self.op)
+        right = self.right
+        if right.__class__ is str:
+            out.append(right)
+        else:
+            right.write(out)
+
+class BoolOp(Node):
+    """values[0] op values[1] op ..."""
+
+    __slots__ = ('op', 'values')
+
+    def __init__(self, op : str, values : Sequence[Expr]):
+        self.op = op
+        self.values = values
+        self._flags = None
+
+    def operand_flags(self) -> int:
+        value_flags = 0
+        for value in self.values:
+            value_flags |= flags(value)
+        return value_flags
+
+    def write(self, out : List[str]) -> None:
+        separator = " %s " % self.op
+        for i, value in enumerate(self.values):
+            if i:
+                out.append(separator)
+            if value.__class__ is str:
+                out.append(value)
+            else:
+                value.write(out)
+
+class UnaryOp(Node):
+    """op operand"""
+
+    __slots__ = ('op', 'operand')
+
+    def __init__(self, op : str, operand : Expr):
+        self.op = op
+        self.operand = operand
+        self._flags = None
+
+    def operand_flags(self) -> int:
+        return flags(self.operand) | op_flags(self.op)
+
+    def write(self, out : List[str]) -> None:
+        out.append(self.op)
+        operand = self.operand
+        if operand.__class__ is str:
+            out.append(operand)
+        else:
+            operand.write(out)
+
+class MethodCall(Node):
+    """receiver.name or receiver.name(args)"""
+
+    __slots__ = ('receiver', 'name', 'args')
+
+    def __init__(self, receiver : Expr, name : str, args : Sequence[Expr] = ()):
+        self.receiver = receiver
+        self.name = name
+        self.args = args
+        self._flags = None
+
+    def operand_flags(self) -> int:
+        call_flags = flags(self.receiver)
+        for arg in self.args:
+            call_flags |= flags(arg)
+        return call_flags
+
+    def write(self, out : List[str]) -> None:
+        receiver = self.receiver
+        if receiver.__class__ is str:
+            out.append(receiver)
+        else:
+            receiver.write(out)
+        if not self.args:
+            out.append("." + self.name)
+            return
+        out.append(".%s(" % self.name)
+        for i, arg in enumerate(self.args):
+            if i:
+                out.append(", ")
+            if arg.__class__ is str:
+                out.append(arg)
+            else:
+                arg.write(out)
+        out.append(")")
+
+def operand(expr : Expr) -> Expr:
+    """An operand of an operation, in parenthesis if it has an operator (RB.ope_filter())"""
+    expr_flags = flags(expr)
+    if expr_flags & OPERATOR:
+        return Group(expr, expr_flags)
+    return expr
+
+def emit(expr : Expr) -> str:
+    """Text of an expression"""
+    if expr.__class__ is str:
+        return expr
+    out : List[str] = []
+    expr.write(out)
+    return "".join(out)
@@ -13,6 +13,7 @@ def numcr__parse_args(funcdb) -> Tuple[Any, Any, Any]:
     other_args = []
     other_raw_args = []
     for arg in funcdb.node.args:
+        # memoized by the visitor, FuncCall already visited the arguments
         other_args.append(funcdb.crystal_visitor.visit(arg))
         other_raw_args.append(arg)
     for kw in funcdb.node.keywords:
@@ -42,8 +43,8 @@ def numcr__tensor01(function : str, funcdb) -> str:
     or a scalar. 
     For num.cr we need to wrap it as an array in the scalar case
     """
-    templatetype, _, other_raw_args = numcr__parse_args(funcdb)
-    argzero = funcdb.crystal_visitor.visit(other_raw_args[0])
+    templatetype, other_args, other_raw_args = numcr__parse_args(funcdb)
+    argzero = other_args[0]
     if isinstance(other_raw_args[0], ast.Constant):
         # First arg is a constant, convert to an Array
         arg0 = "[%s]" % argzero
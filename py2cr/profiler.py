@@ -0,0 +1,123 @@
+"""
+Profiler of the translation itself.
+
+Records, per visit_* method of the RB visitor and per CrystalTranslator
+function, the number of calls, the cumulative time, the self time
+(without the nested visits and translators) and the slowest source
+locations.  The visitor is only instrumented when profiling (see
+ProfilingRB), a normal translation does not pay for it.
+"""
+
+from typing import Dict, List, Optional, TextIO, Tuple
+import heapq
+import json
+import time
+
+SLOWEST_COUNT = 5 # source locations kept per entry
+
+# (seconds, filename, lineno, col_offset)
+Location = Tuple[float, str, int, int]
+
+class Stat:
+    """Counters of one visitor or translator function"""
+
+    __slots__ = ('count', 'total', 'own', 'slowest')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.own = 0.0
+        # min-heap of the slowest calls
+        self.slowest : List[Location] = []
+
+    def add(self, total : float, own : float, location : Location) -> None:
+        self.count += 1
+        self.total += total
+        self.own += own
+        if len(self.slowest) < SLOWEST_COUNT:
+            heapq.heappush(self.slowest, location)
+        elif location[0] > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, location)
+
+    def merge(self, other : 'Stat') -> None:
+        self.count += other.count
+        self.total += other.total
+        self.own += other.own
+        for location in other.slowest:
+            if len(self.slowest) < SLOWEST_COUNT:
+                heapq.heappush(self.slowest, location)
+            elif location[0] > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, location)
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'self': self.own,
+            'slowest': [{'seconds': s, 'file': f, 'line': l, 'col': c}
+                        for s, f, l, c in sorted(self.slowest, reverse=True)],
+        }
+
+class Profiler:
+    """
+    Collects the Stats of the translations done with it, for example
+    all the modules of a `py2cr -m` run.  Profilers of worker processes
+    are merged with merge().
+    """
+
+    SORT_KEYS = ('self', 'total', 'count')
+
+    def __init__(self):
+        self.stats : Dict[str, Stat] = {}
+        # source file of the calls being recorded
+        self.filename = '<string>'
+        # time spent in the nested calls of each running call
+        self._children : List[float] = []
+
+    def call(self, name : str, node, func, *args, **kwargs):
+        """Call func(*args, **kwargs) and record it under `name`"""
+        children = self._children
+        children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            own = elapsed - children.pop()
+            if children:
+                children[-1] += elapsed
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = Stat()
+            stat.add(elapsed, own, (elapsed, self.filename,
+                                    getattr(node, 'lineno', 0), getattr(node, 'col_offset', 0)))
+
+    def merge(self, other : 'Profiler') -> None:
+        for name, stat in other.stats.items():
+            self.stats.setdefault(name, Stat()).merge(stat)
+
+    def sorted_stats(self, sort : str = 'self') -> List[Tuple[str, Stat]]:
+        attr = {'self': 'own', 'total': 'total', 'count': 'count'}[sort]
+        return sorted(self.stats.items(), key=lambda item: (-getattr(item[1], attr), item[0]))
+
+    def to_dict(self, sort : str = 'self') -> dict:
+        return {name: stat.to_dict() for name, stat in self.sorted_stats(sort)}
+
+    def write_json(self, f : TextIO, sort : str = 'self') -> None:
+        json.dump(self.to_dict(sort), f, indent=2)
+        f.write("\n")
+
+    def write_table(self, f : TextIO, sort : str = 'self', limit : Optional[int] = None) -> None:
+        """Print the stats as a table sorted by `sort`, slowest location last"""
+        rows = self.sorted_stats(sort)
+        if limit is not None:
+            rows = rows[:limit]
+        width = max([len(name) for name, _stat in rows] + [len('function')])
+        f.write("%-*s %9s %10s %10s %10s  %s\n" % (width, 'function', 'calls', 'total(s)', 'self(s)', 'self/call', 'slowest'))
+        for name, stat in rows:
+            slowest = ''
+            if stat.slowest:
+                seconds, filename, lineno, col = max(stat.slowest)
+                slowest = "%s:%d:%d (%.3fs)" % (filename, lineno, col, seconds)
+            f.write("%-*s %9d %10.4f %10.4f %8.1fus  %s\n" % (width, name, stat.count, stat.total, stat.own,
+                                                           stat.own / stat.count * 1e6 if stat.count else 0.0, slowest))
@@ -0,0 +1,274 @@
+"""
+Translation daemon (`py2cr --serve SOCKET`).
+
+Keeps the translator loaded and the module summaries of the files it
+has seen, and answers translate requests on a Unix-domain socket.  The
+protocol is one JSON object per line in each direction:
+
+    -> {"path": "tests/modules/classname.py", "base_path": "tests/modules"}
+    -> {"source": "x = [1, 2]\\n", "path": "unsaved.py"}
+    <- {"status": 0, "result": "OK", "crystal": "...", "warnings": [...], "seconds": 0.002}
+
+A request may also be {"command": "ping"} or {"command": "shutdown"}.
+Each connection is served by its own thread, so an editor may keep its
+connection open, and its requests are answered in order.  The
+translations themselves run one at a time: they share the summaries.
+Optionally a directory tree is watched from another thread, and every
+python file saved in it is translated to the .cr file next to it,
+followed by the files of the tree importing it.
+
+The translations of the top-level definitions of each path (the "path"
+of a source, if any) are kept, so that translating a file again only
+translates the definitions that changed, see incremental.py.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from . import cache
+from . import importgraph
+from . import incremental
+from . import ModuleSummaryTable, ResultStatus, convert_py2cr, convert_py2cr_write
+
+POLL_INTERVAL = 0.5 # seconds between checks of the watched tree
+
+def _warnings(text : str) -> List[str]:
+    return [line for line in text.splitlines() if line]
+
+class Watcher:
+    """Finds the python files of a directory tree that changed since the last check"""
+
+    def __init__(self, root : str):
+        self.root = root
+        self._stamps = self.scan()
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        stamps = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # skip hidden directories, among them the translation cache
+            dirnames[:] = [d for d in dirnames if not d.startswith('.') and d != '__pycache__']
+            for filename in filenames:
+                if filename.endswith('.py'):
+                    path = os.path.normpath(os.path.join(dirpath, filename))
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    stamps[path] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def paths(self) -> List[str]:
+        """The python files of the tree at the last check"""
+        return list(self._stamps)
+
+    def changed(self) -> List[str]:
+        stamps = self.scan()
+        changed = sorted(path for path, stamp in stamps.items() if self._stamps.get(path) != stamp)
+        self._stamps = stamps
+        return changed
+
+class TranslationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix-domain socket server sharing one ModuleSummaryTable (and the
+    translation cache) between all its requests.
+    """
+
+    timeout = POLL_INTERVAL # of handle_request(), see serve()
+    daemon_threads = True   # an open connection does not block the shutdown
+
+    def __init__(self, socket_path : str, base_path_count : int = 0, require : bool = True,
+                 translation_cache : Optional[cache.TranslationCache] = None,
+                 watch : Optional[str] = None, verbose : bool = False):
+        self.socket_path = socket_path
+        self.base_path_count = base_path_count
+        self.require = require
+        self.verbose = verbose
+        self.summaries = ModuleSummaryTable(translation_cache=translation_cache)
+        self.watcher = Watcher(watch) if watch else None
+        # path -> top-level definitions of its last translation
+        self.definitions : Dict[str, incremental.DefinitionCache] = {}
+        self.stopping = False
+        # held while translating: the translator and the tables are shared,
+        # and the output is captured by redirecting sys.stdout and sys.stderr
+        self.lock = threading.RLock()
+        if os.path.exists(socket_path):
+            # left over by a previous server, unless one is still running
+            if _alive(socket_path):
+                raise OSError("py2cr server already running on %s" % socket_path)
+            os.unlink(socket_path)
+        super().__init__(socket_path, TranslationHandler)
+
+    def log(self, message : str) -> None:
+        if self.verbose:
+            with self.lock:
+                sys.stderr.write(message + "\n")
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def start_watcher(self) -> Optional[threading.Thread]:
+        """Check the watched tree on a thread of its own, until the server stops"""
+        if self.watcher is None:
+            return None
+        thread = threading.Thread(target=self.watch, name="py2cr-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def watch(self) -> None:
+        while not self.stopping:
+            time.sleep(POLL_INTERVAL)
+            self.write_changed()
+
+    def write_changed(self) -> List[str]:
+        """
+        Translate the files of the watched tree saved since the last
+        check, and the files importing them.  Returns their paths.
+        """
+        changed = self.watcher.changed()
+        if not changed:
+            return []
+        with self.lock:
+            self.summaries.refresh()
+            graph = importgraph.ImportGraph(self.watcher.root, read_source=self.summaries.source,
+                                            translation_cache=self.summaries.cache)
+            for path in sorted(self.watcher.paths()):
+                graph.add(path)
+            targets = set(changed)
+            for path in changed:
+                targets.update(graph.dependents(path))
+            paths = [path for path in graph.build_plan() if path in targets]
+            for path in paths:
+                self.write(path, self.watcher.root)
+        return paths
+
+    def translate(self, request : dict) -> dict:
+        """Answer one translate request"""
+        with self.lock:
+            return self._translate(request)
+
+    def _translate(self, request : dict) -> dict:
+        start = time.perf_counter()
+        # reuse the summaries of the dependencies unless they were saved
+        self.summaries.refresh()
+        require = request.get('require', self.require)
+        base_path_count = request.get('base_path_count', self.base_path_count)
+        out = io.StringIO()
+        err = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                if 'source' in request:
+                    rtn, header, data = convert_py2cr(request['source'], '', base_path_count=base_path_count, no_stop=True,
+                                                      definitions=self.module_definitions(request.get('path', '')))
+                    if require:
+                        out.write("require \"py2cr\"\n")
+                        out.write(header)
+                    out.write(data)
+                else:
+                    path = os.path.normpath(request['path'])
+                    base_path = request.get('base_path') or os.path.dirname(path)
+                    rtn = convert_py2cr_write(path, base_path_count, self.dependencies(path, base_path), base_path,
+                                              require, no_stop=True, summaries=self.summaries,
+                                              definitions=self.module_definitions(path))
+        except Exception as e:
+            return {'status': ResultStatus.INCLUDE_ERROR.value, 'result': ResultStatus.INCLUDE_ERROR.name,
+                    'error': "%s: %s" % (type(e).__name__, e), 'warnings': _warnings(err.getvalue()),
+                    'seconds': time.perf_counter() - start}
+        return {'status': rtn.value, 'result': rtn.name, 'crystal': out.getvalue(),
+                'warnings': _warnings(err.getvalue()), 'seconds': time.perf_counter() - start}
+
+    def module_definitions(self, path : str) -> incremental.DefinitionCache:
+        definitions = self.definitions.get(path)
+        if definitions is None:
+            definitions = self.definitions[path] = incremental.DefinitionCache()
+        return definitions
+
+    def dependencies(self, path : str, base_path : str) -> List[str]:
+        graph = importgraph.ImportGraph(base_path, read_source=self.summaries.source,
+                                        translation_cache=self.summaries.cache)
+        graph.add(path)
+        return graph.dependencies(path)
+
+    def write(self, path : str, base_path : str) -> None:
+        """Translate a watched file into the .cr file next to it"""
+        with self.lock:
+            self._write(path, base_path)
+
+    def _write(self, path : str, base_path : str) -> None:
+        self.summaries.refresh()
+        name_path, _ext = os.path.splitext(path)
+        output = name_path + '.cr'
+        err = io.StringIO()
+        try:
+            with contextlib.redirect_stderr(err):
+                rtn = convert_py2cr_write(path, self.base_path_count, self.dependencies(path, base_path), base_path,
+                                          self.require, output, force=True, no_stop=True, summaries=self.summaries,
+                                          definitions=self.module_definitions(path))
+            result = rtn.name
+        except Exception as e:
+            result = "%s: %s" % (type(e).__name__, e)
+        sys.stderr.write("Watch : %s -> %s : [%s]\n" % (path, output, result))
+        sys.stderr.write(err.getvalue())
+
+class TranslationHandler(socketserver.StreamRequestHandler):
+    """Reads JSON requests from a connection until it is closed"""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                response = {'error': "invalid request: %s" % e}
+            else:
+                command = request.get('command', 'translate')
+                if command == 'ping':
+                    response = {'result': 'pong'}
+                elif command == 'shutdown':
+                    response = {'result': 'shutdown'}
+                    self.server.stopping = True
+                elif command == 'translate':
+                    response = self.server.translate(request)
+                    self.server.log("Serve : %s : %s (%.1fms)" % (request.get('path', '<source>'), response['result'],
+                                                                  response['seconds'] * 1000))
+                else:
+                    response = {'error': "unknown command: %s" % command}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b"\n")
+            self.wfile.flush()
+
+def _alive(socket_path : str) -> bool:
+    with contextlib.suppress(OSError), socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        return True
+    return False
+
+def request(socket_path : str, **req) -> dict:
+    """Send one request to a running server and return its response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(req).encode('utf-8') + b"\n")
+        with sock.makefile('rb') as f:
+            return json.loads(f.readline())
+
+def serve(socket_path : str, **kwargs) -> None:
+    """Run a TranslationServer until it is shut down or interrupted"""
+    with TranslationServer(socket_path, **kwargs) as server:
+        sys.stderr.write("py2cr serving on %s\n" % socket_path)
+        server.start_watcher()
+        try:
+            while not server.stopping:
+                server.handle_request() # each connection on a thread
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stopping = True
@@ -0,0 +1,145 @@
+"""
+Source maps from the generated Crystal lines back to the python source.
+
+The RB visitor records, for every line it writes, the position of the
+python statement being translated (see Formatter.position).  A map is
+saved as `<file>.cr.map`, in the JSON format of version 3 javascript
+source maps: one segment per generated line, at column 0, with base64
+VLQ encoded deltas.
+
+rewrite() (`py2cr remap`) annotates the `file.cr:LINE` locations of a
+Crystal stack trace or of `perf report --sort srcline` output with the
+python location they come from.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import re
+
+# 0-based (line, column) of a python statement, None for generated lines
+Position = Optional[Tuple[int, int]]
+
+_BASE64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_BASE64_VALUES = dict((c, i) for i, c in enumerate(_BASE64))
+
+def vlq_encode(value : int) -> str:
+    """Base64 VLQ of a signed integer"""
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    chars = []
+    while True:
+        digit = value & 31
+        value >>= 5
+        if value:
+            digit |= 32
+        chars.append(_BASE64[digit])
+        if not value:
+            return "".join(chars)
+
+def vlq_decode(segment : str) -> List[int]:
+    """Signed integers of a base64 VLQ segment"""
+    values = []
+    value = shift = 0
+    for c in segment:
+        digit = _BASE64_VALUES[c]
+        value += (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            values.append(-(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return values
+
+class SourceMap:
+    """Python position of each line of a generated Crystal file"""
+
+    def __init__(self, file : str = '', source : str = ''):
+        self.file = file
+        self.source = source
+        self.lines : List[Position] = []
+
+    def prepend(self, count : int) -> None:
+        """Account for `count` generated lines written before the translation"""
+        self.lines[0:0] = [None] * count
+
+    def lookup(self, line : int) -> Optional[Tuple[str, int, int]]:
+        """(source, line, column), 1-based lines, of a 1-based generated line"""
+        if 1 <= line <= len(self.lines) and self.lines[line - 1] is not None:
+            src_line, src_col = self.lines[line - 1]
+            return (self.source, src_line + 1, src_col)
+        return None
+
+    def mappings(self) -> str:
+        segments = []
+        prev_line = prev_col = 0
+        for position in self.lines:
+            if position is None:
+                segments.append("")
+                continue
+            line, col = position
+            # generated column, source index, source line, source column
+            segments.append("A" + "A" + vlq_encode(line - prev_line) + vlq_encode(col - prev_col))
+            prev_line, prev_col = line, col
+        return ";".join(segments)
+
+    def set_mappings(self, mappings : str) -> None:
+        self.lines = []
+        line = col = 0
+        for segment in mappings.split(";"):
+            if segment == "":
+                self.lines.append(None)
+                continue
+            values = vlq_decode(segment.split(",")[0])
+            line += values[2]
+            col += values[3]
+            self.lines.append((line, col))
+
+    def to_json(self) -> dict:
+        return {
+            "version": 3,
+            "file": self.file,
+            "sources": [self.source],
+            "names": [],
+            "mappings": self.mappings(),
+        }
+
+    def write(self, path : str) -> None:
+        with open(path, 'w', encoding="utf-8") as f:
+            json.dump(self.to_json(), f)
+            f.write("\n")
+
+    @classmethod
+    def load(cls, path : str) -> 'SourceMap':
+        with open(path, 'r', encoding="utf-8") as f:
+            value = json.load(f)
+        source_map = cls(value.get("file", ''), (value.get("sources") or [''])[0])
+        source_map.set_mappings(value.get("mappings", ''))
+        return source_map
+
+# file.cr:LINE or file.cr:LINE:COL, as in crystal stack traces and perf
+_LOCATION = re.compile(r'([^\s:()\[\]\'"]+\.cr):(\d+)(?::(\d+))?')
+
+def rewrite(text : str, base_dir : str = '.', maps : Optional[Dict[str, Optional[SourceMap]]] = None) -> str:
+    """
+    Append the python location to every `file.cr:LINE` of text whose
+    `file.cr.map` exists (relative paths are taken from base_dir).
+    """
+    maps = maps if maps is not None else {}
+
+    def replace(match):
+        cr_path = match.group(1)
+        if cr_path not in maps:
+            map_path = os.path.join(base_dir, cr_path) + '.map'
+            maps[cr_path] = SourceMap.load(map_path) if os.path.exists(map_path) else None
+        source_map = maps[cr_path]
+        if source_map is None:
+            return match.group(0)
+        location = source_map.lookup(int(match.group(2)))
+        if location is None:
+            return match.group(0)
+        source, line, _col = location
+        if not os.path.isabs(source):
+            source = os.path.normpath(os.path.join(os.path.dirname(cr_path), source))
+        return "%s [%s:%d]" % (match.group(0), source, line)
+
+    return _LOCATION.sub(replace, text)
@@ -0,0 +1,267 @@
+"""
+Symbol table of the RB visitor.
+
+The table is a chain of nested scopes (module, class, function, lambda,
+comprehension) pushed and popped while the tree is visited.  Each scope
+maps its names to a symbol kind, so every lookup is a dict lookup
+instead of a scan of the old per-visitor lists.
+"""
+
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import ast
+import contextlib
+
+from . import formatter
+
+# Scope kinds
+MODULE = 'module'
+CLASS = 'class'
+FUNCTION = 'function'
+LAMBDA = 'lambda'
+COMPREHENSION = 'comprehension'
+
+# Kinds of local names
+VARIABLE = 'variable'   # assigned in the scope
+ARGUMENT = 'argument'   # function or lambda argument
+KWARG = 'kwarg'         # **kwargs argument, subscripted with symbols
+GLOBAL = 'global'       # declared by a global statement
+PROC = 'proc'           # lambda or closure, called with .call()
+
+# Kinds of class members
+SELF_FUNCTION = 'self_function'         # instance method
+CLASS_FUNCTION = 'class_function'       # @staticmethod (crystal class method)
+CLASS_VARIABLE = 'class_variable'       # crystal @@variable
+INSTANCE_VARIABLE = 'instance_variable' # crystal @variable
+
+class Scope:
+    """
+    One level of the scope chain.
+
+    `names` holds the local names, `members` the methods and variables
+    of a class scope by member kind (a property and a class variable may
+    share a name) and `imports` the imported modules of the module scope
+    (dotted name -> module name, which differs for an alias).
+    """
+
+    __slots__ = ('kind', 'name', 'closed', 'names', 'members', 'imports')
+
+    def __init__(self, kind : str, name : Optional[str] = None, closed : Optional[bool] = None):
+        self.kind = kind
+        self.name = name
+        # A closed scope starts a new crystal local scope (module, class,
+        # def).  Lambdas, closures and comprehensions become crystal procs
+        # and blocks, which see the names of the enclosing scopes.
+        if closed is None:
+            closed = kind in (MODULE, CLASS, FUNCTION)
+        self.closed = closed
+        self.names : Dict[str, str] = {}
+        self.members : Dict[str, Dict[str, None]] = {}
+        self.imports : Dict[str, str] = {}
+
+    def define(self, name : str, kind : str) -> None:
+        self.names[name] = kind
+
+    def declare(self, name : str, kind : str) -> None:
+        """Define name unless it is already defined in this scope"""
+        self.names.setdefault(name, kind)
+
+    def define_member(self, name : str, kind : str) -> None:
+        self.members.setdefault(kind, {})[name] = None
+
+    def is_member(self, name : str, kind : str) -> bool:
+        return name in self.members.get(kind, ())
+
+    def member_names(self, kind : str) -> List[str]:
+        """Members of the given kind, in definition order"""
+        return list(self.members.get(kind, ()))
+
+    def __repr__(self) -> str:
+        return "Scope(%s %s %s)" % (self.kind, self.name, self.names)
+
+class ImportResolver:
+    """
+    Maps a called dotted name to its crystal qualified form through the
+    imported modules of a module:
+
+        <Python>    import imported.moduleb
+                    imported.moduleb.moduleb_fn()
+        <Crystal>   Imported::Moduleb.moduleb_fn()
+
+    The imports are tried in import order.  Each import contributes two
+    prefixes, the import itself and its path relative to the translated
+    module, both indexed in a dict so that a lookup costs one dict probe
+    per distinct prefix length instead of a scan of all the imports.
+    Resolutions are cached per call string until an import is added.
+    """
+
+    def __init__(self, module_paths : Optional[List[str]] = None, base_path_count : int = 0):
+        # dotted relative paths of the local modules being translated along
+        self.module_paths : List[str] = module_paths or []
+        self.base_path_count = base_path_count
+        self._count = 0
+        # prefix -> (import order, (prefix, crystal base, separator))
+        self._prefixes : Dict[str, Tuple[Tuple[int, int], Tuple[str, str, str]]] = {}
+        self._lengths : Set[int] = set()
+        self._cache : Dict[str, Optional[Tuple[str, str, str]]] = {}
+        # dotted prefix -> first module path under it, see _module_under()
+        self._module_prefixes : Optional[Dict[str, str]] = None
+
+    def _index(self, prefix : str, order : Tuple[int, int], base : str, separator : str) -> None:
+        if prefix not in self._prefixes:
+            self._prefixes[prefix] = (order, (prefix, base, separator))
+            self._lengths.add(len(prefix))
+
+    def add(self, name : str) -> None:
+        """Index an imported module name or alias"""
+        order = self._count
+        self._count += 1
+        # <Python>    imported.moduleb.moduleb_class
+        # <Crystal>   Imported::Moduleb::Moduleb_class (base_path_count=0)
+        #                       Moduleb::Moduleb_class (base_path_count=1)
+        base = '::'.join([formatter.capitalize(x) for x in name.split('.')[self.base_path_count:]])
+        self._index(name, (order, 0), base, '.')
+        # <Python>    * tests/modules/imported/modulee.py
+        #               from imported.submodules import submodulea
+        #               submodulea.foo()
+        # <Crystal>   * tests/modules/imported/modulee.cr
+        #               require_relative 'submodules/submodulea'
+        #               include Submodules
+        #               Submodulea::foo()
+        rel_name = '.'.join(name.split('.')[self.base_path_count:])
+        module_path = self._module_under(rel_name)
+        if module_path is not None:
+            rel_name = module_path.replace(rel_name + '.', '')
+        base = '::'.join([formatter.capitalize(x) for x in rel_name.split('.')])
+        self._index(rel_name, (order, 1), base, '::')
+        self._cache.clear()
+
+    def _module_under(self, rel_name : str) -> Optional[str]:
+        """First of the module paths that starts with rel_name + '.'"""
+        if self._module_prefixes is None:
+            self._module_prefixes = {}
+            for module_path in self.module_paths:
+                pos = module_path.find('.')
+                while pos != -1:
+                    self._module_prefixes.setdefault(module_path[:pos], module_path)
+                    pos = module_path.find('.', pos + 1)
+        return self._module_prefixes.get(rel_name)
+
+    def resolve(self, func : str) -> Optional[Tuple[str, str, str]]:
+        """
+        (name, crystal base, separator) of a call through an import, with
+        the import prefix removed from the name, or None.
+        """
+        try:
+            return self._cache[func]
+        except KeyError:
+            pass
+        best = None
+        for length in self._lengths:
+            if length <= len(func):
+                entry = self._prefixes.get(func[:length])
+                if entry is not None and (best is None or entry[0] < best[0]):
+                    best = entry
+        result = None
+        if best is not None:
+            order, (prefix, base, separator) = best
+            if order[1] == 0:
+                name = func.replace(prefix + '.', '', 1)
+            else:
+                name = func.replace(prefix + '.', '')
+            result = (name, base, separator)
+        self._cache[func] = result
+        return result
+
+class SymbolTable:
+    """
+    Chain of scopes, the innermost last.  The module scope is always at
+    the bottom of the chain.
+    """
+
+    def __init__(self, module_paths : Optional[List[str]] = None, base_path_count : int = 0):
+        self.module = Scope(MODULE)
+        self._chain : List[Scope] = [self.module]
+        self.resolver = ImportResolver(module_paths, base_path_count)
+
+    @property
+    def scope(self) -> Scope:
+        return self._chain[-1]
+
+    def push(self, kind : str, name : Optional[str] = None, closed : Optional[bool] = None) -> Scope:
+        scope = Scope(kind, name, closed)
+        self._chain.append(scope)
+        return scope
+
+    def pop(self) -> Scope:
+        if len(self._chain) == 1:
+            raise IndexError("cannot pop the module scope")
+        return self._chain.pop()
+
+    @contextlib.contextmanager
+    def new_scope(self, kind : str, name : Optional[str] = None, closed : Optional[bool] = None) -> Iterator[Scope]:
+        scope = self.push(kind, name, closed)
+        try:
+            yield scope
+        finally:
+            self.pop()
+
+    def define(self, name : str, kind : str) -> None:
+        self._chain[-1].names[name] = kind
+
+    def declare(self, name : str, kind : str) -> None:
+        self._chain[-1].names.setdefault(name, kind)
+
+    def lookup(self, name : str) -> Optional[str]:
+        """
+        Kind of a local name as seen from the innermost scope, or None.
+        The search stops at the first closed scope (see Scope.closed).
+        """
+        for scope in reversed(self._chain):
+            kind = scope.names.get(name)
+            if kind is not None:
+                return kind
+            if scope.closed:
+                break
+        return None
+
+    def enclosing(self, kind : str) -> Optional[Scope]:
+        """Innermost scope of the given kind"""
+        for scope in reversed(self._chain):
+            if scope.kind == kind:
+                return scope
+        return None
+
+    def function_name(self) -> Optional[str]:
+        """Name of the innermost function being defined"""
+        scope = self.enclosing(FUNCTION)
+        return scope.name if scope else None
+
+    def is_member(self, name : str, kind : str) -> bool:
+        """True if name is a member of the given kind of the innermost class"""
+        scope = self.enclosing(CLASS)
+        return scope is not None and scope.is_member(name, kind)
+
+    def define_member(self, name : str, kind : str) -> None:
+        scope = self.enclosing(CLASS)
+        if scope is not None:
+            scope.define_member(name, kind)
+
+    def member_names(self, kind : str) -> List[str]:
+        scope = self.enclosing(CLASS)
+        return scope.member_names(kind) if scope else []
+
+    def add_import(self, name : str, module : Optional[str] = None) -> None:
+        if name not in self.module.imports:
+            self.module.imports[name] = module or name
+            self.resolver.add(name)
+
+    def is_import(self, name : str) -> bool:
+        return name in self.module.imports
+
+    def imports(self) -> List[str]:
+        """Imported module names and aliases, in import order"""
+        return list(self.module.imports)
+
+def target_names(target : ast.AST) -> List[str]:
+    """Names bound by an assignment or loop target"""
+    return [node.id for node in ast.walk(target) if isinstance(node, ast.Name)]
@@ -1,45 +1,156 @@
 #from typing import Dict
+import importlib
+import sys
 
 class CrystalTranslator:
     """Abstract Base Class that other translators inherit from"""
     def __init__(self):
         pass
 
+# python module-name to the py2cr module defining its translator.
+# Translator modules are only imported when the python module is first
+# looked up, so that startup does not grow with the number of translators.
+# (tests/test_startup.py checks this manifest against the translators)
+TRANSLATOR_MANIFEST = {
+    "": "pymain",
+    "typing": "pymain",
+    "functools": "pymain",
+    "random": "pymain",
+    "os": "pyos",
+    "os.path": "pyos",
+    "sys": "pysys",
+    "six": "pysix",
+    "six.moves": "pysix",
+    "copy": "pycopy",
+    "numpy": "numpy",
+    "numpy.random": "numpy",
+    "collections": "numpy",
+}
+
+# entry point group of the translator packages outside of py2cr: the name
+# of an entry point is the python module it translates, its value a
+# module defining CrystalTranslator subclasses (or a subclass).  They
+# are found when the source first imports a module that is neither in
+# the manifest nor in the standard library, and loaded when it imports
+# their python module.
+PLUGIN_GROUP = "py2cr.translators"
+
+def plugin_entry_points() -> dict:
+    """python module-name -> entry point of the installed translator packages"""
+    try:
+        from importlib import metadata
+    except ImportError: # python < 3.8
+        return {}
+    try:
+        entry_points = metadata.entry_points(group=PLUGIN_GROUP)
+    except TypeError: # python < 3.10
+        entry_points = metadata.entry_points().get(PLUGIN_GROUP, [])
+    return {entry_point.name: entry_point for entry_point in entry_points}
+
 class TranslatorRegistry:
-    def __init__(self):
+    """
+    CrystalTranslator subclasses by python module-name.  The translator
+    functions and attributes are looked up in flat tables keyed by
+    (python module-name, attribute), filled on the first lookup of each
+    entry (missing ones are kept as None), so that a lookup is a single
+    dict hit.  The translator module of a python module (see
+    TRANSLATOR_MANIFEST) is imported on its first lookup, a plugin (see
+    PLUGIN_GROUP) when the python module is imported by the source.  A
+    program embedding py2cr registers its translators with register().
+    """
+
+    def __init__(self, manifest=None, plugins=None):
         # python module-name to translator-subclass
         self.map_pymod_to_klass = {}
         # python module-name to crystal require
         self.map_pymod_to_require = {}
+        # python module-name to py2cr module, until imported
+        self.manifest = dict(TRANSLATOR_MANIFEST if manifest is None else manifest)
+        # python module-name to plugin entry point, until loaded
+        self.plugins = None if plugins is None else dict(plugins)
+        # (python module-name, name) -> translator function / crystal attribute or None
+        self.func_table = {}
+        self.attr_table = {}
+        self._registered = set()
+        self.register_subclasses()
+
+    def register(self, klass) -> None:
+        """Register a CrystalTranslator subclass, replacing the translator of its python module"""
+        self._registered.add(klass)
+        obj = klass()
+        modname = obj.python_module_name
+        self.map_pymod_to_klass[modname] = klass
+        self.map_pymod_to_require[modname] = obj.crystal_require
+        # the entries of the previous lookups of the module
+        for table in (self.func_table, self.attr_table):
+            for key in [key for key in table if key[0] == modname]:
+                del table[key]
+
+    def register_subclasses(self):
+        # subclasses defined since the last call: by a translator
+        # module of the manifest, or by a program embedding py2cr
+        subclasses = CrystalTranslator.__subclasses__()
+        if len(subclasses) == len(self._registered):
+            return
+        for klass in subclasses:
+            if klass not in self._registered:
+                self.register(klass)
+
+    def load(self, modname : str, imported : bool = False):
+        """
+        Import the translator module of a python module, or its plugin if
+        the python module is imported by the source, if not yet done
+        """
+        py2cr_module = self.manifest.pop(modname, None)
+        if py2cr_module is not None:
+            importlib.import_module("." + py2cr_module, __package__)
+            # the other python modules of the same translator module
+            for name in [name for name, mod in self.manifest.items() if mod == py2cr_module]:
+                del self.manifest[name]
+        elif imported and modname and modname.split('.')[0] not in getattr(sys, 'stdlib_module_names', ()):
+            if self.plugins is None:
+                self.plugins = plugin_entry_points()
+            entry_point = self.plugins.pop(modname, None)
+            if entry_point is not None:
+                loaded = entry_point.load()
+                if isinstance(loaded, type) and issubclass(loaded, CrystalTranslator) and \
+                   loaded not in self._registered:
+                    self.register(loaded)
+        self.register_subclasses()
 
-        for klass in CrystalTranslator.__subclasses__():
-            obj = klass()
-            self.map_pymod_to_klass[obj.python_module_name] = klass
-            self.map_pymod_to_require[obj.python_module_name] = obj.crystal_require
+    def klass_lookup(self, modname : str, imported : bool = False):
+        klass = self.map_pymod_to_klass.get(modname)
+        if klass is None:
+            self.load(modname, imported)
+            klass = self.map_pymod_to_klass.get(modname)
+        return klass
 
     def func_lookup(self, modname : str, attrname : str):
-        if modname in self.map_pymod_to_klass:
-            klass = self.map_pymod_to_klass[modname]
-            if hasattr(klass, attrname):
-                return getattr(klass, attrname)
-        return None
+        try:
+            return self.func_table[(modname, attrname)]
+        except KeyError:
+            klass = self.klass_lookup(modname)
+            func = getattr(klass, attrname, None) if klass is not None else None
+            self.func_table[(modname, attrname)] = func
+            return func
 
     def attr_lookup(self, modname : str, attrname : str):
-        if modname in self.map_pymod_to_klass:
-            klass = self.map_pymod_to_klass[modname]
-            try:
-                newattr = klass.attribute_map.get(attrname)
-                return newattr
-            except AttributeError:
-                return None
-        return None
+        try:
+            return self.attr_table[(modname, attrname)]
+        except KeyError:
+            klass = self.klass_lookup(modname)
+            attribute_map = getattr(klass, 'attribute_map', None) if klass is not None else None
+            attr = attribute_map.get(attrname) if attribute_map is not None else None
+            self.attr_table[(modname, attrname)] = attr
+            return attr
 
     def require_lookup_or_none(self, modname : str):
         # a fetch or None if we dont have it.
+        self.klass_lookup(modname, imported=True)
         return self.map_pymod_to_require.get(modname, None)
 
     def require_lookup(self, modname : str):
         # If we cannot find a crystal-require for this module, then use the
         # python module-name as-is for the crystal-require
+        self.klass_lookup(modname, imported=True)
         return self.map_pymod_to_require.get(modname, modname)
-    
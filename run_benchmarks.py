@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+""" Runs the translator throughput benchmarks of py2cr """
+import sys
+import argparse
+import testtools.benchmark
+import testtools.dispatch
+import testtools.loopbench
+import testtools.scaling
+
+def main():
+    """ Benchmark runner CLI """
+    option_parser = argparse.ArgumentParser(
+        usage="%(prog)s [options] [benchmark names]",
+        description="py2cr translator benchmarks."
+        )
+    option_parser.add_argument(
+        "-s",
+        "--scale",
+        action="store",
+        dest="scale",
+        type=float,
+        default=1.0,
+        help="scale the size of the synthetic modules (default: %(default)s)"
+        )
+    option_parser.add_argument(
+        "-n",
+        "--repeat",
+        action="store",
+        dest="repeat",
+        type=int,
+        default=3,
+        help="number of timed runs, the best is kept (default: %(default)s)"
+        )
+    option_parser.add_argument(
+        "--top",
+        action="store",
+        dest="top",
+        type=int,
+        default=10,
+        help="number of node types with the highest self time to report (default: %(default)s)"
+        )
+    option_parser.add_argument(
+        "--history",
+        action="store",
+        dest="history",
+        default=testtools.benchmark.HISTORY_FILE,
+        help="JSON file the results are appended to (default: %(default)s)"
+        )
+    option_parser.add_argument(
+        "--no-record",
+        action="store_false",
+        dest="record",
+        default=True,
+        help="do not append the results to the history"
+        )
+    option_parser.add_argument(
+        "--compare",
+        action="store_true",
+        dest="compare",
+        default=False,
+        help="fail if the throughput is lower than the last recorded run of the same scale"
+        )
+    option_parser.add_argument(
+        "--threshold",
+        action="store",
+        dest="threshold",
+        type=float,
+        default=10.0,
+        help="regression threshold of --compare in percent (default: %(default)s)"
+        )
+    option_parser.add_argument(
+        "-l",
+        "--list",
+        action="store_true",
+        dest="list",
+        default=False,
+        help="list the benchmarks"
+        )
+    option_parser.add_argument(
+        "--scaling",
+        action="store_true",
+        dest="scaling",
+        default=False,
+        help="run the scaling tests instead (names are families), fail if one grows faster than its bound"
+        )
+    option_parser.add_argument(
+        "--loops",
+        action="store_true",
+        dest="loops",
+        default=False,
+        help="run the crystal micro-benchmark of the translated range loops instead (needs crystal)"
+        )
+    option_parser.add_argument(
+        "--dispatch",
+        action="store_true",
+        dest="dispatch",
+        default=False,
+        help="run the micro-benchmark of the node dispatch of RB.visit() instead"
+        )
+    options, args = option_parser.parse_known_args()
+
+    if options.loops:
+        try:
+            sys.exit(testtools.loopbench.run())
+        except RuntimeError as ex:
+            sys.exit(str(ex))
+
+    if options.dispatch:
+        print(testtools.dispatch.format_result(testtools.dispatch.run(repeat=options.repeat)))
+        return
+
+    if options.scaling:
+        if options.list:
+            for name, (_generator, sizes, bound) in testtools.scaling.FAMILIES.items():
+                print("%-20s %s %s" % (name, bound, sizes))
+            return
+
+        def report_scaling(result):
+            print(testtools.scaling.format_result(result))
+            sys.stdout.flush()
+
+        results = testtools.scaling.run(args, options.repeat, report=report_scaling)
+        if not all(result["ok"] for result in results):
+            sys.exit(1)
+        return
+
+    if options.list:
+        for name in testtools.benchmark.benchmarks(options.scale):
+            print(name)
+        return
+
+    def report(name, result):
+        print(testtools.benchmark.format_result(name, result))
+        sys.stdout.flush()
+
+    history = testtools.benchmark.load_history(options.history)
+    record = testtools.benchmark.run(args, options.scale, options.repeat, options.top, report)
+    previous = testtools.benchmark.baseline(history, record)
+    if options.record:
+        history.append(record)
+        testtools.benchmark.save_history(options.history, history)
+
+    if options.compare:
+        if previous is None:
+            print("no previous run of scale %s in %s to compare with" % (options.scale, options.history))
+            return
+        regressions = testtools.benchmark.compare(previous, record, options.threshold)
+        print()
+        print("compared with %s (%s):" % (previous["date"], previous.get("commit")))
+        for name, old, new in regressions:
+            print("  %-32s %9.0f -> %9.0f lines/s (%+.1f%%)" % (name, old, new, (new / old - 1.0) * 100.0))
+        if regressions:
+            sys.exit(1)
+        print("  no regression above %.1f%%" % options.threshold)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+calls = []
+
+def load_rows():
+    """ an iterable with a side effect, and duplicated items """
+    calls.append(len(calls))
+    return [3, 1, 3]
+
+for x in load_rows():
+    print(x)
+else:
+    print("no break")
+
+for x in load_rows():
+    for y in range(3):
+        if y == 1:
+            break
+    if x == 1:
+        break
+else:
+    print("not printed")
+
+for i in range(4):
+    pass
+else:
+    print("range else", i)
+
+n = 0
+while n < 3:
+    n += 1
+    if n == 10:
+        break
+else:
+    print("while else", n)
+
+print(len(calls))
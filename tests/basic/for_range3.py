@@ -0,0 +1,25 @@
+def count_down(n):
+    for i in range(n, -1, -2):
+        if i == 4:
+            continue
+        print(i)
+    return i
+
+print(count_down(9))
+
+i = 42
+for i in range(0):
+    print("never")
+print(i)
+
+n = 3
+for i in range(1, n):
+    n = 10
+    i = i * 100
+    print(i)
+print(i, n)
+
+for j in range(5):
+    if j == 2:
+        break
+print(j)
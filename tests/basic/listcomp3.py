@@ -0,0 +1,11 @@
+a = [1, 2, 3, 4]
+b = [10, 20]
+
+print([x + y for x in a if x > 1 for y in b if y > 10])
+print([(x, y) for x in range(3) for y in range(x)])
+print([x for x in a if x > 1 if x % 2 == 0])
+print(sorted({x % 3 for x in a if x > 1}))
+print(sum(x * x for x in a if x < 4))
+squares = {x: x * x for x in a if x != 2}
+for k in sorted(squares.keys()):
+    print(k, squares[k])
@@ -0,0 +1,8 @@
+"""
+Puts the repository root on sys.path, so the test modules import the
+py2cr package and testtools of this tree without installing them.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
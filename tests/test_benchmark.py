@@ -0,0 +1,66 @@
+"""
+Checks the benchmark corpus and the regression check of run_benchmarks.py
+on a small scale.
+"""
+import ast
+import copy
+import io
+import contextlib
+import tracemalloc
+
+import py2cr
+from testtools import benchmark, corpus, dispatch, loopbench
+
+def test_synthetic_modules_translate():
+    for name, (generator, _size) in corpus.SYNTHETIC.items():
+        with contextlib.redirect_stderr(io.StringIO()):
+            rtn, _header, data = py2cr.convert_py2cr(generator(5), '', no_stop=True)
+        assert rtn != py2cr.ResultStatus.INCLUDE_ERROR and data, name
+
+def test_low_memory():
+    source = corpus.nested_expressions(300)
+    outputs = []
+    peaks = []
+    for low_memory in (False, True):
+        tracemalloc.start()
+        try:
+            outputs.append(py2cr.convert_py2cr(source, '', no_stop=True, low_memory=low_memory))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    assert outputs[0] == outputs[1]
+    assert peaks[1] < peaks[0] / 2, peaks
+
+def test_compare():
+    record = benchmark.run(["samples:deep-learning-from-scratch"], repeat=1, top=3)
+    result = record["results"]["samples:deep-learning-from-scratch"]
+    assert result["lines"] > 0 and result["errors"] == 0
+    assert result["peak_memory"] > 0 and result["peak_memory_low"] > 0 and len(result["node_costs"]) == 3
+    history = [record]
+    assert benchmark.baseline(history, dict(record, scale=2.0)) is None
+    assert benchmark.compare(benchmark.baseline(history, record), record, 10.0) == []
+    faster = copy.deepcopy(record)
+    faster["results"]["samples:deep-learning-from-scratch"]["lines_per_second"] *= 1.5
+    assert [name for name, _old, _new in benchmark.compare(faster, record, 10.0)] == ["samples:deep-learning-from-scratch"]
+    assert benchmark.compare(faster, record, 50.0) == []
+
+def test_loop_forms():
+    assert "PyRange" not in loopbench.translate(True) and "while" in loopbench.translate(True)
+    assert "py_each" in loopbench.translate(False) and "while" not in loopbench.translate(False)
+    text = loopbench.program(10)
+    for name in loopbench.FUNCTIONS:
+        assert "def %s_while(" % name in text and "def %s_iterator(" % name in text
+        assert 'x.report("%s while")' % name in text
+
+def test_dispatch():
+    result = dispatch.run(5, loops=1, repeat=1)
+    assert [way for way, _ns in result] == ["table", "getattr", "direct", "visit"]
+    assert all(ns > 0 for _way, ns in result)
+    assert {type(node) for node in dispatch.nodes(5)} == {ast.Name, ast.Constant}
+
+if __name__ == "__main__":
+    test_synthetic_modules_translate()
+    test_low_memory()
+    test_compare()
+    test_loop_forms()
+    test_dispatch()
@@ -0,0 +1,44 @@
+"""
+Checks the project mode (`py2cr build`): one .cr per module, the same
+as translating each module with its dependencies, and an entry file
+requiring every module after the modules it imports.
+"""
+import contextlib
+import io
+import os
+import tempfile
+
+import py2cr
+from py2cr import importgraph
+
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modules')
+
+def test_build():
+    with tempfile.TemporaryDirectory() as out_dir:
+        results = list(py2cr.build_project(BASE, out_dir))
+        (none, entry, _none), modules = results[-1], results[:-1]
+        assert none is None and entry == os.path.join(out_dir, 'modules.cr')
+        assert all(result.error is None for _py_path, _cr_path, result in modules)
+
+        graph = importgraph.ImportGraph(BASE)
+        for py_path, cr_path, _result in modules:
+            graph.add(py_path)
+            if os.path.dirname(py_path) == BASE:
+                out = io.StringIO()
+                with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+                    py2cr.convert_py2cr_write(py_path, 0, graph.dependencies(py_path), BASE, True, no_stop=True)
+                with open(cr_path) as f:
+                    assert f.read() == out.getvalue(), py_path
+
+        with open(entry) as f:
+            requires = [line.split('"')[1] for line in f if line.startswith('require')]
+        order = [os.path.normpath(os.path.join(out_dir, path)) + '.cr' for path in requires]
+        assert sorted(order) == sorted(cr_path for _py_path, cr_path, _result in modules)
+        position = dict((py_path, order.index(cr_path)) for py_path, cr_path, _result in modules)
+        for py_path in position:
+            for dep in graph.edges[py_path]:
+                if dep in position and py_path not in graph.reachable(dep): # not in a cycle
+                    assert position[dep] < position[py_path], (dep, py_path)
+
+if __name__ == "__main__":
+    test_build()
@@ -0,0 +1,91 @@
+"""
+Checks the translation cache of convert_py2cr_write(): a translation read
+from the cache has the output and the warnings of the translation, and
+the crystal code is stored and read in chunks.
+"""
+import contextlib
+import io
+import os
+import tempfile
+import tracemalloc
+
+import py2cr
+from py2cr import cache
+from testtools import corpus
+
+def test_cached_warnings():
+    with tempfile.TemporaryDirectory() as tmp:
+        py_path = os.path.join(tmp, 'warn.py')
+        cr_path = os.path.join(tmp, 'warn.cr')
+        with open(py_path, 'w', encoding="utf-8") as f:
+            f.write("x = []\nprint(x)\n")
+        translation_cache = cache.TranslationCache(os.path.join(tmp, 'cache'))
+        runs = []
+        for _ in range(2): # translated, then from the cache
+            summaries = py2cr.ModuleSummaryTable(translation_cache=translation_cache)
+            err = io.StringIO()
+            with contextlib.redirect_stderr(err):
+                rtn = py2cr.convert_py2cr_write(py_path, output=cr_path, force=True, no_stop=True,
+                                                 summaries=summaries)
+            with open(cr_path, 'r', encoding="utf-8") as f:
+                runs.append((rtn, f.read(), err.getvalue()))
+        assert translation_cache.hits == 1
+        assert runs[0] == runs[1]
+        assert "Warning : empty-list infer issue" in runs[1][2]
+
+def test_chunked_store():
+    with tempfile.TemporaryDirectory() as tmp:
+        translation_cache = cache.TranslationCache(tmp)
+        code = "x = 1\n" * (cache.CHUNK_SIZE // 3)
+        translation_cache.store('ab01', 0, 'require "py2cr"\n', (code[i:i + 1000] for i in range(0, len(code), 1000)),
+                                ["Warning\n"])
+        result, header, data, warnings = translation_cache.load('ab01')
+        chunks = list(data)
+        assert (result, header, warnings) == (0, 'require "py2cr"\n', ["Warning\n"])
+        assert "".join(chunks) == code and max(len(chunk) for chunk in chunks) == cache.CHUNK_SIZE
+        # the code of an entry was evicted
+        os.remove(os.path.join(tmp, 'translations', 'ab', 'ab01.cr'))
+        assert translation_cache.load('ab01') is None and translation_cache.misses == 1
+
+def test_streamed_store_memory():
+    # the translation streamed to the output file is copied to the cache
+    # in chunks: storing it does not hold the whole output in memory
+    source = corpus.nested_expressions(2000)
+    cache.translator_fingerprint() # not measured
+    with tempfile.TemporaryDirectory() as tmp:
+        py_path = os.path.join(tmp, 'big.py')
+        cr_path = os.path.join(tmp, 'big.cr')
+        with open(py_path, 'w', encoding="utf-8") as f:
+            f.write(source)
+        translation_cache = cache.TranslationCache(os.path.join(tmp, 'cache'))
+        stores = []
+        store = translation_cache.store
+        def measured_store(key, result, header, data, warnings=None):
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            store(key, result, header, data, warnings)
+            stores.append((isinstance(data, str), tracemalloc.get_traced_memory()[1] - start))
+        translation_cache.store = measured_store
+        summaries = py2cr.ModuleSummaryTable(translation_cache=translation_cache)
+        chunk_size = cache.CHUNK_SIZE
+        cache.CHUNK_SIZE = 4096 # a small chunk for a small module
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                py2cr.convert_py2cr_write(py_path, output=cr_path, force=True, no_stop=True, summaries=summaries,
+                                          low_memory=True)
+        finally:
+            tracemalloc.stop()
+            cache.CHUNK_SIZE = chunk_size
+        size = os.path.getsize(cr_path)
+        [(is_string, peak)] = stores
+        assert not is_string
+        assert peak < size / 4, (peak, size)
+        _result, _header, data, _warnings = translation_cache.load(translation_cache.key(source, [], ['', '', 0, [], True]))
+        with open(cr_path, 'r', encoding="utf-8") as f:
+            assert "".join(data) == f.read()
+
+if __name__ == "__main__":
+    test_cached_warnings()
+    test_chunked_store()
+    test_streamed_store_memory()
@@ -0,0 +1,68 @@
+"""
+Checks that parsing a module in chunks of top-level statements gives
+the same tree as ast.parse(), also with chunks split inside strings,
+brackets, decorated and compound statements.
+"""
+import ast
+import glob
+import os
+
+from py2cr import chunked
+
+TRICKY = '''\
+s = """
+x = 1
+""" + """
+y = 2
+"""
+@decorator
+def f(a,
+b):
+    return [a,
+b]
+if s:
+    pass
+# comment
+else:
+    pass
+try:
+    pass
+except Exception:
+    pass
+finally:
+    pass
+t = 1 + \\
+2
+'''
+
+def same_tree(source, chunk_size, release=False):
+    body = list(chunked.iter_statements(source, chunk_size, release=release))
+    expected = ast.parse(source)
+    return ast.dump(ast.Module(body=body, type_ignores=[]), include_attributes=True) == \
+        ast.dump(expected, include_attributes=True)
+
+def test_tricky_boundaries():
+    for chunk_size in range(1, len(TRICKY) + 2):
+        assert same_tree(TRICKY, chunk_size), chunk_size
+        assert same_tree(TRICKY, chunk_size, release=True), chunk_size
+
+def test_samples():
+    base = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(base, '*', '*.py'))):
+        with open(path, 'r', encoding="utf-8") as f:
+            source = f.read()
+        for chunk_size in (1, 100):
+            assert same_tree(source, chunk_size), path
+
+def test_syntax_error_line():
+    try:
+        list(chunked.iter_statements("x = 1\ny = 2\nz = (\n", 1))
+    except SyntaxError as e:
+        assert e.lineno == 3
+    else:
+        assert False, "SyntaxError expected"
+
+if __name__ == "__main__":
+    test_tricky_boundaries()
+    test_samples()
+    test_syntax_error_line()
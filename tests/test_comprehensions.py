@@ -0,0 +1,35 @@
+"""
+Checks the translation of the comprehensions with several generators or
+conditions: they are fused in a single chain of iterators (py_iter),
+with every generator and every condition.
+"""
+import py2cr
+
+def translate(expression):
+    _rtn, _header, data = py2cr.convert_py2cr("r = " + expression + "\n", '')
+    return data.strip()[len("r = "):]
+
+def test_fused():
+    assert translate("[x + y for x in a if x > 1 for y in b(x) if y]") == \
+        "a.py_iter.select{|x| x > 1}.flat_map{|x| b(x).py_iter.select{|y| y}.map{|y| x + y}}.to_a"
+    assert translate("[x for x in a if x > 1 if x < 5]") == \
+        "a.py_iter.select{|x| x > 1}.select{|x| x < 5}.map{|x| x}.to_a"
+    assert translate("{x * 2 for x in a for y in b}") == \
+        "a.py_iter.flat_map{|x| b.py_iter.map{|y| x * 2}}.to_set"
+    assert translate("{k: v for k, v in d.items() if v}") == \
+        "d.to_a().py_iter.select{|(k, v)| v}.map{|(k, v)| {k, v}}.to_h"
+    assert translate("{a + b for a, b in pairs for c in a if c}") == \
+        "pairs.py_iter.flat_map{|(a, b)| a.py_iter.select{|c| c}.map{|c| a + b}}.to_set"
+    assert translate("sum(p for (p, q) in pairs if q)") == \
+        "pairs.py_iter.select{|(p, q)| q}.map{|(p, q)| p}.to_a.sum"
+    # an iterable with an operator is in parenthesis
+    assert translate("[x for x in a + b if x]") == "(a + b).py_iter.select{|x| x}.map{|x| x}.to_a"
+
+def test_single_generator():
+    # already a single pass
+    assert translate("[x * 2 for x in a]") == "a.map{|x| x * 2}"
+    assert translate("{x for x in a}") == "a.map{|x| x}.to_set"
+
+if __name__ == "__main__":
+    test_fused()
+    test_single_generator()
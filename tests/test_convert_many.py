@@ -0,0 +1,53 @@
+"""
+Checks the batch API: convert_many() gives the translations of
+convert_py2cr_write(), consumes its input lazily and reports errors and
+warnings per source.
+"""
+import contextlib
+import glob
+import io
+import os
+
+import py2cr
+from py2cr import importgraph
+
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modules')
+
+def read_all(paths):
+    for path in paths:
+        with open(path, 'r', encoding="utf-8") as f:
+            yield (path, f.read())
+
+def test_same_as_write():
+    paths = sorted(glob.glob(os.path.join(BASE, '*.py')))
+    results = list(py2cr.convert_many(read_all(paths), base_path=BASE))
+    assert [result.path for result in results] == [os.path.normpath(path) for path in paths]
+    for result in results:
+        graph = importgraph.ImportGraph(BASE)
+        graph.add(result.path)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            rtn = py2cr.convert_py2cr_write(result.path, 0, graph.dependencies(result.path), BASE, False, no_stop=True)
+        assert (result.status, result.data) == (rtn, out.getvalue()), result.path
+
+def test_lazy():
+    consumed = []
+    def items():
+        for i in range(3):
+            consumed.append(i)
+            yield ('', 'x = %d\n' % i)
+    results = py2cr.convert_many(items())
+    assert next(results).data == 'x = 0\n'
+    assert consumed == [0]
+
+def test_errors_and_warnings():
+    items = [('', 'x = (\n'), ('', 'y = dict()\n'), ('', 'z = 1\n')]
+    first, second, third = py2cr.convert_many(items)
+    assert first.status == py2cr.ResultStatus.INCLUDE_ERROR and first.error.startswith('SyntaxError')
+    assert second.status == py2cr.ResultStatus.INCLUDE_WARNING and second.warnings
+    assert third.status == py2cr.ResultStatus.OK and third.data == 'z = 1\n'
+
+if __name__ == "__main__":
+    test_same_as_write()
+    test_lazy()
+    test_errors_and_warnings()
@@ -0,0 +1,82 @@
+"""
+Checks the incremental re-translation of a module: the unchanged
+top-level definitions are spliced from the previous translation, also
+when profiled, and the output is the same as a full translation.
+"""
+import py2cr
+from py2cr import incremental
+from py2cr import profiler
+from py2cr import sourcemap
+
+SOURCE = '''import os
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def norm(self):
+        return self.x * self.x + self.y * self.y
+
+def origin():
+    return Point(0, 0)
+
+def far(p, limit=10):
+    return p.norm() > limit
+
+def scale(p, k):
+    return [p.x * k, p.y * k]
+
+def check():
+    return far(origin())
+
+print(check())
+'''
+
+def translate(source, definitions=None, source_map=None):
+    return py2cr.convert_py2cr(source, '', definitions=definitions, source_map=source_map)[2]
+
+def check_edit(definitions, source, misses):
+    translate(SOURCE, definitions)
+    definitions.hits = definitions.misses = 0
+    assert translate(source, definitions) == translate(source)
+    assert definitions.misses == misses, (definitions.hits, definitions.misses)
+
+def test_splice():
+    definitions = incremental.DefinitionCache()
+    assert translate(SOURCE, definitions) == translate(SOURCE)
+    assert (definitions.hits, definitions.misses) == (0, 5)
+    check_edit(definitions, SOURCE, 0)
+    # a body: only that definition
+    check_edit(definitions, SOURCE.replace("p.x * k", "p.x * k + 1"), 1)
+    # the keyword arguments of a function: also its callers
+    check_edit(definitions, SOURCE.replace("def far(p, limit=10):", "def far(p, limit=10, strict=False):"), 2)
+    # a method added to a class: also the definitions using the class
+    check_edit(definitions, SOURCE.replace("class Point:", "class Point:\n    def dot(self, o):\n        return 0\n"), 2)
+
+def test_source_map():
+    definitions = incremental.DefinitionCache()
+    translate(SOURCE, definitions, sourcemap.SourceMap())
+    # lines inserted before the definitions move their positions
+    moved = "# header\n\n" + SOURCE
+    smap = sourcemap.SourceMap()
+    full = sourcemap.SourceMap()
+    assert translate(moved, definitions, smap) == translate(moved, None, full)
+    assert smap.lines == full.lines and (definitions.hits, definitions.misses) == (5, 5)
+
+def test_profile():
+    # profiled, the definitions are still cached and spliced
+    definitions = incremental.DefinitionCache()
+    profile = profiler.Profiler()
+    assert py2cr.convert_py2cr(SOURCE, '', definitions=definitions, profile=profile)[2] == translate(SOURCE)
+    assert (definitions.hits, definitions.misses) == (0, 5) and 'visit_FunctionDef' in profile.stats
+    profile = profiler.Profiler()
+    edited = SOURCE.replace("p.x * k", "p.x * k + 1")
+    assert py2cr.convert_py2cr(edited, '', definitions=definitions, profile=profile)[2] == translate(edited)
+    assert (definitions.hits, definitions.misses) == (4, 6)
+    assert profile.stats['visit_FunctionDef'].count == 1 # scale()
+
+if __name__ == "__main__":
+    test_splice()
+    test_source_map()
+    test_profile()
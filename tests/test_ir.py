@@ -0,0 +1,50 @@
+"""
+Checks the IR of the operator expressions: the parenthesis and the Numo
+division are decided on the flags of the operands, and the translation
+is emitted once for the whole expression.
+"""
+import ast
+
+import py2cr
+from py2cr import ir
+
+def test_flags_and_emit():
+    assert ir.flags("a") == 0
+    assert ir.flags("a - 1") == ir.OPERATOR
+    assert ir.flags("Numo::DFloat.zeros(3)") == ir.NUMO
+    expr = ir.BinOp(ir.operand(ir.BinOp("a", "-", "1")), "<<", "b")
+    assert ir.flags(expr) == ir.OPERATOR
+    assert ir.emit(expr) == "(a - 1) << b" == str(expr)
+    assert ir.emit(ir.BoolOp("&&", ["a", ir.UnaryOp("!", ir.MethodCall("b", "py_in?", ["c"]))])) == "a && !b.py_in?(c)"
+    assert ir.emit("x") == "x"
+
+def translate(expr):
+    visitor = py2cr.RB()
+    return visitor.visit(ast.parse(expr).body[0].value)
+
+def test_lower():
+    expected = {
+        "a + b * c": "a + (b * c)",
+        "-(a + b) * c / d": "((-(a + b)) * c) / d.to_f",
+        "a / (b - 1)": "a / (b - 1).to_f",
+        "a << 2 | b": "a << 2 | b",
+        "not (a and b or c)": "!(a && b || c)",
+        "a < b <= c is None": "(a < b) && (b <= c) && (c.nil?)",
+        "x is not None and 'a' not in y": "!x.nil? && !y.py_in?(\"a\")",
+        "__name__ == '__main__'": "__FILE__ == PROGRAM_NAME",
+        "'%(a)d' % {'a': 1}": "\"%<a>d\" % {\"a\": 1}",
+    }
+    for expr, crystal in expected.items():
+        assert translate(expr) == crystal, (expr, translate(expr))
+
+def test_deep_expression():
+    # emitted once: the nested operations are not translated to text
+    depth = 300
+    expr = " + ".join("a%d" % i for i in range(depth))
+    assert translate(expr) == "".join("(" for _ in range(depth - 2)) + \
+        "a0 + a1" + "".join(") + a%d" % i for i in range(2, depth))
+
+if __name__ == "__main__":
+    test_flags_and_emit()
+    test_lower()
+    test_deep_expression()
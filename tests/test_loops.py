@@ -0,0 +1,69 @@
+"""
+Checks the translation of the loops: `for i in range(...)` loops are
+while loops over a counter, and the else clause of a loop is run on a
+break flag, without evaluating the iterable again.
+"""
+import py2cr
+
+def translate(source):
+    _rtn, _header, data = py2cr.convert_py2cr(source, '')
+    return data.splitlines()
+
+def test_range_loop():
+    lines = translate("for i in range(a, n(), -2):\n    if i:\n        continue\n    i = 5\n")
+    assert lines == [
+        "__dummy0__ = a",
+        "__dummy1__ = n()",
+        "while __dummy0__ > __dummy1__",
+        "  i = __dummy0__",
+        "  __dummy0__ -= 2",
+        "  if py_is_bool(i)",
+        "    next",
+        "  end",
+        "  i = 5",
+        "end",
+    ]
+    # a step of unknown sign
+    assert translate("for i in range(0, 10, s):\n    pass\n")[0] == "PyRange.range(0, 10, s).py_each do |i|"
+
+def test_for_else_side_effects():
+    source = '''
+def rows():
+    print("rows")
+    return [1, 2, 2]
+
+for x in rows():
+    if x == 3:
+        break
+    for y in range(x):
+        if y:
+            break
+else:
+    print("done")
+'''
+    lines = translate(source)
+    # the iterable is evaluated by the loop only
+    assert [line for line in lines if "rows()" in line and not line.startswith("def ")] == ["rows().py_each do |x|"]
+    assert "__dummy0__ = false" in lines and lines.count("    __dummy0__ = true") == 1
+    assert lines[-3:] == ["unless __dummy0__", '  py_print("done")', "end"]
+
+def test_while_else():
+    lines = translate("while x < 3:\n    if x:\n        break\n    x += 1\nelse:\n    print(x)\n")
+    assert lines == [
+        "__dummy0__ = false",
+        "while x < 3",
+        "  if py_is_bool(x)",
+        "    __dummy0__ = true",
+        "    break",
+        "  end",
+        "  x += 1",
+        "end",
+        "unless __dummy0__",
+        "  py_print(x)",
+        "end",
+    ]
+
+if __name__ == "__main__":
+    test_range_loop()
+    test_for_else_side_effects()
+    test_while_else()
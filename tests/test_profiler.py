@@ -0,0 +1,56 @@
+"""
+Checks the translation profiler: the profiled translation is the same,
+the visitors and translators are counted and plain RB is not touched.
+"""
+import py2cr
+from py2cr import profiler
+
+SOURCE = '''\
+import numpy as np
+def f(x):
+    return np.zeros(x) + np.ones(x)
+y = f(3)
+'''
+
+def test_same_translation():
+    profile = profiler.Profiler()
+    expected = py2cr.convert_py2cr(SOURCE, '')
+    assert py2cr.convert_py2cr(SOURCE, '', profile=profile) == expected
+    assert profile.stats
+
+def test_counts():
+    profile = profiler.Profiler()
+    profile.filename = 'sample.py'
+    py2cr.convert_py2cr(SOURCE, '', profile=profile)
+    stats = profile.stats
+    assert stats['visit_Module'].count == 1
+    assert stats['visit_FunctionDef'].count == 1
+    assert stats['visit_Call'].count == 3
+    assert stats['Numpy.zeros'].count == 1
+    assert stats['Numpy.ones'].count == 1
+    for stat in stats.values():
+        assert 0.0 <= stat.own <= stat.total + 1e-9
+    # the module includes everything else
+    assert stats['visit_Module'].total >= max(stat.total for stat in stats.values())
+    _seconds, filename, lineno, _col = max(stats['Numpy.zeros'].slowest)
+    assert (filename, lineno) == ('sample.py', 3)
+
+def test_merge():
+    first = profiler.Profiler()
+    second = profiler.Profiler()
+    py2cr.convert_py2cr(SOURCE, '', profile=first)
+    py2cr.convert_py2cr(SOURCE, '', profile=second)
+    first.merge(second)
+    assert first.stats['visit_Call'].count == 6
+    assert len(first.stats['visit_Call'].slowest) == profiler.SLOWEST_COUNT
+
+def test_rb_not_instrumented():
+    py2cr.convert_py2cr(SOURCE, '', profile=profiler.Profiler())
+    for visitor, _convention, _declaration, _memo, _statement in py2cr.RB._dispatch_table.values():
+        assert not hasattr(visitor, 'profiled')
+
+if __name__ == "__main__":
+    test_same_translation()
+    test_counts()
+    test_merge()
+    test_rb_not_instrumented()
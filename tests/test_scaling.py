@@ -0,0 +1,62 @@
+"""
+Checks the scaling tests: the growth exponent fit, the ranking of the
+visitors growing faster than the inputs on synthetic profiles, and a
+coarse bound on the time ratio of each input family between two small
+sizes.  The exponents of the families are checked by
+run_benchmarks.py --scaling.
+"""
+import py2cr
+from py2cr import profiler
+from testtools import scaling
+
+def test_growth_exponent():
+    sizes = [10, 20, 40, 80]
+    assert abs(scaling.growth_exponent(sizes, [3.0 * n for n in sizes]) - 1.0) < 1e-9
+    assert abs(scaling.growth_exponent(sizes, [0.5 * n * n for n in sizes]) - 2.0) < 1e-9
+    nlogn = scaling.growth_exponent(sizes, [scaling.BOUNDS["O(n log n)"](n) for n in sizes])
+    assert 1.0 < nlogn < 1.5
+
+def profile(own_times):
+    stats = {}
+    for name, own in own_times.items():
+        stats[name] = profiler.Stat()
+        stats[name].own = own
+    return stats
+
+def test_rank():
+    # visit_Name grows as n^2, visit_Call as n, visit_Pass is too small
+    small = profile({"visit_Name": 0.01, "visit_Call": 0.1, "visit_Pass": 0.0001, "visit_Only_small": 0.5})
+    large = profile({"visit_Name": 1.0, "visit_Call": 1.0, "visit_Pass": 0.01, "visit_Only_large": 0.5})
+    ranked = scaling.rank(small, large, [100, 1000])
+    assert [name for name, _exponent, _share in ranked] == ["visit_Name", "visit_Call"]
+    assert abs(ranked[0][1] - 2.0) < 1e-9 and abs(ranked[1][1] - 1.0) < 1e-9
+    assert abs(ranked[0][2] - 1.0 / 2.51) < 1e-9
+    assert scaling.rank(small, large, [100, 1000], top=1) == ranked[:1]
+    assert scaling.rank(small, large, [100, 1000], min_share=0.5) == []
+
+# the time of a family may grow RATIO_SLACK times more than its bound
+# between two sizes: a coarse check, robust to the timing noise, that
+# still fails on a quadratic growth
+RATIO_SLACK = 2.0
+
+def test_families_coarse():
+    # the exponent fit and the culprits are in run_benchmarks.py --scaling
+    for name, (generator, sizes, bound) in scaling.FAMILIES.items():
+        small, large = sizes[0], sizes[-1]
+        mod_paths = scaling.MOD_PATHS.get(name, lambda size: None)
+        ratio = (scaling.measure(generator(large), mod_paths=mod_paths(large)) /
+                 scaling.measure(generator(small), mod_paths=mod_paths(small)))
+        allowed = scaling.BOUNDS[bound](large) / scaling.BOUNDS[bound](small) * RATIO_SLACK
+        assert ratio < allowed, "%s: %d -> %d is %.1fx slower, %s allows %.1fx" % (name, small, large, ratio, bound, allowed)
+
+def test_imports_family():
+    # the imports are local modules, resolved through the symbol table
+    source = scaling.imports(3)
+    data = py2cr.convert_py2cr(source, '', mod_paths=scaling.import_paths(3))[2]
+    assert 'require "pkg2/mod2"' in data and 'r2 = Pkg2::Mod2.g(f2(2))' in data
+
+if __name__ == "__main__":
+    test_growth_exponent()
+    test_rank()
+    test_families_coarse()
+    test_imports_family()
@@ -0,0 +1,118 @@
+"""
+Checks the translation server: requests by source and by path, that
+a dependency saved between two requests is summarized again, that a
+connection kept open does not block the other clients, and that the
+watcher translates the modules importing a saved file.
+"""
+import contextlib
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import py2cr
+from py2cr import server
+
+def run_server(socket_path, **kwargs):
+    srv = server.TranslationServer(socket_path, **kwargs)
+    srv.start_watcher()
+    def loop():
+        with srv:
+            while not srv.stopping:
+                srv.handle_request()
+    thread = threading.Thread(target=loop)
+    thread.start()
+    return thread
+
+def test_requests():
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'py2cr.sock')
+        thread = run_server(socket_path)
+        try:
+            assert server.request(socket_path, command='ping') == {'result': 'pong'}
+
+            response = server.request(socket_path, source='x = [1, 2]\n', require=False)
+            assert response['status'] == 0
+            assert response['crystal'] == py2cr.convert_py2cr('x = [1, 2]\n', '')[2]
+
+            with open(os.path.join(tmp, 'moda.py'), 'w') as f:
+                f.write("class ModA:\n    pass\n")
+            main = os.path.join(tmp, 'main.py')
+            with open(main, 'w') as f:
+                f.write("from moda import *\nm = ModA()\n")
+            response = server.request(socket_path, path=main)
+            assert 'm = ModA.new' in response['crystal']
+
+            # the class is gone: it is a function call now
+            with open(os.path.join(tmp, 'moda.py'), 'w') as f:
+                f.write("def ModB():\n    pass\n\n\n")
+            response = server.request(socket_path, path=main)
+            assert 'm = ModA()' in response['crystal']
+
+            response = server.request(socket_path, path=os.path.join(tmp, 'missing.py'))
+            assert response['status'] == 2 and 'error' in response
+        finally:
+            server.request(socket_path, command='shutdown')
+            thread.join()
+        assert not os.path.exists(socket_path)
+
+def test_open_connection():
+    # an editor keeps its connection open: the other clients are served
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'py2cr.sock')
+        thread = run_server(socket_path)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as editor:
+                editor.settimeout(10)
+                editor.connect(socket_path)
+                with editor.makefile('rwb') as f:
+                    for _ in range(2):
+                        f.write(b'{"command": "ping"}\n')
+                        f.flush()
+                        assert json.loads(f.readline()) == {'result': 'pong'}
+                        response = server.request(socket_path, source='x = 1\n', require=False)
+                        assert response['crystal'] == 'x = 1\n'
+        finally:
+            server.request(socket_path, command='shutdown')
+            thread.join()
+
+def wait_for(path, text, seconds=10.0):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if os.path.exists(path):
+            with open(path, 'r', encoding="utf-8") as f:
+                if text in f.read():
+                    return True
+        time.sleep(0.1)
+    return False
+
+def test_watch_dependents():
+    # the modules importing a saved file are translated again
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'moda.py'), 'w') as f:
+            f.write("class ModA:\n    pass\n")
+        with open(os.path.join(tmp, 'main.py'), 'w') as f:
+            f.write("from moda import *\nm = ModA()\n")
+        with open(os.path.join(tmp, 'other.py'), 'w') as f:
+            f.write("x = 1\n")
+        socket_path = os.path.join(tmp, 'py2cr.sock')
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            thread = run_server(socket_path, watch=tmp)
+            try:
+                with open(os.path.join(tmp, 'moda.py'), 'w') as f:
+                    f.write("def ModA():\n    pass\n\n\n")
+                assert wait_for(os.path.join(tmp, 'main.cr'), 'm = ModA()'), err.getvalue()
+                assert wait_for(os.path.join(tmp, 'moda.cr'), 'def ModA()'), err.getvalue()
+            finally:
+                server.request(socket_path, command='shutdown')
+                thread.join()
+        assert not os.path.exists(os.path.join(tmp, 'other.cr'))
+
+if __name__ == "__main__":
+    test_requests()
+    test_open_connection()
+    test_watch_dependents()
@@ -0,0 +1,84 @@
+"""
+Checks the source maps: every generated line maps to the python
+statement it is translated from, the maps survive the .cr.map format and
+the translation cache, and rewrite() annotates crystal stack traces.
+"""
+import os
+import tempfile
+
+import py2cr
+from py2cr import cache
+from py2cr import sourcemap
+
+SOURCE = '''import os
+
+def f(x, y=2):
+    if x > 1:
+        for i in range(y):
+            print(i)
+    else:
+        return [a * 2 for a in
+                range(x)]
+    return x
+
+class A:
+    def m(self):
+        return 1
+
+print(f(3))
+'''
+
+def test_vlq():
+    for value in [0, 1, -1, 15, 16, -16, 31, 32, 1000, -123456]:
+        assert sourcemap.vlq_decode(sourcemap.vlq_encode(value)) == [value]
+    assert sourcemap.vlq_encode(0) == 'A' and sourcemap.vlq_encode(16) == 'gB'
+
+def test_lines():
+    smap = sourcemap.SourceMap()
+    _rtn, _header, data = py2cr.convert_py2cr(SOURCE, '', source_map=smap)
+    lines = data.splitlines()
+    assert len(smap.lines) == len(lines)
+    expected = {
+        'def f(x, y = 2)': 3,
+        '  if x > 1': 4,
+        '      py_print(i)': 6,
+        '  else': 4,            # an `else` belongs to its `if`
+        '    return x.times.map{|a| a * 2}': 8,
+        '  return x': 10,
+        'class A': 12,
+        '    return 1': 14,
+        'py_print(f(3))': 16,
+    }
+    for i, line in enumerate(lines):
+        if line in expected:
+            assert smap.lookup(i + 1)[1] == expected.pop(line), line
+    assert not expected
+    # the mappings round trip
+    copy = sourcemap.SourceMap()
+    copy.set_mappings(smap.mappings())
+    assert copy.lines == smap.lines
+
+def test_write_and_remap():
+    with tempfile.TemporaryDirectory() as tmp:
+        py_path = os.path.join(tmp, 'prog.py')
+        cr_path = os.path.join(tmp, 'prog.cr')
+        with open(py_path, 'w', encoding="utf-8") as f:
+            f.write("def div(a, b):\n    x = a + 1\n    return x // b\n\nprint(div(3, 0))\n")
+        summaries = py2cr.ModuleSummaryTable(translation_cache=cache.TranslationCache(os.path.join(tmp, 'cache')))
+        mappings = []
+        for _ in range(2): # translated, then from the cache
+            py2cr.convert_py2cr_write(py_path, require=True, output=cr_path, force=True,
+                                      summaries=summaries, source_map=True)
+            mappings.append(sourcemap.SourceMap.load(cr_path + '.map').mappings())
+        assert summaries.cache.hits == 1 and mappings[0] == mappings[1]
+        with open(cr_path, 'r', encoding="utf-8") as f:
+            assert f.read().splitlines()[3] == '  return x // b'
+        trace = ("Unhandled exception: Division by 0 (DivisionByZeroError)\n"
+                 "  from prog.cr:4:5 in 'div'\n"
+                 "  from /usr/share/crystal/src/int.cr:12:3 in 'foo'\n")
+        assert sourcemap.rewrite(trace, tmp) == trace.replace("prog.cr:4:5", "prog.cr:4:5 [prog.py:3]")
+
+if __name__ == "__main__":
+    test_vlq()
+    test_lines()
+    test_write_and_remap()
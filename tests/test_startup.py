@@ -0,0 +1,85 @@
+"""
+Startup benchmark: `import py2cr`, `py2cr --help` and the translation
+of a small file, each in a new interpreter.  The times are printed (see
+pytest -s), and only checked against the targets when the environment
+variable PY2CR_TIMING_TESTS is set.  Also checks that the translator
+modules are only imported when their python module is.
+"""
+import importlib
+import os
+import subprocess
+import sys
+import time
+
+from py2cr.translator import CrystalTranslator, TRANSLATOR_MANIFEST
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# targets in seconds, generous for slow machines
+IMPORT_TARGET = 0.25
+HELP_TARGET = 1.0
+SMALL_FILE_TARGET = 1.0
+
+SMALL_FILE = os.path.join(ROOT, 'tests', 'basic', 'assign.py')
+
+# wall-clock times depend on the machine and its load
+CHECK_TIMES = bool(os.environ.get('PY2CR_TIMING_TESTS'))
+
+def python(*args):
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT, capture_output=True, text=True, check=True)
+
+def best_time(*args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        python(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def import_time():
+    """Cumulative import time of py2cr as reported by -X importtime"""
+    best = None
+    for _ in range(3):
+        stderr = python('-X', 'importtime', '-c', 'import py2cr').stderr
+        for line in stderr.splitlines():
+            fields = [field.strip() for field in line.split('|')]
+            if len(fields) == 3 and fields[2] == 'py2cr':
+                elapsed = int(fields[1]) / 1e6
+                best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def test_manifest():
+    for module in set(TRANSLATOR_MANIFEST.values()):
+        importlib.import_module('py2cr.' + module)
+    for klass in CrystalTranslator.__subclasses__():
+        if klass.__module__.startswith('py2cr.'):
+            name = klass().python_module_name
+            assert TRANSLATOR_MANIFEST.get(name) == klass.__module__[len('py2cr.'):], (name, klass)
+
+def test_lazy_translators():
+    script = ("import sys, py2cr\n"
+              "loaded = lambda: sorted(m[6:] for m in sys.modules if m[6:] in py2cr.TRANSLATOR_MANIFEST.values())\n"
+              "print(loaded())\n"
+              "py2cr.convert_py2cr('import os\\nx = os.getenv(\"HOME\")\\n', '')\n"
+              "print(loaded())\n")
+    before, after = python('-c', script).stdout.splitlines()
+    assert before == '[]'
+    assert after == "['pyos']"
+
+def startup_times():
+    """(name, time, target) of each startup benchmark"""
+    return [("import py2cr", import_time(), IMPORT_TARGET),
+            ("py2cr --help", best_time('py2cr.py', '--no-cache', '--help'), HELP_TARGET),
+            ("py2cr small file", best_time('py2cr.py', '--no-cache', SMALL_FILE), SMALL_FILE_TARGET)]
+
+def test_startup_time():
+    for name, elapsed, target in startup_times():
+        print("%-17s: %.1fms (target %.0fms)" % (name, elapsed * 1000, target * 1000))
+        if CHECK_TIMES:
+            assert elapsed < target, name
+
+if __name__ == "__main__":
+    test_manifest()
+    test_lazy_translators()
+    test_startup_time()
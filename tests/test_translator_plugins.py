@@ -0,0 +1,135 @@
+"""
+Checks the translator plugins: a package declaring a `py2cr.translators`
+entry point is only imported when the translated source imports its
+python module, and its functions and attributes are then translated.
+Also checks the flat lookup tables of the registry.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from py2cr.translator import TranslatorRegistry
+from py2cr.pyos import Os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLUGIN = '''from py2cr.translator import CrystalTranslator
+
+class MyLib(CrystalTranslator):
+    attribute_map = {
+        "VERSION": "MyLib::VERSION"
+    }
+    def __init__(self):
+        super().__init__()
+        self.python_module_name = "mylib"
+        self.crystal_require = "mylib"
+
+    @staticmethod
+    def greet(funcdb):
+        return funcdb.wrap_class_method("MyLib", "greet")
+'''
+
+SCRIPT = '''import sys, py2cr
+print('mylib_py2cr' in sys.modules)
+py2cr.convert_py2cr('import os\\nimport json\\nx = os.getenv("HOME")\\n', '')
+print('mylib_py2cr' in sys.modules)
+print(repr(py2cr.convert_py2cr('import mylib\\nmylib.greet("a")\\nprint(mylib.VERSION)\\n', '')[2]))
+print('mylib_py2cr' in sys.modules)
+'''
+
+CACHE_SCRIPT = '''import sys, py2cr
+from py2cr import cache
+translation_cache = cache.TranslationCache(sys.argv[1])
+summaries = py2cr.ModuleSummaryTable(translation_cache=translation_cache)
+py2cr.convert_py2cr_write(sys.argv[2], output=sys.argv[3], force=True, summaries=summaries)
+print(translation_cache.hits, translation_cache.misses)
+'''
+
+def install_plugin(tmp, version="0.1"):
+    """Write the mylib plugin and its dist-info in the directory tmp"""
+    with open(os.path.join(tmp, 'mylib_py2cr.py'), 'w', encoding="utf-8") as f:
+        f.write(PLUGIN)
+    for name in os.listdir(tmp):
+        if name.endswith('.dist-info'):
+            shutil.rmtree(os.path.join(tmp, name))
+    dist_info = os.path.join(tmp, 'mylib_py2cr-%s.dist-info' % version)
+    os.mkdir(dist_info)
+    with open(os.path.join(dist_info, 'METADATA'), 'w', encoding="utf-8") as f:
+        f.write("Metadata-Version: 2.1\nName: mylib-py2cr\nVersion: %s\n" % version)
+    with open(os.path.join(dist_info, 'entry_points.txt'), 'w', encoding="utf-8") as f:
+        f.write("[py2cr.translators]\nmylib = mylib_py2cr\n")
+
+def test_entry_point():
+    with tempfile.TemporaryDirectory() as tmp:
+        install_plugin(tmp)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([tmp, ROOT]))
+        lines = subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, env=env,
+                               capture_output=True, text=True, check=True).stdout.splitlines()
+    assert lines[0:2] == ['False', 'False']
+    assert 'MyLib.greet("a")' in lines[2] and 'py_print(MyLib::VERSION)' in lines[2], lines[2]
+    assert lines[3] == 'True'
+
+def test_plugin_cache_miss():
+    # the translations cached before a plugin is installed or upgraded are
+    # not used: the plugin may translate the same source differently
+    with tempfile.TemporaryDirectory() as tmp:
+        plugins = os.path.join(tmp, 'plugins')
+        os.mkdir(plugins)
+        py_path = os.path.join(tmp, 'main.py')
+        with open(py_path, 'w', encoding="utf-8") as f:
+            f.write("x = 1\nprint(x)\n")
+        def translate():
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join([plugins, ROOT]))
+            args = [sys.executable, '-c', CACHE_SCRIPT, os.path.join(tmp, 'cache'), py_path, os.path.join(tmp, 'main.cr')]
+            return subprocess.run(args, cwd=ROOT, env=env, capture_output=True, text=True,
+                                  check=True).stdout.split()
+        assert translate() == ['0', '1']
+        assert translate() == ['1', '0']
+        install_plugin(plugins)
+        assert translate() == ['0', '1']
+        assert translate() == ['1', '0']
+        install_plugin(plugins, "0.2")
+        assert translate() == ['0', '1']
+
+class FakeEntryPoint:
+    def __init__(self, klass):
+        self.klass = klass
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.klass
+
+def test_lookup_tables():
+    # not a direct subclass of CrystalTranslator: not found by
+    # register_subclasses(), only by its entry point
+    class Other(Os):
+        attribute_map = {"pi": "Other::PI"}
+        def __init__(self):
+            super().__init__()
+            self.python_module_name = "other_module"
+            self.crystal_require = None
+
+        @staticmethod
+        def f(funcdb):
+            return "f"
+
+    entry_point = FakeEntryPoint(Other)
+    registry = TranslatorRegistry(manifest={}, plugins={"other_module": entry_point})
+    # only loaded by an import of the python module
+    assert registry.func_lookup("other_module", "f") is None
+    assert registry.require_lookup_or_none("other_module") is None # crystal_require
+    assert entry_point.loads == 1
+    assert registry.func_lookup("other_module", "f") is Other.f
+    assert registry.func_lookup("other_module", "getenv") is Os.getenv
+    assert registry.func_lookup("other_module", "g") is None
+    assert registry.attr_lookup("other_module", "pi") == "Other::PI"
+    assert registry.attr_lookup("", "pi") is None
+    assert ("other_module", "g") in registry.func_table
+    assert entry_point.loads == 1
+
+if __name__ == "__main__":
+    test_entry_point()
+    test_lookup_tables()
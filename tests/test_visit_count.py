@@ -0,0 +1,47 @@
+"""
+Checks that the expressions of deeply nested calls are translated once.
+
+The numpy translators visit the arguments of a call again after
+FuncCall did, which used to grow the number of visits exponentially
+with the nesting depth.
+"""
+import ast
+import collections
+
+import py2cr
+
+class CountingRB(py2cr.RB):
+    """RB that counts the visits of each Call node"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.call_visits = collections.Counter()
+
+    def visit_Call(self, node, crytype=None):
+        self.call_visits[id(node)] += 1
+        return super().visit_Call(node, crytype=crytype)
+
+def nested_calls(depth):
+    funcs = ["np.abs", "np.sqrt", "np.array", "np.zeros"]
+    expr = "x"
+    for i in range(depth):
+        expr = "%s(%s)" % (funcs[i % len(funcs)], expr)
+    return "import numpy as np\ny = %s\n" % expr
+
+def test_nested_calls_visited_once():
+    for depth in (4, 8, 16, 32):
+        visitor = CountingRB()
+        visitor.visit(ast.parse(nested_calls(depth)))
+        assert len(visitor.call_visits) == depth
+        assert max(visitor.call_visits.values()) == 1, visitor.call_visits
+
+def test_keyword_context_is_kept():
+    # keywords are visited with and without the YAML conversion
+    visitor = CountingRB()
+    visitor.visit(ast.parse("import numpy as np\ny = np.array(np.zeros(3), dtype=np.float64)\n"))
+    assert max(visitor.call_visits.values()) == 1
+    assert "Tensor(Float64, CPU(Float64)).from_array" in visitor.read()
+
+if __name__ == "__main__":
+    test_nested_calls_visited_once()
+    test_keyword_context_is_kept()
@@ -0,0 +1,152 @@
+"""
+Translator throughput benchmark (see run_benchmarks.py).
+
+Each benchmark translates a list of (path, source) items with
+py2cr.convert_many() and reports the lines translated per second (best
+of `repeat` runs), the peak memory allocated (tracemalloc, in a
+separate run, and in another one with the low_memory option of
+py2cr.convert_py2cr) and the self time per node type (py2cr.profiler,
+in another run; the self time of visit_Module includes the parsing,
+which is done while the module body is visited).  Runs are appended to a
+JSON history file, and compare() finds the benchmarks whose throughput
+regressed against a previous run.
+"""
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+import py2cr
+from py2cr import profiler
+from . import corpus
+
+HISTORY_FILE = "bench_history.json"
+
+def benchmarks(scale : float = 1.0) -> Dict[str, List[Tuple[str, str]]]:
+    """name -> (path, source) items of every benchmark of the corpus"""
+    result = {}
+    for name, (generator, size) in corpus.SYNTHETIC.items():
+        result[name] = [("", generator(max(1, int(size * scale))))]
+    for name in corpus.SAMPLES:
+        result["samples:" + ("all" if name == "*" else name)] = list(corpus.samples(name))
+    return result
+
+def _translate(items, profile=None, low_memory=False) -> int:
+    """Translate the items, return the number of errors"""
+    errors = 0
+    with contextlib.redirect_stderr(io.StringIO()): # warnings
+        for result in py2cr.convert_many(items, profile=profile, low_memory=low_memory):
+            if result.error is not None:
+                errors += 1
+    return errors
+
+def measure(items : List[Tuple[str, str]], repeat : int = 3, top : int = 10) -> dict:
+    lines = sum(source.count("\n") for _path, source in items)
+    best = None
+    errors = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        errors = _translate(items)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peaks = []
+    for low_memory in (False, True):
+        tracemalloc.start()
+        try:
+            _translate(items, low_memory=low_memory)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peaks.append(peak)
+
+    profile = profiler.Profiler()
+    _translate(items, profile)
+    node_costs = {}
+    for name, stat in profile.sorted_stats('self')[:top]:
+        node_costs[name] = {
+            "count": stat.count,
+            "self": stat.own,
+            "us_per_call": stat.own / stat.count * 1e6 if stat.count else 0.0,
+        }
+
+    return {
+        "files": len(items),
+        "lines": lines,
+        "errors": errors,
+        "seconds": best,
+        "lines_per_second": lines / best if best else 0.0,
+        "peak_memory": peaks[0],
+        "peak_memory_low": peaks[1],
+        "node_costs": node_costs,
+    }
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(corpus.TESTS_DIR), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(names : Optional[List[str]] = None, scale : float = 1.0, repeat : int = 3, top : int = 10, report=None) -> dict:
+    """Run the benchmarks (all, or the given names) and return the run record"""
+    results = {}
+    for name, items in benchmarks(scale).items():
+        if names and name not in names:
+            continue
+        results[name] = measure(items, repeat, top)
+        if report is not None:
+            report(name, results[name])
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "scale": scale,
+        "results": results,
+    }
+
+def load_history(path : str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_history(path : str, history : List[dict]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=1)
+        f.write("\n")
+
+def baseline(history : List[dict], record : dict) -> Optional[dict]:
+    """Latest run of the history with the same scale"""
+    for previous in reversed(history):
+        if previous.get("scale") == record["scale"]:
+            return previous
+    return None
+
+def compare(previous : dict, record : dict, threshold : float) -> List[Tuple[str, float, float]]:
+    """(name, previous, current lines/s) of the benchmarks slower by more than threshold percent"""
+    regressions = []
+    for name, result in record["results"].items():
+        old = previous["results"].get(name)
+        if old is None:
+            continue
+        if result["lines_per_second"] < old["lines_per_second"] * (1.0 - threshold / 100.0):
+            regressions.append((name, old["lines_per_second"], result["lines_per_second"]))
+    return regressions
+
+def format_result(name : str, result : dict) -> str:
+    peak = result["peak_memory"] / (1024 * 1024)
+    # not in the history of older runs
+    low = result.get("peak_memory_low", result["peak_memory"]) / (1024 * 1024)
+    lines = ["%-32s %7d lines %9.0f lines/s %8.1f MB peak %6.1f MB low-memory (%+.0f%%)%s" % (
+        name, result["lines"], result["lines_per_second"], peak, low, (low / peak - 1.0) * 100.0 if peak else 0.0,
+        " (%d errors)" % result["errors"] if result["errors"] else "")]
+    for node, cost in result["node_costs"].items():
+        lines.append("    %-28s %8d calls %8.2f us/call %7.3fs self" % (node, cost["count"], cost["us_per_call"], cost["self"]))
+    return "\n".join(lines)
@@ -0,0 +1,116 @@
+"""
+Benchmark corpus: generators of large synthetic python modules and the
+real samples under tests/.
+
+Every generator takes a size `n` and returns the source of a module
+that py2cr translates without errors.  The sources are deterministic,
+so that results of different runs are comparable.
+"""
+import glob
+import os
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests")
+
+def nested_expressions(n : int, depth : int = 12) -> str:
+    """n assignments of arithmetic, calls and subscripts nested `depth` deep"""
+    lines = ["def f(x):", "    return x", "", "a = [1, 2, 3]"]
+    for i in range(n):
+        expr = "a[%d]" % (i % 3)
+        for d in range(depth):
+            if d % 3 == 0:
+                expr = "(%s + %d)" % (expr, d)
+            elif d % 3 == 1:
+                expr = "f(%s * %d)" % (expr, i % 7 + 1)
+            else:
+                expr = "[%s, %d][0]" % (expr, d)
+        lines.append("v%d = %s" % (i, expr))
+    return "\n".join(lines) + "\n"
+
+def functions_and_classes(n : int) -> str:
+    """n classes with methods, properties and class variables, and n functions calling them"""
+    lines = []
+    for i in range(n):
+        lines += [
+            "class Klass%d:" % i,
+            "    count = %d" % i,
+            "",
+            "    def __init__(self, value, scale=2):",
+            "        self.value = value",
+            "        self.scale = scale",
+            "",
+            "    @property",
+            "    def scaled(self):",
+            "        return self.value * self.scale",
+            "",
+            "    def add(self, other):",
+            "        if other > 0:",
+            "            return self.value + other",
+            "        else:",
+            "            return self.value - other",
+            "",
+            "def func%d(x, y=%d):" % (i, i),
+            "    k = Klass%d(x)" % i,
+            "    total = 0",
+            "    for j in range(y):",
+            "        total += k.add(j)",
+            "    while total > 100:",
+            "        total = total // 2",
+            "    return total + k.scaled",
+            "",
+        ]
+    lines.append("print(%s)" % " + ".join("func%d(%d)" % (i, i) for i in range(min(n, 50))))
+    return "\n".join(lines) + "\n"
+
+def comprehension_chains(n : int) -> str:
+    """n long chains of list, dict, set and generator comprehensions"""
+    lines = ["data = [1, 2, 3, 4, 5, 6, 7, 8]"]
+    for i in range(n):
+        lines += [
+            "c%d = [x * %d for x in data if x > 2]" % (i, i),
+            "d%d = {x: y for x in c%d for y in data if x != y}" % (i, i),
+            "s%d = {x + y for x in c%d for y in d%d.keys() if x < y if y %% 2 == 0}" % (i, i, i),
+            "g%d = sum(x for x in s%d if x %% 3 == 0)" % (i, i),
+            "l%d = [[y for y in range(x)] for x in c%d]" % (i, i),
+        ]
+    return "\n".join(lines) + "\n"
+
+def numpy_heavy(n : int) -> str:
+    """n blocks of numpy array creation and nested numpy calls"""
+    lines = ["import numpy as np"]
+    for i in range(n):
+        lines += [
+            "a%d = np.array([1.0, 2.0, 3.0], dtype=np.float64)" % i,
+            "b%d = np.zeros(3, dtype=np.float64)" % i,
+            "c%d = np.sqrt(np.abs(np.maximum(a%d, b%d)))" % (i, i, i),
+            "d%d = np.sum(np.exp(c%d)) / np.sum(np.ones(3))" % (i, i),
+            "e%d = np.dot(np.array([a%d, b%d]), np.array([1.0, 2.0, 3.0]))" % (i, i, i),
+        ]
+    return "\n".join(lines) + "\n"
+
+def many_imports(n : int) -> str:
+    """n stdlib imports and aliases, and calls through them"""
+    modules = ["os", "sys", "os.path", "copy", "random", "functools", "typing", "six", "collections", "numpy"]
+    lines = []
+    for i in range(n):
+        module = modules[i % len(modules)]
+        lines.append("import %s as m%d" % (module, i))
+    for i in range(n):
+        lines.append("r%d = m%d.f%d(%d)" % (i, i, i, i))
+    return "\n".join(lines) + "\n"
+
+# name -> (generator, default size: 3000 to 10000 lines, about a second to translate)
+SYNTHETIC = {
+    "nested_expressions": (nested_expressions, 3000),
+    "functions_and_classes": (functions_and_classes, 400),
+    "comprehension_chains": (comprehension_chains, 2000),
+    "numpy_heavy": (numpy_heavy, 2000),
+    "many_imports": (many_imports, 5000),
+}
+
+def samples(name : str):
+    """(path, source) of the python files of a tests/ directory, or of all of them with '*'"""
+    for path in sorted(glob.glob(os.path.join(TESTS_DIR, name, "*.py"))):
+        with open(path, "r", encoding="utf-8") as f:
+            yield (path, f.read())
+
+SAMPLES = ["deep-learning-from-scratch", "*"]
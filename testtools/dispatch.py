@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of the node dispatch of RB.visit() (see
+run_benchmarks.py --dispatch).
+
+The Name and Constant nodes of a corpus module are the fixed node list:
+they are leaves, not memoized, so every visit() goes through the
+dispatch table.  The list is visited in several ways, and the time per
+node of each one is reported:
+
+  table    the dispatch table lookup alone
+  getattr  the lookup it replaced: getattr of 'visit_' + the node class
+           name, and the tests of its calling convention
+  direct   the visit_* functions called directly, without dispatch
+  visit    RB.visit(), the dispatch and the visit_* functions
+
+visit - direct is the dispatch overhead of a translation.
+"""
+import ast
+import time
+from typing import Callable, List, Tuple
+
+import py2cr
+from . import corpus
+
+def nodes(n : int = 200) -> List[ast.AST]:
+    """The Name and Constant nodes of a corpus module of n assignments"""
+    tree = ast.parse(corpus.nested_expressions(n))
+    return [node for node in ast.walk(tree) if isinstance(node, (ast.Name, ast.Constant))]
+
+def best_time(func : Callable[[], None], repeat : int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run(n : int = 200, loops : int = 50, repeat : int = 3) -> List[Tuple[str, float]]:
+    """(way, nanoseconds per node) of each way of visiting the node list"""
+    node_list = nodes(n)
+    rb = py2cr.RB()
+    for node in node_list:
+        rb.visit(node) # fills the dispatch table
+    table = type(rb)._dispatch_table
+    visitors = [(table[node.__class__][0], node) for node in node_list]
+
+    def lookup():
+        for _ in range(loops):
+            for node in node_list:
+                table[node.__class__]
+
+    def legacy_lookup():
+        for _ in range(loops):
+            for node in node_list:
+                name = node.__class__.__name__
+                visitor = getattr(rb, 'visit_' + name)
+                hasattr(visitor, 'statement')
+                name in ["Dict", "List", "Call"]
+
+    def direct():
+        for _ in range(loops):
+            for visitor, node in visitors:
+                visitor(rb, node)
+
+    def visit():
+        for _ in range(loops):
+            for node in node_list:
+                rb.visit(node)
+
+    count = len(node_list) * loops
+    return [(way, best_time(func, repeat) / count * 1e9)
+            for way, func in (("table", lookup), ("getattr", legacy_lookup), ("direct", direct), ("visit", visit))]
+
+def format_result(result : List[Tuple[str, float]]) -> str:
+    times = dict(result)
+    lines = ["%-8s %8.1f ns/node" % (way, ns) for way, ns in result]
+    lines.append("%-8s %8.1f ns/node (visit - direct)" % ("dispatch", times["visit"] - times["direct"]))
+    return "\n".join(lines)
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of the translated `for i in range(...)` loops (see
+run_benchmarks.py --loops).
+
+The python functions of SOURCE are translated twice: with the while
+loops of RB.write_range_loop(), and with the PyRange iterator driven by
+py_each (RB.native_range_loops off).  The crystal program of program()
+checks that both forms compute the same results and times them with
+Benchmark.ips; crystal is needed to run it.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import tempfile
+
+import py2cr
+from . import corpus
+
+SOURCE = '''
+def sum_squares(n):
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+def odd_down(n):
+    total = 0
+    for i in range(n, 0, -3):
+        if i % 2 == 0:
+            continue
+        total += i
+    return total
+
+def triangle(n):
+    total = 0
+    for i in range(n):
+        for j in range(i, n):
+            total += j - i
+            if total > 100000000:
+                break
+    return total
+'''
+
+FUNCTIONS = ('sum_squares', 'odd_down', 'triangle')
+
+# (suffix of the functions, RB.native_range_loops)
+FORMS = (('while', True), ('iterator', False))
+
+def translate(native : bool) -> str:
+    """Crystal text of SOURCE with the given loop form"""
+    saved = py2cr.RB.native_range_loops
+    py2cr.RB.native_range_loops = native
+    try:
+        with contextlib.redirect_stderr(io.StringIO()): # warnings
+            _rtn, _header, data = py2cr.convert_py2cr(SOURCE, '', no_stop=True)
+    finally:
+        py2cr.RB.native_range_loops = saved
+    return data
+
+def program(n : int = 1000) -> str:
+    """The crystal benchmark program, for loops of n steps"""
+    lines = ['require "benchmark"', 'require "py2cr"', '']
+    for suffix, native in FORMS:
+        text = translate(native)
+        for name in FUNCTIONS:
+            text = text.replace("def %s(" % name, "def %s_%s(" % (name, suffix))
+        lines.append(text)
+    for name in FUNCTIONS:
+        lines.append('raise "%s differs" unless %s_while(%d) == %s_iterator(%d)' % (name, name, n, name, n))
+    lines.append('Benchmark.ips do |x|')
+    for name in FUNCTIONS:
+        for suffix, _native in FORMS:
+            lines.append('  x.report("%s %s") { %s_%s(%d) }' % (name, suffix, name, suffix, n))
+    lines.append('end')
+    return "\n".join(lines) + "\n"
+
+def run(n : int = 1000, crystal : str = "crystal") -> int:
+    """
+    Build the program in release mode and run it, from the root of the
+    repository (for `require "py2cr"`).  Returns the exit status.
+    """
+    root = os.path.dirname(corpus.TESTS_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "range_loops.cr")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(program(n))
+        try:
+            return subprocess.run([crystal, "run", "--release", path], cwd=root).returncode
+        except OSError as ex:
+            raise RuntimeError("Can't find the '%s' command." % crystal) from ex
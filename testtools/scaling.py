@@ -0,0 +1,190 @@
+"""
+Scaling tests (see run_benchmarks.py --scaling).
+
+Each family generates inputs of increasing size along one dimension
+(nesting depth, number of imports...).  convert_py2cr is timed on every
+size and the growth exponent k of time ~ size**k is fitted on a log-log
+scale.  A family fails when k exceeds the exponent of its declared bound
+(e.g. O(n log n)) over the same sizes by more than a tolerance, and the
+visitors whose self time grows fastest (py2cr.profiler) are reported.
+"""
+import contextlib
+import io
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import py2cr
+from py2cr import profiler
+from . import corpus
+
+# expressions per module of the depth families: the depth itself is
+# bounded by the recursion limit of the parser and the visitor
+DEPTH_LINES = 100
+
+def nesting_depth(n : int) -> str:
+    """expressions nested n deep"""
+    return corpus.nested_expressions(DEPTH_LINES, depth=n)
+
+def call_chain(n : int) -> str:
+    """method call chains of length n"""
+    lines = ["a = [1, 2, 3]"]
+    for i in range(DEPTH_LINES):
+        lines.append("c%d = a" % i + "".join(".m%d(%d)" % (j, i) for j in range(n)))
+    return "\n".join(lines) + "\n"
+
+def imports(n : int) -> str:
+    """n imports of local modules (import_paths()), each called through"""
+    lines = ["from pkg%d.mod%d import f%d" % (i % 10, i, i) for i in range(n)]
+    lines += ["r%d = pkg%d.mod%d.g(f%d(%d))" % (i, i % 10, i, i, i) for i in range(n)]
+    return "\n".join(lines) + "\n"
+
+def import_paths(n : int) -> Dict[str, str]:
+    """mod_paths of convert_py2cr for imports(n): its local modules"""
+    return {"pkg%d/mod%d.py" % (i % 10, i): "pkg%d/mod%d" % (i % 10, i) for i in range(n)}
+
+def names(n : int) -> str:
+    """n module and n local names"""
+    lines = ["v0 = 0"]
+    lines += ["v%d = v%d + %d" % (i, i - 1, i) for i in range(1, n)]
+    lines.append("def f(x):")
+    lines += ["    l%d = x + v%d" % (i, i) for i in range(n)]
+    lines.append("    return l%d" % (n - 1))
+    return "\n".join(lines) + "\n"
+
+def inherited_classes(n : int) -> str:
+    """n classes of a few bases, calling inherited methods"""
+    lines = []
+    for b in range(4):
+        lines += [
+            "class Base%d:" % b,
+            "    def __init__(self, value):",
+            "        self.value = value",
+            "",
+            "    def get(self, scale=1):",
+            "        return self.value * scale",
+            "",
+        ]
+    for i in range(n):
+        lines += [
+            "class Derived%d(Base%d):" % (i, i % 4),
+            "    def twice(self):",
+            "        return self.get(scale=2) + self.get()",
+            "",
+            "d%d = Derived%d(%d)" % (i, i, i),
+            "t%d = d%d.twice() + d%d.get(scale=3)" % (i, i, i),
+            "",
+        ]
+    return "\n".join(lines) + "\n"
+
+# name of a bound -> its function
+BOUNDS : Dict[str, Callable[[float], float]] = {
+    "O(n)": lambda n: n,
+    "O(n log n)": lambda n: n * math.log(n),
+    "O(n^2)": lambda n: n * n,
+}
+
+# name -> (generator, sizes, bound)
+FAMILIES = {
+    "nesting_depth": (nesting_depth, [12, 24, 48, 96], "O(n)"),
+    "call_chain": (call_chain, [12, 24, 48, 96], "O(n)"),
+    "imports": (imports, [250, 500, 1000, 2000], "O(n log n)"),
+    "names": (names, [250, 500, 1000, 2000], "O(n log n)"),
+    "inherited_classes": (inherited_classes, [50, 100, 200, 400], "O(n log n)"),
+}
+
+# name -> mod_paths of the local modules imported by the inputs of a
+# family, by size
+MOD_PATHS : Dict[str, Callable[[int], Dict[str, str]]] = {
+    "imports": import_paths,
+}
+
+TOLERANCE = 0.3 # on the exponent, for the timing noise
+
+def growth_exponent(sizes : Sequence[float], values : Sequence[float]) -> float:
+    """Least squares slope of log(value) over log(size)"""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-9)) for value in values]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+def _translate(source : str, profile=None, mod_paths : Optional[Dict[str, str]] = None) -> None:
+    with contextlib.redirect_stderr(io.StringIO()): # warnings
+        py2cr.convert_py2cr(source, '', mod_paths=mod_paths, no_stop=True, profile=profile or False)
+
+def measure(source : str, repeat : int = 3, mod_paths : Optional[Dict[str, str]] = None) -> float:
+    """Best time of `repeat` translations"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _translate(source, mod_paths=mod_paths)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def rank(small : Dict[str, profiler.Stat], large : Dict[str, profiler.Stat], sizes : Sequence[int],
+         top : int = 3, min_share : float = 0.05) -> List[Tuple[str, float, float]]:
+    """
+    (visitor, growth exponent of its self time, share of the time at the
+    largest size) of the visitors growing fastest between the profiles
+    `small` and `large` of the smallest and the largest size.
+    """
+    total = sum(stat.own for stat in large.values()) or 1.0
+    result = []
+    for name, stat in large.items():
+        if name in small and small[name].own > 0 and stat.own / total >= min_share:
+            exponent = growth_exponent([sizes[0], sizes[-1]], [small[name].own, stat.own])
+            result.append((name, exponent, stat.own / total))
+    result.sort(key=lambda item: -item[1])
+    return result[:top]
+
+def culprits(generator, sizes : Sequence[int], top : int = 3, min_share : float = 0.05,
+             mod_paths : Optional[Callable[[int], Dict[str, str]]] = None) -> List[Tuple[str, float, float]]:
+    """The rank() of the visitors, profiled on the smallest and the largest size"""
+    stats = []
+    for size in (sizes[0], sizes[-1]):
+        profile = profiler.Profiler()
+        _translate(generator(size), profile, mod_paths(size) if mod_paths else None)
+        stats.append(dict(profile.stats))
+    return rank(stats[0], stats[1], sizes, top, min_share)
+
+def check(name : str, repeat : int = 3, tolerance : float = TOLERANCE, sizes : Optional[Sequence[int]] = None) -> dict:
+    generator, default_sizes, bound = FAMILIES[name]
+    sizes = list(sizes or default_sizes)
+    mod_paths = MOD_PATHS.get(name)
+    seconds = [measure(generator(size), repeat, mod_paths(size) if mod_paths else None) for size in sizes]
+    exponent = growth_exponent(sizes, seconds)
+    allowed = growth_exponent(sizes, [BOUNDS[bound](size) for size in sizes]) + tolerance
+    result = {
+        "family": name,
+        "sizes": sizes,
+        "seconds": seconds,
+        "exponent": exponent,
+        "bound": bound,
+        "allowed": allowed,
+        "ok": exponent <= allowed,
+        "culprits": [],
+    }
+    if not result["ok"]:
+        result["culprits"] = culprits(generator, sizes, mod_paths=mod_paths)
+    return result
+
+def run(names : Optional[List[str]] = None, repeat : int = 3, tolerance : float = TOLERANCE, report=None) -> List[dict]:
+    """Check the families (all, or the given names)"""
+    results = []
+    for name in FAMILIES:
+        if names and name not in names:
+            continue
+        results.append(check(name, repeat, tolerance))
+        if report is not None:
+            report(results[-1])
+    return results
+
+def format_result(result : dict) -> str:
+    lines = ["%-20s %s  n^%.2f (%s allows n^%.2f)  %s" % (
+        result["family"], " ".join("%d:%.3fs" % (size, seconds) for size, seconds in zip(result["sizes"], result["seconds"])),
+        result["exponent"], result["bound"], result["allowed"], "ok" if result["ok"] else "FAIL")]
+    for name, exponent, share in result["culprits"]:
+        lines.append("    %-28s n^%.2f %5.1f%% of the time" % (name, exponent, share * 100.0))
+    return "\n".join(lines)